@@ -1,17 +1,12 @@
 """
 Code compares the computation time needed for different kinds of colexification analyses.
 """
-from pacs.util import (
-        load_gml_as_nx_graph,
-        out_degree,
-        in_degree,
-        degree)
+from pacs.util import load_gml_as_nx_graph
+from pacs.comparison import compare_graphs
 from tabulate import tabulate
 
-from scipy.stats import spearmanr, kendalltau
 import networkx as nx
 import itertools
-import igraph
 from matplotlib import pyplot as plt
 import numpy as np
 import seaborn
@@ -28,35 +23,29 @@ print("loaded graph common")
 
 # compute spearman correlations for the graphs with respect to their degree
 
-deg_fc = degree(graphA, "family_count")
-deg_af_out = out_degree(graphB, "family_count")
-deg_af_in = in_degree(graphB, "family_count")
-deg_af = degree(graphB, "family_count")
-deg_sub = degree(graphC, "family_count")
+names = [
+        "Full Colexification",
+        "Affix Colexification (In-Degree)",
+        "Affix Colexification (Out-Degree)",
+        "Overlap Colexification"]
+comparison = compare_graphs(
+        dict(zip(names, [graphA, graphB, graphB, graphC])),
+        weight="family_count",
+        kinds={names[1]: "in_degree", names[2]: "out_degree"})
+matrix = comparison["kendall"]
 
 table = []
-matrix = [[1 for _ in range(4)] for _ in range(4)]
-for (i, (mA, a)), (j, (mB, b)) in itertools.combinations(
-        enumerate([
-         ("Full Colexification", deg_fc),
-         ("Affix Colexification (In-Degree)", deg_af_in),
-         ("Affix Colexification (Out-Degree)", deg_af_out),
-         ("Overlap Colexification", deg_sub)]),
-        r=2):
-    common_nodes = [x for x in a if x in b]
-    values_a, values_b = [], []
-    for node in common_nodes:
-        values_a += [a[node]]
-        values_b += [b[node]]
-    r, p = kendalltau(values_a, values_b)
-    matrix[i][j] = matrix[j][i] = r
-    table += [[mA, mB, len(common_nodes), r, p]]
+for i, j in itertools.combinations(range(len(names)), r=2):
+    mA, mB = names[i], names[j]
+    common = ~np.isnan(comparison["degrees"][i]) & ~np.isnan(comparison["degrees"][j])
+    values_a = comparison["degrees"][i, common]
+    values_b = comparison["degrees"][j, common]
+    table += [[
+        mA, mB, comparison["common_nodes"][i, j], matrix[i, j],
+        comparison["kendall_pvalue"][i, j], comparison["edge_jaccard"][i, j],
+        comparison["weighted_overlap"][i, j]]]
     plt.clf()
-    for (node, val_a, val_b) in zip(
-            common_nodes,
-            values_a,
-            values_b):
-        plt.plot(val_a, val_b, "bo", markersize=3)
+    plt.plot(values_a, values_b, "bo", markersize=3)
     plt.xlim(0, max(values_a))
     plt.ylim(0, max(values_b))
     
@@ -76,4 +65,8 @@ seaborn.heatmap(
         )
 plt.savefig("correlations.pdf")
 
-print(tabulate(table, floatfmt=".4f"))
+print(tabulate(
+    table,
+    headers=["Graph A", "Graph B", "Common Nodes", "Kendall Tau", "P-Value",
+             "Edge Jaccard", "Weighted Overlap"],
+    floatfmt=".4f"))
@@ -2,12 +2,7 @@
 Code compares the computation time needed for different kinds of colexification analyses.
 """
 from cltoolkit import Wordlist
-from pacs.colexifications import (
-        full_colexifications,
-        affix_colexifications,
-        common_substring_colexifications,
-        affix_colexifications_by_pairwise_comparison
-        )
+from pacs.colexifications import combined_colexifications
 from pacs.util import write_gml
 from pycldf import Dataset
 from pyclts import CLTS
@@ -15,10 +10,11 @@ from pyclts import CLTS
 wl = Wordlist([Dataset.from_metadata("idssegmented/cldf/cldf-metadata.json")],
               ts=CLTS().bipa)
 
-graphA = full_colexifications(wl)
-graphB = affix_colexifications(wl, source_threshold=2, target_threshold=5)
-graphC = common_substring_colexifications(wl, minimal_length_threshold=4,
-        difference_threshold=3)
+graphs = combined_colexifications(wl, analyses={
+    "full": {},
+    "affix": {"source_threshold": 2, "target_threshold": 5},
+    "common_substring": {"minimal_length_threshold": 4, "difference_threshold": 3}})
+graphA, graphB, graphC = graphs["full"], graphs["affix"], graphs["common_substring"]
 
 print("[i] writing graphs to file")
 write_gml(graphA, "colexification-full.gml")
@@ -3,9 +3,10 @@ from pacs.util import (
         write_gml,
         out_degree,
         in_degree,
-        degree)
+        degree,
+        detect_communities)
+from pacs.query import EdgeIndex
 import networkx as nx
-import igraph
 
 nodelist = [
         "plant (noun)",
@@ -63,7 +64,6 @@ nodes = {
         }
 
 
-graph_a = igraph.load("colexification-full.gml")
 graphA = load_gml_as_nx_graph("colexification-full.gml")
 print("Loaded graph full")
 graphB = load_gml_as_nx_graph("colexification-affix.gml", nx_cls=nx.DiGraph)
@@ -71,16 +71,13 @@ print("loaded graph affix")
 graphC = load_gml_as_nx_graph("colexification-overlap.gml")
 print("loaded graph common")
 
-for i, comms in enumerate(graph_a.community_infomap(vertex_weights="family_count",
-        edge_weights="family_count")):
-    for node in comms:
-        n = graph_a.vs[node]["label"]
-        if n in graphA:
-            graphA.nodes[graph_a.vs[node]["label"]]["community"] = str(i+1)
-        if n in graphB:
-            graphB.nodes[graph_a.vs[node]["label"]]["community"] = str(i+1)
-        if n in graphC:
-            graphC.nodes[graph_a.vs[node]["label"]]["community"] = str(i+1)
+detect_communities(
+        graphA, method="infomap", name="community", vertex_weights="family_count",
+        edge_weights="family_count")
+communities = nx.get_node_attributes(graphA, "community")
+for graph in (graphB, graphC):
+    nx.set_node_attributes(
+            graph, {n: communities[n] for n in graph if n in communities}, name="community")
 
 for n in nodes:
     if n not in graphA:
@@ -89,26 +86,10 @@ for n in nodes:
 
 
 # filter by n families
-remove_edges_a, remove_edges_b, remove_edges_c = [], [], []
-for node_a, node_b, data in graphA.edges(data=True):
-    if data["family_count"] < 2:
-        remove_edges_a.append((node_a, node_b))
-
-for node_a, node_b, data in graphB.edges(data=True):
-    if data["family_count"] < 5:
-        remove_edges_b.append((node_a, node_b))
-
-for node_a, node_b, data in graphC.edges(data=True):
-    if data["family_count"] < 6:
-        remove_edges_c.append((node_a, node_b))
-
-graphA.remove_edges_from(remove_edges_a)
-graphB.remove_edges_from(remove_edges_b)
-graphC.remove_edges_from(remove_edges_c)
-
-subgraph_a = nx.subgraph(graphA, nodes)
-subgraph_b = nx.subgraph(graphB, nodes)
-subgraph_c = nx.subgraph(graphC, nodes)
+index_a, index_b, index_c = EdgeIndex(graphA), EdgeIndex(graphB), EdgeIndex(graphC)
+subgraph_a = index_a.view(index_a.select("family_count", minimum=2), nodes=nodes)
+subgraph_b = index_b.view(index_b.select("family_count", minimum=5), nodes=nodes)
+subgraph_c = index_c.view(index_c.select("family_count", minimum=6), nodes=nodes)
 
 write_gml(subgraph_a, "subgraph-full.gml")
 write_gml(subgraph_b, "subgraph-affix.gml")
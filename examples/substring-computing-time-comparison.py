@@ -0,0 +1,51 @@
+"""
+compare computing times of the engines for common substring colexifications
+and make sure output is identical
+
+The fastest of three runs of each engine is reported in seconds, with the
+ratio of the times of the trie and of the n-gram engine (the default).
+"""
+
+from cltoolkit import Wordlist
+from pacs.colexifications import common_substring_colexifications
+from pycldf import Dataset
+from pyclts import CLTS
+from lexibank_allenbai import Dataset as AllenBai
+
+import timeit
+from tabulate import tabulate
+import functools
+
+bipa = CLTS().bipa
+wordlists = [
+        ("Allen's Bai", Wordlist([Dataset.from_metadata(
+            AllenBai().cldf_dir.joinpath("cldf-metadata.json"))], ts=bipa)),
+        ("IDS", Wordlist([Dataset.from_metadata(
+            "idssegmented/cldf/cldf-metadata.json")], ts=bipa))
+        ]
+
+
+def colex(wl, engine):
+    return common_substring_colexifications(
+            wl, minimal_length_threshold=4, difference_threshold=3, engine=engine)
+
+
+table = []
+for name, wl in wordlists:
+    graphA = colex(wl, "trie")
+    graphB = colex(wl, "ngrams")
+    if list(graphA.edges(data=True)) != list(graphB.edges(data=True)) or \
+            list(graphA.nodes(data=True)) != list(graphB.nodes(data=True)):
+        print("[!] the engines yield different graphs for {0}".format(name))
+    else:
+        print("[i] no differences found for the trie and the n-gram engine on {0}".format(name))
+
+    t1 = min(timeit.Timer(functools.partial(colex, wl, "trie")).repeat(3, 1))
+    t2 = min(timeit.Timer(functools.partial(colex, wl, "ngrams")).repeat(3, 1))
+    print("[i] {0}: {1:.2f}s with the trie, {2:.2f}s with the n-grams".format(
+        name, t1, t2))
+    table += [[name, t1, t2, t1 / t2]]
+
+print(tabulate(
+    table, headers=["Dataset", "Trie (s)", "N-Grams (s)", "Trie / N-Grams"],
+    floatfmt=".2f"))
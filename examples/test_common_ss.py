@@ -2,6 +2,7 @@ from cltoolkit import Wordlist
 from pacs.colexifications import full_colexifications, common_substring_colexifications
 from pycldf import Dataset
 from pyclts import CLTS
+from pacs.query import EdgeIndex
 from pacs.util import write_gml
 from tabulate import tabulate
 
@@ -14,23 +15,15 @@ wl = Wordlist([Dataset.from_metadata("allenbai/cldf/cldf-metadata.json")],
 graph = full_colexifications(wl)
 graph2 = common_substring_colexifications(wl)
 
+index = EdgeIndex(graph2)
 table = []
-for nA, nB, data in graph2.edges(data=True):
-    if data["count"] >= 2:
-        try:
-            table += [[
-                nA,
-                nB,
-                data["count"],
-                data["substrings"],
-                graph[nA][nB]["count"]]]
-        except:
-            table += [[
-                nA,
-                nB,
-                data["count"],
-                data["substrings"],
-                0]]
+for nA, nB, data in index.edges(index.select("count", minimum=2), data=True):
+    table += [[
+        nA,
+        nB,
+        data["count"],
+        data["substrings"],
+        graph[nA][nB]["count"] if graph.has_edge(nA, nB) else 0]]
 
 print(tabulate(sorted(table, key=lambda x: (x[2], x[3]), reverse=True)))
 
@@ -30,6 +30,7 @@ setup(
         'pyglottolog>=2.0',
         'python-igraph>=0.7.1',
         'networkx>=2.1',  # We rely on the `node` attribute
+        'numpy',
     ],
     extras_require={
         'dev': [
@@ -0,0 +1,348 @@
+"""
+Benchmarks of the analyses on synthetic wordlists.
+
+Run `python -m pacs.bench --help` for the command line interface, which writes
+the timings as JSON.
+"""
+import csv
+import gc
+import sys
+import json
+import time
+import random
+import pathlib
+import platform
+import argparse
+import tempfile
+import tracemalloc
+
+import networkx as nx
+import numpy as np
+
+from pacs import colexifications, fuzzy, util
+from pacs.cldf import Concept, Form, Language, Sound, StreamingWordlist, segment_type
+
+__all__ = ['SyntheticWordlist', 'synthetic_wordlist', 'write_cldf', 'measure', 'run', 'ENGINES']
+
+CONSONANTS = "p t k b d g m n ŋ s ʃ x h l r j w ts tʃ f v z".split()
+VOWELS = "a e i o u ə ɛ ɔ".split()
+
+
+class SyntheticWordlist:
+    """
+    A wordlist with the attributes of CL Toolkit wordlists used by the analyses.
+    """
+
+    def __init__(self, languages, concepts):
+        self.languages = languages
+        self.concepts = concepts
+
+    @property
+    def forms(self):
+        return [form for language in self.languages for form in language.forms_with_sounds]
+
+
+def synthetic_wordlist(
+        languages=10,
+        concepts=200,
+        forms_per_concept=1,
+        form_length=(3, 8),
+        affix_rate=0.2,
+        colexification_rate=0.05,
+        families=3,
+        seed=0):
+    """
+    Create a random wordlist.
+
+    Forms are random sequences of consonants and vowels. Some forms are
+    derived from earlier forms of the same language by adding an affix,
+    separated by a morpheme boundary, and some forms are reused for another
+    concept, so that the wordlist contains affix, common substring, and full
+    colexifications.
+
+    @param languages: The number of languages.
+    @param concepts: The number of concepts.
+    @param forms_per_concept: The number of forms of each concept in each
+        language.
+    @param form_length: The minimal and maximal number of segments of a form.
+    @param affix_rate: The probability that a form is derived from an earlier
+        form by adding an affix.
+    @param colexification_rate: The probability that an earlier form is reused.
+    @param families: The number of language families.
+    @param seed: The seed of the random number generator.
+    """
+    rng = random.Random(seed)
+    sounds = {}
+
+    def sound(segment):
+        if segment not in sounds:
+            sounds[segment] = Sound(segment, segment_type(segment))
+        return sounds[segment]
+
+    def random_form(length):
+        return [rng.choice(CONSONANTS) if i % 2 == 0 else rng.choice(VOWELS)
+                for i in range(length)]
+
+    concept_list = [
+            Concept("synthetic-{0}".format(i), name="concept {0}".format(i),
+                    concepticon_id=str(i), concepticon_gloss="CONCEPT{0}".format(i))
+            for i in range(concepts)]
+    language_list = []
+    for i in range(languages):
+        language = Language(
+                "synthetic-L{0}".format(i),
+                name="Language {0}".format(i),
+                glottocode="synt{0:04d}".format(i),
+                family="Family{0}".format(i % families))
+        earlier = []
+        for concept in concept_list:
+            for j in range(forms_per_concept):
+                if earlier and rng.random() < colexification_rate:
+                    segments = rng.choice(earlier)
+                elif earlier and rng.random() < affix_rate:
+                    affix = random_form(rng.randint(1, 3))
+                    segments = rng.choice(earlier)
+                    segments = segments + ["+"] + affix if rng.random() < 0.5 else \
+                        affix + ["+"] + segments
+                else:
+                    segments = random_form(rng.randint(*form_length))
+                earlier.append(segments)
+                language.forms_with_sounds.append(Form(
+                    "{0}-{1}-{2}".format(language.id, concept.id.split("-")[-1], j),
+                    concept,
+                    "".join(segments),
+                    tuple([sound(segment) for segment in segments])))
+        language_list.append(language)
+    return SyntheticWordlist(language_list, concept_list)
+
+
+def write_cldf(wordlist, path):
+    """
+    Write a synthetic wordlist as CLDF dataset, which can be read with
+    `StreamingWordlist`.
+
+    @returns: The path of the metadata file.
+    """
+    path = pathlib.Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    def local(identifier):
+        return identifier.split("-", 1)[1]
+
+    tables = [
+            ("LanguageTable", "languages.csv", ["ID", "Name", "Glottocode", "Family"],
+             [[local(language.id), language.name, language.glottocode, language.family]
+              for language in wordlist.languages]),
+            ("ParameterTable", "parameters.csv",
+             ["ID", "Name", "Concepticon_ID", "Concepticon_Gloss"],
+             [[local(concept.id), concept.name, concept.concepticon_id,
+               concept.concepticon_gloss] for concept in wordlist.concepts]),
+            ("FormTable", "forms.csv",
+             ["ID", "Language_ID", "Parameter_ID", "Value", "Segments"],
+             [[local(form.id), local(language.id), local(form.concept.id), form.value,
+               " ".join(form.segments)]
+              for language in wordlist.languages for form in language.forms_with_sounds])]
+    metadata = {"rdf:ID": "synthetic", "tables": []}
+    for component, url, header, rows in tables:
+        metadata["tables"].append({
+            "dc:conformsTo": "http://cldf.clld.org/v1.0/terms.rdf#" + component,
+            "url": url,
+            "tableSchema": {"columns": [{"name": name} for name in header]}})
+        with open(str(path / url), "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+    with open(str(path / "cldf-metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    return path / "cldf-metadata.json"
+
+
+def measure(function, repeat=1, memory=True):
+    """
+    Measure the wall time and the peak memory of a function.
+
+    The time is the best of several runs. The peak memory of the Python
+    allocations, including numpy arrays, is measured in a separate run, since
+    tracing allocations slows down the function.
+
+    @returns: A dictionary with the keys "seconds" and "peak_memory", in
+        bytes, which is None if memory is not measured.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"seconds": min(times), "peak_memory": peak}
+
+
+def _colexifications(name, **kw):
+    def setup(wordlist, tmp):
+        return (lambda: getattr(colexifications, name)(wordlist, **kw)), \
+            len(wordlist.forms), "forms"
+    return setup
+
+
+def _fuzzy(**kw):
+    def setup(wordlist, tmp):
+        return (lambda: fuzzy.fuzzy_affix_colexifications(wordlist, **kw)), \
+            len(wordlist.forms), "forms"
+    return setup
+
+
+def _graph(function):
+    def setup(wordlist, tmp):
+        graph = colexifications.full_colexifications(wordlist)
+        return (lambda: function(graph, tmp)), graph.number_of_edges(), "edges"
+    return setup
+
+
+def _read_graph(wordlist, tmp):
+    graph = colexifications.full_colexifications(wordlist)
+    util.write_graph(graph, str(tmp / "graph.bin"))
+    return (lambda: util.read_graph(str(tmp / "graph.bin"))), graph.number_of_edges(), "edges"
+
+
+def _streaming(wordlist, tmp):
+    metadata = write_cldf(wordlist, tmp / "cldf")
+    return (lambda: [len(language.forms_with_sounds) for language in
+                     StreamingWordlist(metadata).languages]), len(wordlist.forms), "forms"
+
+
+def _util(name, *args, **kw):
+    def function(graph, tmp):
+        return list(getattr(util, name)(graph, *args, **kw))
+    return function
+
+
+def _write(name, filename):
+    def function(graph, tmp):
+        getattr(util, name)(graph, str(tmp / filename))
+    return function
+
+
+# engines by name, with a function that takes the wordlist and a temporary
+# directory and returns the function to time, the number of items it
+# processes, and their unit
+ENGINES = {
+        "colexifications.full": _colexifications("full_colexifications"),
+        "colexifications.full.counts": _colexifications(
+            "full_colexifications", attributes="counts"),
+        "colexifications.affix": _colexifications("affix_colexifications"),
+        "colexifications.affix.counts": _colexifications(
+            "affix_colexifications", attributes="counts"),
+        "colexifications.affix.pairwise": _colexifications(
+            "affix_colexifications_by_pairwise_comparison"),
+        "colexifications.common_substring.trie": _colexifications(
+            "common_substring_colexifications", engine="trie"),
+        "colexifications.common_substring.ngrams": _colexifications(
+            "common_substring_colexifications", engine="ngrams"),
+        "colexifications.fuzzy_affix": _fuzzy(),
+        "colexifications.fuzzy_affix.minhash": _fuzzy(index="minhash"),
+        "colexifications.combined": _colexifications("combined_colexifications"),
+        "cldf.streaming": _streaming,
+        "util.degree": _graph(_util("degree", "family_count")),
+        "util.iter_subgraphs": _graph(_util("iter_subgraphs")),
+        "util.write_gml": _graph(_write("write_gml", "graph.gml")),
+        "util.write_graph": _graph(_write("write_graph", "graph.bin")),
+        "util.read_graph": _read_graph,
+        }
+
+SCALES = [
+        {"languages": 10, "concepts": 200},
+        {"languages": 50, "concepts": 500},
+        {"languages": 100, "concepts": 1000},
+        ]
+
+
+def run(scales=None, engines=None, repeat=1, memory=True, log=None):
+    """
+    Time engines on synthetic wordlists of several sizes.
+
+    @param scales: A list of dictionaries with the parameters of
+        `synthetic_wordlist`.
+    @param engines: The names of the engines in ENGINES, all by default.
+    @param repeat: The number of runs of which the fastest is reported.
+    @param memory: Measure the peak memory in an additional run.
+    @param log: A function called with each result when it is available.
+    @returns: A dictionary with information on the environment and a list of
+        results.
+    """
+    results = []
+    for scale in scales or SCALES:
+        wordlist = synthetic_wordlist(**scale)
+        for name in engines or ENGINES:
+            with tempfile.TemporaryDirectory() as tmp:
+                function, items, unit = ENGINES[name](wordlist, pathlib.Path(tmp))
+                result = measure(function, repeat=repeat, memory=memory)
+            result.update(
+                    engine=name,
+                    scale=scale,
+                    items=items,
+                    unit=unit,
+                    throughput=items / result["seconds"] if result["seconds"] else None)
+            results.append(result)
+            if log:
+                log(result)
+    return {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "networkx": nx.__version__,
+            "numpy": np.__version__,
+            "repeat": repeat,
+            "results": results}
+
+
+def _scale(text):
+    scale = {}
+    for item in text.split(","):
+        key, _, value = item.partition("=")
+        scale[key] = float(value) if "." in value else int(value)
+    return scale
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument(
+            "--scale", action="append", type=_scale, default=None,
+            help="parameters of a synthetic wordlist, such as languages=10,concepts=200 "
+                 "(can be repeated)")
+    parser.add_argument(
+            "--engine", action="append", choices=sorted(ENGINES), default=None,
+            help="engine to time (can be repeated, default: all)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="do not measure peak memory")
+    parser.add_argument("--output", default=None, help="JSON file, default: standard output")
+    args = parser.parse_args(args)
+
+    def log(result):
+        print("{0:40} {1:30} {2:10.3f}s".format(
+            result["engine"],
+            ",".join(["{0}={1}".format(k, v) for k, v in result["scale"].items()]),
+            result["seconds"]), file=sys.stderr)
+
+    report = run(
+            scales=args.scale,
+            engines=args.engine,
+            repeat=args.repeat,
+            memory=not args.no_memory,
+            log=log)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
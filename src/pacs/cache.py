@@ -0,0 +1,266 @@
+"""
+Persistent cache of the partial results of individual languages, and an
+in-memory cache of normalized forms.
+"""
+import os
+import time
+import zlib
+import pickle
+import hashlib
+import pathlib
+import functools
+from collections import OrderedDict
+
+__all__ = ['ResultCache', 'FormCache']
+
+
+def identity(obj):
+    """
+    Identify a function, or a partial function, by its name and parameters.
+
+    Functions among the parameters of partial functions are identified in
+    the same way, so that the identity does not depend on the process.
+    """
+    if obj is None:
+        return None
+    if isinstance(obj, functools.partial):
+        return (
+                identity(obj.func),
+                tuple([identity(arg) if callable(arg) else arg for arg in obj.args]),
+                sorted([(key, identity(value) if callable(value) else value)
+                        for key, value in obj.keywords.items()]))
+    return "{0}.{1}".format(
+            getattr(obj, "__module__", ""), getattr(obj, "__qualname__", repr(obj)))
+
+
+class ResultCache:
+    """
+    Store the partial results of languages in a directory.
+
+    Results are addressed by a hash of the analysis with its parameters, the
+    form factory, the optional dataset version, the language, and its forms,
+    so that a rerun only recomputes the languages whose data or parameters
+    changed. Each result is written to a compressed binary file. When the
+    files exceed the maximal size, the least recently used ones are removed.
+
+    Form factories are identified by their qualified name, so anonymous
+    functions should not be used with a cache.
+
+    @param path: The directory of the cache.
+    @param max_size: The maximal size of the cache in bytes.
+    @param version: A version of the data, such as the version of a dataset.
+    """
+
+    def __init__(self, path, max_size=2 ** 30, version=None):
+        self.path = pathlib.Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.version = version
+        self.hits, self.misses = 0, 0
+        self._files = {}
+        for entry in os.scandir(str(self.path)):
+            if entry.name.endswith(".bin"):
+                stat = entry.stat()
+                self._files[entry.name] = (stat.st_mtime, stat.st_size)
+
+    @property
+    def size(self):
+        return sum([size for _, size in self._files.values()])
+
+    def analysis(self, function, encoder=None, **parameters):
+        """
+        Return a cache for one analysis, as used by `map_languages`.
+
+        @param function: The function analysing the forms of one language.
+        @param encoder: The SegmentEncoder of the forms, if they are encoded.
+        @param parameters: Further parameters that change the results, such as
+            the form factory.
+        """
+        return _AnalysisCache(self, function, encoder, parameters)
+
+    def _file(self, key):
+        return self.path / (key + ".bin")
+
+    def get(self, key):
+        """
+        Return the result stored under a key, or None if it is not cached.
+        """
+        path = self._file(key)
+        try:
+            with open(str(path), "rb") as f:
+                result = pickle.loads(zlib.decompress(f.read()))
+        except (OSError, EOFError, zlib.error, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        now = time.time()
+        os.utime(str(path), (now, now))
+        self._files[path.name] = (now, self._files.get(path.name, (0, 0))[1])
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """
+        Store a result under a key, evicting old results if needed.
+        """
+        path = self._file(key)
+        tmp = path.with_suffix(".tmp{0}".format(os.getpid()))
+        data = zlib.compress(pickle.dumps(result, protocol=4))
+        with open(str(tmp), "wb") as f:
+            f.write(data)
+        os.replace(str(tmp), str(path))
+        self._files[path.name] = (time.time(), len(data))
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used results until the cache fits its size.
+        """
+        size = self.size
+        for name, (_, file_size) in sorted(self._files.items(), key=lambda x: x[1][0]):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(str(self.path / name))
+            except OSError:
+                pass
+            del self._files[name]
+            size -= file_size
+
+    def clear(self):
+        for name in list(self._files):
+            try:
+                os.remove(str(self.path / name))
+            except OSError:
+                pass
+        self._files = {}
+
+
+class _AnalysisCache:
+
+    def __init__(self, cache, function, encoder, parameters):
+        self.cache = cache
+        self.encoder = encoder
+        self.prefix = repr((
+            identity(function),
+            sorted([(k, identity(v) if callable(v) else v) for k, v in parameters.items()]),
+            cache.version)).encode("utf-8")
+
+    def _decode(self, word):
+        if word is None or self.encoder is None:
+            return word
+        return self.encoder.decode(word)
+
+    def _encode(self, word):
+        if word is None or self.encoder is None:
+            return word
+        return self.encoder.encode(word.split(" "))
+
+    def key(self, language, forms):
+        digest = hashlib.sha1(self.prefix)
+        digest.update(repr(language).encode("utf-8"))
+        for form_id, concept, tform, sounds in forms:
+            digest.update(repr((form_id, concept, self._decode(tform), sounds)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        result = self.cache.get(key)
+        if result is None:
+            return None
+        nodes, edges = result
+        return (
+                [(concept, role, form, self._encode(word)) for concept, role, form, word in nodes],
+                [row[:4] + (self._encode(row[4]), self._encode(row[5])) for row in edges])
+
+    def put(self, key, result):
+        nodes, edges = result
+        self.cache.put(key, (
+            [(concept, role, form, self._decode(word)) for concept, role, form, word in nodes],
+            [row[:4] + (self._decode(row[4]), self._decode(row[5])) for row in edges]))
+
+
+def _factory_key(function):
+    """
+    Return the key of a form factory in a FormCache.
+
+    Functions are their own key, and partial functions are keyed by the keys
+    of their functions and their arguments, so that partial functions
+    created with the same arguments in different calls share their forms.
+    """
+    if not isinstance(function, functools.partial):
+        return function
+    key = (
+            _factory_key(function.func),
+            tuple([_factory_key(arg) if callable(arg) else arg for arg in function.args]),
+            tuple(sorted([(name, _factory_key(value) if callable(value) else value)
+                          for name, value in function.keywords.items()],
+                         key=lambda item: item[0])))
+    try:
+        hash(key)
+    except TypeError:
+        return function
+    return key
+
+
+class FormCache:
+    """
+    Keep the normalized forms of a wordlist in memory for repeated analyses.
+
+    Forms are stored under the form factory and the form ID, together with
+    the string of their sounds. Unlike in the ResultCache, which only lives
+    across processes, form factories are identified by the function objects
+    themselves, so that different functions with the same name, such as
+    anonymous functions, do not share their forms. When the cache holds more than the maximal number of forms, the
+    least recently used ones are evicted. Form IDs must be unique in the
+    wordlists analysed with the same cache.
+
+    @param max_size: The maximal number of normalized forms.
+    """
+
+    def __init__(self, max_size=2 ** 20):
+        self.max_size = max_size
+        self.forms = OrderedDict()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def __len__(self):
+        return len(self.forms)
+
+    def normalizer(self, form_factory):
+        """
+        Return a function that returns the normalized form and the string of
+        the sounds of a CL Toolkit form, looking them up in the cache.
+        """
+        factory = _factory_key(form_factory)
+        forms = self.forms
+
+        def normalize(form):
+            key = (factory, form.id)
+            try:
+                value = forms[key]
+            except KeyError:
+                self.misses += 1
+                value = forms[key] = (form_factory(form), str(form.sounds))
+                if len(forms) > self.max_size:
+                    forms.popitem(last=False)
+                    self.evictions += 1
+                return value
+            forms.move_to_end(key)
+            self.hits += 1
+            return value
+        return normalize
+
+    def stats(self):
+        """
+        @returns: A dictionary with the hits, misses, evictions, size, and hit
+            rate of the cache.
+        """
+        calls = self.hits + self.misses
+        return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.forms),
+                "hit_rate": self.hits / calls if calls else None}
+
+    def clear(self):
+        self.forms.clear()
+        self.hits, self.misses, self.evictions = 0, 0, 0
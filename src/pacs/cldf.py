@@ -0,0 +1,334 @@
+"""
+Streaming access to CLDF wordlists without loading a full CL Toolkit wordlist.
+"""
+import csv
+import json
+import pathlib
+from collections import OrderedDict, namedtuple
+
+__all__ = ['StreamingWordlist', 'segment_type']
+
+TERMS = "http://cldf.clld.org/v1.0/terms.rdf#"
+
+MARKERS = {"+", "_", "#", "◦", "·"}
+TONES = set("˥˦˧˨˩¹²³⁴⁵⁶⁰↓↗↘")
+
+
+class Sound(namedtuple("Sound", ["grapheme", "type"])):
+    __slots__ = ()
+
+    def __str__(self):
+        return self.grapheme
+
+
+def segment_type(segment):
+    """
+    Classify a segment as "marker", "tone", or "sound".
+
+    Markers and tones are recognized by their graphemes, which is equivalent
+    to the classification by CLTS for segments in BIPA.
+    """
+    if segment in MARKERS:
+        return "marker"
+    if segment and all([char in TONES for char in segment]):
+        return "tone"
+    return "sound"
+
+
+class Concept:
+    __slots__ = ["id", "name", "concepticon_id", "concepticon_gloss"]
+
+    def __init__(self, id, name=None, concepticon_id=None, concepticon_gloss=None):
+        self.id = id
+        self.name = name
+        self.concepticon_id = concepticon_id
+        self.concepticon_gloss = concepticon_gloss
+
+    def __repr__(self):
+        return "<Concept {0}>".format(self.id)
+
+
+class Form:
+    """
+    A form with the attributes of CL Toolkit forms used by the analyses.
+
+    Sounds are shared between forms, so the segments of a form only take one
+    tuple.
+    """
+    __slots__ = ["id", "concept", "value", "sound_objects"]
+
+    def __init__(self, id, concept, value, sound_objects):
+        self.id = id
+        self.concept = concept
+        self.value = value
+        self.sound_objects = sound_objects
+
+    @property
+    def sounds(self):
+        return " ".join([sound.grapheme for sound in self.sound_objects])
+
+    @property
+    def segments(self):
+        return [sound.grapheme for sound in self.sound_objects]
+
+    def __repr__(self):
+        return "<Form {0}>".format(self.id)
+
+
+class Language:
+    __slots__ = ["id", "name", "glottocode", "family", "macroarea", "forms_with_sounds"]
+
+    def __init__(self, id, name=None, glottocode=None, family=None, macroarea=None):
+        self.id = id
+        self.name = name
+        self.glottocode = glottocode
+        self.family = family
+        self.macroarea = macroarea
+        self.forms_with_sounds = []
+
+    @property
+    def forms(self):
+        return self.forms_with_sounds
+
+    def __repr__(self):
+        return "<Language {0}>".format(self.id)
+
+
+def _table(metadata, component, default):
+    for table in metadata.get("tables", []):
+        if table.get("dc:conformsTo") == TERMS + component:
+            return table
+    for table in metadata.get("tables", []):
+        if table.get("url") == default:
+            return table
+    return {"url": default, "tableSchema": {"columns": []}}
+
+
+def _columns(table, **names):
+    """
+    Map property names to column names, using CLDF terms or default names.
+    """
+    columns = table.get("tableSchema", {}).get("columns", [])
+    out = {}
+    for prop, default in names.items():
+        out[prop] = default
+        for column in columns:
+            if column.get("propertyUrl") == TERMS + prop:
+                out[prop] = column["name"]
+                break
+    return out
+
+
+def _lines(f, position):
+    """
+    Yield the lines of a file opened in binary mode as text, keeping the
+    offset of the end of the last line in `position[0]`.
+    """
+    for line in f:
+        position[0] += len(line)
+        yield line.decode("utf-8")
+
+
+class _Dataset:
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        with open(self.path, encoding="utf-8") as f:
+            self.metadata = json.load(f)
+        self.id = self.metadata.get("rdf:ID") or self.path.parent.parent.name
+        self.forms = _table(self.metadata, "FormTable", "forms.csv")
+        self.languages = _table(self.metadata, "LanguageTable", "languages.csv")
+        self.parameters = _table(self.metadata, "ParameterTable", "parameters.csv")
+
+    def rows(self, table):
+        path = self.path.parent / table["url"]
+        if not path.exists():
+            return
+        with open(path, encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+
+    def runs(self, table, column):
+        """
+        Find the runs of consecutive rows with the same value in a column.
+
+        @returns: The names of the columns and an ordered dictionary with the
+            values, in the order of their first row, and lists of [start,
+            stop] byte offsets of their runs of rows.
+        """
+        path = self.path.parent / table["url"]
+        runs = OrderedDict()
+        if not path.exists():
+            return [], runs
+        with open(path, "rb") as f:
+            position = [0]
+            reader = csv.reader(_lines(f, position))
+            header = next(reader, [])
+            index, last, start = header.index(column), None, position[0]
+            for row in reader:
+                if row:
+                    if row[index] != last:
+                        last = row[index]
+                        runs.setdefault(last, []).append([start, position[0]])
+                    else:
+                        runs[last][-1][1] = position[0]
+                start = position[0]
+        return header, runs
+
+
+def _read(f, header, start, stop):
+    """
+    Yield the rows between two byte offsets of a CSV file opened in binary
+    mode as dictionaries.
+    """
+    f.seek(start)
+    position = [start]
+    for row in csv.reader(_lines(f, position)):
+        if row:
+            yield dict(zip(header, row))
+        if position[0] >= stop:
+            break
+
+
+class StreamingWordlist:
+    """
+    A wordlist that streams forms from CLDF datasets, grouped by language.
+
+    Languages and concepts are read from `languages.csv` and `parameters.csv`
+    when the wordlist is created. The forms are read from `forms.csv` while
+    iterating over the languages, one language at a time, and their segments
+    are split and classified once. Identifiers are prefixed with the dataset
+    ID as in CL Toolkit, so the wordlist can be passed to the analyses in
+    `pacs.colexifications` instead of a CL Toolkit wordlist.
+
+    Each iteration over the languages first reads the language of each row
+    of `forms.csv` and records the byte offsets of the runs of consecutive
+    rows of each language, and then reads the forms of each language from
+    its runs. Forms of one language do thus not need to be in consecutive
+    rows, but files in which they are only need one sequential pass over
+    the forms of each language.
+
+    Like the forms with sounds of CL Toolkit, the forms of a language only
+    include forms whose segments are sounds of the transcription system,
+    with word boundaries "_" converted to "+", markers "+" and "_" removed
+    from the beginning and end of the form, and repeated markers merged.
+    Without a transcription system, segments are classified by
+    `segment_type` and all segments are taken as valid sounds.
+
+    @param datasets: Paths to the metadata files of CLDF datasets.
+    @param ts: A transcription system of pyclts, such as `CLTS().bipa`.
+    """
+
+    def __init__(self, *datasets, ts=None):
+        self.datasets = [_Dataset(path) for path in datasets]
+        self.ts = ts
+        self._sounds = {}
+        self._parameters = {}
+        # concepts are merged across datasets by their Concepticon gloss
+        concepts = {}
+        for dataset in self.datasets:
+            cols = _columns(
+                    dataset.parameters,
+                    id="ID",
+                    name="Name",
+                    concepticonReference="Concepticon_ID",
+                    concepticonGloss="Concepticon_Gloss")
+            for row in dataset.rows(dataset.parameters):
+                gloss = row.get(cols["concepticonGloss"]) or None
+                cid = gloss or "{0}-{1}".format(dataset.id, row[cols["id"]])
+                if cid not in concepts:
+                    concepts[cid] = Concept(
+                            cid,
+                            name=row.get(cols["name"]),
+                            concepticon_id=row.get(cols["concepticonReference"]) or None,
+                            concepticon_gloss=gloss)
+                self._parameters[dataset.id, row[cols["id"]]] = concepts[cid]
+        self.concepts = list(concepts.values())
+
+    def sound(self, segment):
+        """
+        Return the shared Sound object of a segment, or None if the segment is
+        not a sound of the transcription system.
+        """
+        try:
+            return self._sounds[segment]
+        except KeyError:
+            # use the BIPA part of segments with explicit transcriptions
+            grapheme = segment.split("/")[-1]
+            if self.ts is None:
+                sound = Sound(grapheme, segment_type(grapheme))
+            else:
+                sound = self.ts[grapheme]
+                sound = None if sound.type == "unknownsound" else Sound(str(sound), sound.type)
+            self._sounds[segment] = sound
+            return sound
+
+    def sounds(self, segments):
+        """
+        Return the sounds of a form as a tuple, which is empty if one of the
+        segments is not a sound.
+        """
+        sounds = []
+        for segment in segments:
+            # word boundaries are written "+" as in CL Toolkit
+            sound = self.sound("+" if segment == "_" else segment)
+            if sound is None:
+                return ()
+            if sound.grapheme != "+" or (sounds and sounds[-1].grapheme != "+"):
+                sounds.append(sound)
+        if sounds and sounds[-1].grapheme == "+":
+            sounds.pop()
+        return tuple(sounds)
+
+    def _language_table(self, dataset):
+        cols = _columns(
+                dataset.languages,
+                id="ID",
+                name="Name",
+                glottocode="Glottocode",
+                macroarea="Macroarea",
+                family="Family")
+        languages = {}
+        for row in dataset.rows(dataset.languages):
+            languages[row[cols["id"]]] = Language(
+                    "{0}-{1}".format(dataset.id, row[cols["id"]]),
+                    name=row.get(cols["name"]),
+                    glottocode=row.get(cols["glottocode"]) or None,
+                    family=row.get(cols["family"]) or None,
+                    macroarea=row.get(cols["macroarea"]) or None)
+        return languages
+
+    @property
+    def languages(self):
+        """
+        Yield the languages with their forms, reading one language at a time.
+        """
+        for dataset in self.datasets:
+            languages = self._language_table(dataset)
+            cols = _columns(
+                    dataset.forms,
+                    id="ID",
+                    languageReference="Language_ID",
+                    parameterReference="Parameter_ID",
+                    value="Value",
+                    segments="Segments")
+            header, runs = dataset.runs(dataset.forms, cols["languageReference"])
+            if not runs:
+                continue
+            with open(dataset.path.parent / dataset.forms["url"], "rb") as f:
+                for lid, offsets in runs.items():
+                    # drop the reference to the language, so that its forms
+                    # can be released once the language has been analysed
+                    language = languages.pop(lid, None) or Language(
+                            "{0}-{1}".format(dataset.id, lid))
+                    for start, stop in offsets:
+                        for row in _read(f, header, start, stop):
+                            sounds = self.sounds(row.get(cols["segments"], "").split())
+                            if not sounds:
+                                continue
+                            language.forms_with_sounds.append(Form(
+                                "{0}-{1}".format(dataset.id, row[cols["id"]]),
+                                self._parameters.get(
+                                    (dataset.id, row[cols["parameterReference"]])),
+                                row.get(cols["value"]),
+                                sounds))
+                    yield language
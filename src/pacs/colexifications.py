@@ -1,11 +1,20 @@
 """
 Sequence operations.
 """
+import operator
 import itertools
+import functools
 import networkx as nx
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
 from tqdm import tqdm as progressbar
 
+from pacs.encoding import SegmentEncoder
+from pacs.profiling import NULL_TIMER, profiled
+from pacs.occurrences import Schema, OccurrenceTable, CountTable, PartitionedTable
+from pacs.substrings import common_substring_pairs
+
 
 def sounds_without_plus(form):
     return tuple([str(s) for s in form.sound_objects if s.type not in ("marker", "tone")])
@@ -94,82 +103,331 @@ def affixes(tupA, tupB):
 
 
 
+def get_languages(wordlist, family=None):
+    """
+    Select the languages of a wordlist, optionally restricted to one family.
+
+    Languages are selected lazily, so wordlists reading one language at a
+    time are not loaded into memory at once.
+    """
+    return (language for language in wordlist.languages if
+            family is None or language.family == family)
+
+
+def partition_languages(languages, partition_by):
+    """
+    Record the partition of each language while the languages are read.
+
+    @param languages: An iterable of CL Toolkit languages.
+    @param partition_by: The attribute of a language by which languages are
+        partitioned, such as "family" or "macroarea", or a function that
+        returns the partition of a language.
+    @returns: A generator yielding the languages and a dictionary with the
+        IDs of the languages read so far as keys and their partitions as
+        values.
+    """
+    partition = partition_by if callable(partition_by) else \
+        operator.attrgetter(partition_by)
+    partitions = {}
+
+    def iterate():
+        for language in languages:
+            partitions[language.id] = partition(language)
+            yield language
+    return iterate(), partitions
+
+
+def normalizer(form_factory, form_cache=None):
+    """
+    Return a function that returns the normalized form and the string of the
+    sounds of a CL Toolkit form.
+
+    @param form_cache: A FormCache in which the normalized forms are looked
+        up, if set.
+    """
+    if form_cache is None:
+        return lambda form: (form_factory(form), str(form.sounds))
+    return form_cache.normalizer(form_factory)
+
+
+def language_data(
+        language, concept_factory, form_factory, concepts=None, encoder=None, timer=None,
+        form_cache=None):
+    """
+    Extract the data of a CL Toolkit language needed by the analyses.
+
+    @param language: A CL Toolkit language.
+    @param concept_factory: Function that returns the concept of a form.
+    @param form_factory: Function that returns the normalized form.
+    @param concepts: If set, only forms whose concepts are in this set are kept.
+    @param encoder: A SegmentEncoder used to encode the normalized forms.
+    @param timer: A StageTimer recording the stages "forms" and
+        "form_factory".
+    @param form_cache: A FormCache from which normalized forms are taken.
+    @returns: A tuple consisting of the language attributes (ID,
+        Glottocode, family) and a list of (form ID, concept, normalized form,
+        sounds) tuples.
+
+    Unlike the CL Toolkit objects, the data can be sent to worker processes.
+    """
+    timer = timer or NULL_TIMER
+    with timer.stage("forms") as stage:
+        forms_with_sounds = language.forms_with_sounds
+        stage.items = len(forms_with_sounds)
+    normalize = normalizer(form_factory, form_cache)
+    if timer is not NULL_TIMER:
+        normalize = timer.timed("form_factory", normalize)
+    forms = []
+    for form in forms_with_sounds:
+        concept = concept_factory(form.concept)
+        if concept and (concepts is None or concept in concepts):
+            tform, sounds = normalize(form)
+            if encoder is not None:
+                tform = encoder.encode(tform)
+            forms += [(form.id, concept, tform, sounds)]
+    if timer is not NULL_TIMER:
+        normalize.flush()
+    return (language.id, language.glottocode, language.family), forms
+
+
+def map_languages(function, data, workers=None, cache=None, profile=None):
+    """
+    Apply an analysis to the data of each language, optionally in parallel.
+
+    @param function: A picklable function that takes the list of forms of one
+        language and returns a partial result.
+    @param data: An iterable of (language, forms) tuples, as returned by
+        `language_data`.
+    @param workers: Number of worker processes. When set to None or 1, the
+        analysis runs in the current process.
+    @param cache: A cache for the analysis, as returned by
+        `ResultCache.analysis`. Only languages missing in the cache are
+        analysed.
+    @param profile: A Profile recording the stages "cache" and "analysis",
+        with the stages of the function, for each language. The function must
+        then accept a StageTimer as keyword argument `timer`.
+    @returns: A generator yielding (language, partial result) tuples in the
+        order of the input data.
+    """
+    if profile is not None:
+        function = functools.partial(profiled, function)
+
+    def lookup(language, forms):
+        with (profile.timer(language[0]) if profile else NULL_TIMER).stage("cache") as stage:
+            key = cache.key(language, forms)
+            result = cache.get(key)
+            stage.items = int(result is not None)
+        return key, result
+
+    def unwrap(language, result):
+        if profile is None:
+            return result
+        result, records = result
+        profile.merge(language[0], records)
+        return result
+
+    if not workers or workers < 2:
+        for language, forms in data:
+            if cache is None:
+                yield language, unwrap(language, function(forms))
+                continue
+            key, result = lookup(language, forms)
+            if result is None:
+                result = unwrap(language, function(forms))
+                cache.put(key, result)
+            yield language, result
+        return
+
+    data = list(data)
+    keys, results = [None for _ in data], [None for _ in data]
+    if cache is not None:
+        for i, (language, forms) in enumerate(data):
+            keys[i], results[i] = lookup(language, forms)
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        chunksize = max(1, len(missing) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for i, result in zip(missing, executor.map(
+                    function, [data[i][1] for i in missing], chunksize=chunksize)):
+                results[i] = unwrap(data[i][0], result)
+                if cache is not None:
+                    cache.put(keys[i], results[i])
+    for (language, _), result in zip(data, results):
+        yield language, result
+
+
+def collect_results(table, results, desc=None, profile=None):
+    """
+    Add the partial results of individual languages to an occurrence table.
+
+    Partial results consist of a list of nodes, represented as (concept, role,
+    form ID, word) tuples, and a list of edges, represented as (concept A,
+    concept B, form ID A, form ID B, word A, word B) tuples. They are added in
+    the order of the languages, so the graph does not depend on the number of
+    workers.
+
+    When a Profile is given, the time to add each language is recorded as
+    stage "collect", and no progress bar is shown.
+    """
+    if profile is not None:
+        for language, (nodes, edges) in results:
+            with profile.timer(language[0]).stage("collect", len(nodes) + len(edges)):
+                table.add(language, nodes, edges)
+        return table
+    for language, (nodes, edges) in progressbar(
+            results, desc=desc, disable=desc is None):
+        table.add(language, nodes, edges)
+    return table
+
+
+def _table(schema, attributes, decode=None, partitions=None, table_factory=None):
+    """
+    Return the table to which an analysis adds the partial results.
+
+    @param attributes: "lists" for an OccurrenceTable, "counts" for a CountTable.
+    @param partitions: A dictionary of varieties and their partitions, for a
+        PartitionedTable with a table for all languages and one for each partition.
+    @param table_factory: A function taking the Schema and the function decoding
+        words, as keyword argument decode, which replaces the table selected by
+        attributes, such as `pacs.spilling.SpillingTable`.
+    """
+    if partitions is not None:
+        return PartitionedTable(
+                functools.partial(
+                    _table, schema, attributes, decode=decode, table_factory=table_factory),
+                lambda language: partitions[language[0]])
+    if table_factory is not None:
+        return table_factory(schema, decode=decode)
+    if attributes == "lists":
+        return OccurrenceTable(schema, decode=decode)
+    if attributes == "counts":
+        return CountTable(schema)
+    raise ValueError("unknown attributes {0}".format(attributes))
+
+
+def _output(table, output, profile=None):
+    if output == "graph":
+        with (profile.timer() if profile else NULL_TIMER).stage("graph", len(table)):
+            return table.to_graph()
+    if output == "table":
+        return table
+    raise ValueError("unknown output {0}".format(output))
+
+
+def _full_language(forms, timer=None):
+    timer = timer or NULL_TIMER
+    with timer.stage("candidates") as stage:
+        cols = defaultdict(list)
+        for form_id, concept, _, sounds in forms:
+            cols[sounds] += [(form_id, concept)]
+        stage.items = len(cols)
+
+    with timer.stage("pairs") as stage:
+        nodes, edges = [], []
+        for tokens, entries in cols.items():
+            for form_id, concept in entries:
+                nodes += [(concept, None, form_id, tokens)]
+
+        for tokens, entries in cols.items():
+            if len(set([concept for _, concept in entries])) > 1:
+                for (f1, c1), (f2, c2) in itertools.combinations(entries, r=2):
+                    if c1 == c2:
+                        continue
+                    edges += [(c1, c2, f1, f2, tokens, tokens)]
+        stage.items = len(edges)
+    return nodes, edges
+
+
+FULL_COLEXIFICATIONS = Schema(
+        directed=False,
+        nodes=[
+            ("forms", "form", None),
+            ("words", "word", None),
+            ("languages", "language", None),
+            ("varieties", "variety", None),
+            ("families", "family", None)],
+        edges=[
+            ("count", "count"),
+            ("forms", "forms"),
+            ("words", "word_a"),
+            ("varieties", "variety"),
+            ("languages", "language"),
+            ("families", "family")],
+        form_pair="{0} / {1}",
+        counts=[
+            ("varieties", "variety"), ("languages", "language"),
+            ("families", "family"), ("forms", "form")])
+
+
 def full_colexifications(
         wordlist, 
         family=None, 
         languages=None,
         concept_attr="concepticon_gloss",
-        form_factory=None
+        form_factory=None,
+        workers=None,
+        output="graph",
+        attributes="lists",
+        cache=None,
+        profile=None,
+        partition_by=None,
+        table_factory=None,
+        form_cache=None
         ):
     """
     @param wordlist: A cltoolkit Wordlist instance.
     @param family: A string for a language family (valid in Glottolog). When set to None, won't filter by family.
     @param concepts: A list of concepticon glosses that will be compared with the glosses in the wordlist.
         If set to None, concepts won't be filtered.
+    @param languages: The languages to analyse, by default those of the wordlist.
+    @param workers: Number of processes among which the languages are split.
+    @param output: Return a networkx graph ("graph") or the table of occurrences ("table").
+    @param attributes: Keep the lists of occurrences ("lists") or only their counts ("counts").
+    @param cache: A ResultCache of the results of individual languages.
+    @param profile: A Profile recording the time spent in each stage.
+    @param partition_by: A language attribute or function; the graph is then returned with a
+        dictionary of the graphs of the partitions.
+    @param table_factory: A function returning the table of occurrences, see `_table`.
+    @param form_cache: A FormCache of normalized forms, shared with other analyses.
     @returns: A networkx.Graph instance.
 
     @todo: discuss if we should add a form_factory, deleting tones,
            and the like, for this part of the analysis as well,
            as we do for partial colexifications
     """
-    graph = nx.Graph()
     # concept lookup checks for relevant concepticon attribute
     concept_factory = lambda x: getattr(x, concept_attr) if x else None
     form_factory = form_factory or sounds_without_plus
     
     if languages is None:
-        if family is None:
-            languages = [language for language in wordlist.languages]
-        else:
-            languages = [language for language in wordlist.languages if language.family == family]
-    concepts = [concept_factory(concept) for concept in wordlist.concepts if concept_factory(concept)]
+        languages = get_languages(wordlist, family=family)
+    partitions = None
+    if partition_by is not None:
+        languages, partitions = partition_languages(languages, partition_by)
+    concepts = set([concept_factory(concept) for concept in wordlist.concepts if concept_factory(concept)])
 
-    for language in languages:
-        cols = defaultdict(list)
-        for form in language.forms_with_sounds:
-            if concept_factory(form.concept) in concepts:
-                tform = str(form.sounds)
-                cols[tform] += [form]
-
-        # add nodes to the graph
-        colexs = []
-        for tokens, forms in cols.items():
-            colexs += [
-                    (
-                        tokens, 
-                        [f for f in forms if f.concept], 
-                        [concept_factory(f.concept) for f in forms if concept_factory(f.concept)]
-                        )
-                    ]
-            for (f, concept) in zip(colexs[-1][1], colexs[-1][2]):
-                extend_nodes(
-                        graph,
-                        concept,
-                        forms=[f.id],
-                        words=[tokens],
-                        languages=[language.glottocode],
-                        varieties=[language.id],
-                        families=[language.family]
-                        )
-
-        for tokens, forms, all_concepts in colexs:
-            if len(set(all_concepts)) > 1:
-                for (f1, c1), (f2, c2) in itertools.combinations(zip(forms, all_concepts), r=2):
-                    if c1 == c2:
-                        continue
-                    extend_edges(
-                            graph,
-                            c1,
-                            c2,
-                            count=1,
-                            forms=["{0} / {1}".format(f1.id, f2.id)],
-                            words=[tokens],
-                            varieties=[language.id],
-                            languages=[language.glottocode],
-                            families=[language.family]
-                            )
-    add_counts(graph)
-    return graph
+    if profile is not None:
+        languages = profile.iterate(languages)
+    data = (language_data(
+                language, concept_factory, form_factory, concepts=concepts,
+                timer=profile.timer(language.id) if profile else None,
+                form_cache=form_cache)
+            for language in languages)
+    table = collect_results(
+            _table(
+                FULL_COLEXIFICATIONS, attributes, partitions=partitions,
+                table_factory=table_factory),
+            map_languages(
+                _full_language,
+                data,
+                workers=workers,
+                cache=cache.analysis(
+                    _full_language,
+                    form_factory=form_factory,
+                    concept_attr=concept_attr) if cache else None,
+                profile=profile),
+            profile=profile)
+    return _output(table, output, profile=profile)
 
 
 def affix_colexifications_by_pairwise_comparison(
@@ -179,8 +437,13 @@ def affix_colexifications_by_pairwise_comparison(
         difference_threshold=2,
         form_factory=None,
         concept_attr="concepticon_gloss",
-        family=None):
+        family=None,
+        form_cache=None,
+        profile=None):
     """
+    @param form_cache: A FormCache keeping the normalized forms.
+    @param profile: A Profile recording the stages "read", "forms",
+        "form_factory", and "analysis" of each language.
     """
     
     graph = nx.DiGraph()
@@ -191,11 +454,24 @@ def affix_colexifications_by_pairwise_comparison(
 
     form_factory = form_factory or sounds_without_plus
     concept_factory = lambda x: getattr(x, concept_attr) if x else None
+    normalize = normalizer(form_factory, form_cache)
+    if profile is not None:
+        languages = profile.iterate(languages)
 
     
-    for language in progressbar(languages, desc="computing affix colexifications (pairwise)"):
+    for language in progressbar(
+            languages, desc="computing affix colexifications (pairwise)",
+            disable=profile is not None):
+        timer = profile.timer(language.id) if profile else NULL_TIMER
+        with timer.stage("forms") as stage:
+            forms_with_sounds = language.forms_with_sounds
+            stage.items = len(forms_with_sounds)
+        normalize_form = normalize if profile is None else timer.timed("form_factory", normalize)
         cols = defaultdict(list)
-        valid_forms = [(f, form_factory(f), concept_factory(f.concept)) for f in language.forms_with_sounds if concept_factory(f.concept)]
+        valid_forms = [(f, normalize_form(f)[0], concept_factory(f.concept)) for f in forms_with_sounds if concept_factory(f.concept)]
+        if profile is not None:
+            normalize_form.flush()
+        start = perf_counter()
         for (formA, sndsA, concept_a), (formB, sndsB, concept_b) in itertools.combinations(valid_forms, r=2):
             lA, lB = len(sndsA), len(sndsB)
             if concept_a and concept_a != concept_b:
@@ -323,9 +599,94 @@ def affix_colexifications_by_pairwise_comparison(
                                     languages=[language.glottocode],
                                     families=[language.family],
                                     )
+        timer.record("analysis", perf_counter() - start, 1, len(valid_forms))
     return graph
 
 
+def form_index(forms):
+    """
+    Index the forms of one language by their normalized form.
+
+    @param forms: A list of (form ID, concept, normalized form, sounds) tuples.
+    @returns: A dictionary with the normalized forms as keys and the lists of
+        the positions of the forms as values.
+    """
+    index = defaultdict(list)
+    for k, form in enumerate(forms):
+        index[form[2]].append(k)
+    return index
+
+
+def _affix_language(
+        forms,
+        source_threshold=2,
+        target_threshold=5,
+        difference_threshold=2,
+        timer=None,
+        index=None):
+    timer = timer or NULL_TIMER
+    with timer.stage("candidates") as stage:
+        # look up the affix candidates of each target among the forms, rather
+        # than indexing the candidates of all targets
+        index = form_index(forms) if index is None else index
+        pairs = set()
+        for b, form in enumerate(forms):
+            tform = form[2]
+            if len(tform) >= target_threshold:
+                for ngram in affix_candidates(tform, source_threshold, difference_threshold):
+                    for a in index.get(ngram, ()):
+                        pairs.add((a, b))
+        stage.items = len(pairs)
+
+    with timer.stage("pairs") as stage:
+        nodes, edges = [], []
+        previous, visited = None, None
+        for a, b in sorted(pairs):
+            form_id, concept, tform, _ = forms[a]
+            form_b, concept_b, target, _ = forms[b]
+            if concept == concept_b:
+                continue
+            if a != previous:
+                nodes += [(concept, "source", form_id, tform)]
+                previous, visited = a, set()
+            if form_b not in visited:
+                visited.add(form_b)
+                nodes += [(concept_b, "target", form_b, target)]
+                edges += [(concept, concept_b, form_id, form_b, tform, target)]
+        stage.items = len(edges)
+    return nodes, edges
+
+
+AFFIX_COLEXIFICATIONS = Schema(
+        directed=True,
+        nodes=[
+            ("source_families", "family", "source"),
+            ("source_forms", "word", "source"),
+            ("source_languages", "language", "source"),
+            ("source_occurrences", "form", "source"),
+            ("source_varieties", "variety", "source"),
+            ("target_families", "family", "target"),
+            ("target_forms", "word", "target"),
+            ("target_languages", "language", "target"),
+            ("target_occurrences", "form", "target"),
+            ("target_varieties", "variety", "target"),
+            ("varieties", "variety", None),
+            ("families", "family", None),
+            ("languages", "language", None)],
+        edges=[
+            ("count", "count"),
+            ("source_forms", "word_a"),
+            ("target_forms", "word_b"),
+            ("varieties", "variety"),
+            ("languages", "language"),
+            ("families", "family")],
+        form_pair="{0} / {1}",
+        counts=[
+            ("varieties", "variety"),
+            ("families", "family"),
+            ("languages", "language")])
+
+
 def affix_colexifications(
         wordlist, 
         source_threshold=2,
@@ -333,7 +694,16 @@ def affix_colexifications(
         difference_threshold=2,
         concept_attr="concepticon_gloss",
         form_factory=None,
-        family=None
+        family=None,
+        workers=None,
+        encoder=None,
+        output="graph",
+        attributes="lists",
+        cache=None,
+        profile=None,
+        partition_by=None,
+        table_factory=None,
+        form_cache=None
         ):
     """
     Compute affix colexifications from a wordlist.
@@ -344,93 +714,48 @@ def affix_colexifications(
     @param difference_threshold: minimal length difference between source and target.
     @param concept_attr: the attribute of the Concept class in CL Toolkit.
     @param family: select if you want to restrict colexifications to one family.
+    @param encoder: A SegmentEncoder for the normalized forms, shared with other analyses.
+
+    The other parameters are those of `full_colexifications`.
     """
-    graph = nx.DiGraph()
     # concept conversion, using concepticon gloss as default
     concept_factory = lambda x: getattr(x, concept_attr) if x else None
     form_factory = form_factory or sounds_without_plus
+    encoder = encoder or SegmentEncoder()
 
-    if family is None:
-        languages = [language for language in wordlist.languages]
-    else:
-        languages = [language for language in wordlist.languages if language.family == family]
-
-    for language in progressbar(languages, desc="computing affix colexifications"):
-        affixes = defaultdict(list)
-        valid_forms = [(f, concept_factory(f.concept), form_factory(f)) for f in language.forms_with_sounds if concept_factory(f.concept)]
-        # first run, only extract source forms
-        for (form, concept, tform) in valid_forms:
-            wlen = len(tform)
-            if wlen >= target_threshold:
-                for ngram in affix_candidates(tform, source_threshold, difference_threshold):
-                    affixes[ngram] += [(form, concept, tform)]
-        cols = defaultdict(list)
-        for (form, concept, tform) in valid_forms:
-            wlen = len(tform)
-            if wlen >= source_threshold and tform in affixes:
-                targets, visited = [], set()
-                for (affixed_form, concept_b, tform_b) in affixes[tform]:
-                    if concept != concept_b and affixed_form.id not in visited:
-                        targets += [(affixed_form, concept_b, " ".join(tform_b))]
-                        visited.add(affixed_form.id)
-                if targets:
-                    cols[form.id] = ((form, concept, " ".join(tform)), targets)
-
-        for (source, concept, tform), targets in cols.values():
-            extend_nodes(
-                    graph, 
-                    concept, 
-                    source_families=[language.family],
-                    source_forms=[tform],
-                    source_languages=[language.glottocode],
-                    source_occurrences=[source.id],
-                    source_varieties=[language.id],
-                    target_families=[],
-                    target_forms=[],
-                    target_languages=[],
-                    target_occurrences=[],
-                    target_varieties=[],
-                    varieties=[language.id],
-                    families=[language.family],
-                    languages=[language.glottocode]
-                    )
-            for (t, tconcept, tform_b) in targets:
-                extend_nodes(
-                        graph,
-                        tconcept,
-                        source_families=[],
-                        source_forms=[],
-                        source_languages=[],
-                        source_occurrences=[],
-                        source_varieties=[],
-                        target_families=[language.family],                           
-                        target_forms=[tform_b],
-                        target_languages=[language.glottocode],
-                        target_occurrences=[t.id],
-                        target_varieties=[language.id],
-                        varieties=[language.id],
-                        families=[language.family],
-                        languages=[language.glottocode]
-                        )
-                
-                # add the edges
-                extend_edges(
-                        graph,
-                        concept,
-                        tconcept,
-                        count=1,
-                        source_forms=[tform],
-                        target_forms=[tform_b],
-                        varieties=[language.id],
-                        languages=[language.glottocode],
-                        families=[language.family]
-                        )
-    add_counts(graph, counts=[
-        ("varieties", "variety"),
-        ("families", "family"),
-        ("languages", "language")
-    ])
-    return graph
+    languages = get_languages(wordlist, family=family)
+    partitions = None
+    if partition_by is not None:
+        languages, partitions = partition_languages(languages, partition_by)
+    if profile is not None:
+        languages = profile.iterate(languages)
+    data = (language_data(
+                language, concept_factory, form_factory, encoder=encoder,
+                timer=profile.timer(language.id) if profile else None,
+                form_cache=form_cache)
+            for language in languages)
+    function = functools.partial(
+            _affix_language,
+            source_threshold=source_threshold,
+            target_threshold=target_threshold,
+            difference_threshold=difference_threshold)
+    table = collect_results(
+            _table(
+                AFFIX_COLEXIFICATIONS, attributes, decode=encoder.decode,
+                partitions=partitions, table_factory=table_factory),
+            map_languages(
+                function,
+                data,
+                workers=workers,
+                cache=cache.analysis(
+                    function,
+                    encoder=encoder,
+                    form_factory=form_factory,
+                    concept_attr=concept_attr) if cache else None,
+                profile=profile),
+            desc="computing affix colexifications",
+            profile=profile)
+    return _output(table, output, profile=profile)
 
 
 def common_ngrams(
@@ -439,21 +764,28 @@ def common_ngrams(
         difference_threshold=2,
         form_factory=None,
         concept_factory=None,
-        candidates=None
+        candidates=None,
+        form_cache=None
         ):
     """
     Return all ngrams recurring in more than one word for a CL Toolkit language.
 
     Note that common ngrams here are those which occur in affix position.
+
+    @param form_cache: A FormCache keeping the normalized forms.
     """
     form_factory = form_factory or sounds_without_plus
+    normalize = normalizer(form_factory, form_cache)
     if not concept_factory:
         concept_factory = lambda x: getattr(x, "concepticon_gloss") if x else None
     candidates = candidates or affix_candidates
-    valid_forms = [(f, concept_factory(f.concept), form_factory(f)) for f in
-            language.forms_with_sounds if concept_factory(f.concept) and
-            len(form_factory(f)) >= minimal_length_threshold +
-            difference_threshold]
+    valid_forms = []
+    for f in language.forms_with_sounds:
+        concept = concept_factory(f.concept)
+        if concept:
+            tform = normalize(f)[0]
+            if len(tform) >= minimal_length_threshold + difference_threshold:
+                valid_forms += [(f, concept, tform)]
 
     ngrams = defaultdict(list)
     for (form, concept, tform) in valid_forms:
@@ -468,69 +800,276 @@ def common_ngrams(
             reverse=True)
 
 
+def _common_substring_language(
+        forms,
+        minimal_length_threshold=4,
+        difference_threshold=3,
+        engine="ngrams",
+        timer=None):
+    timer = timer or NULL_TIMER
+    nodes, edges = [], []
+    if engine == "trie":
+        with timer.stage("pairs") as stage:
+            shared = common_substring_pairs(
+                    [form[2] for form in forms],
+                    minimal_length_threshold=minimal_length_threshold,
+                    difference_threshold=difference_threshold)
+            stage.items = sum([len(pairs) for _, pairs in shared])
+        with timer.stage("filter") as stage:
+            for ngram, pairs in shared:
+                for i, j in pairs:
+                    (f_a, concept_a, tup_a, snd_a), (f_b, concept_b, tup_b, snd_b) = \
+                            forms[i], forms[j]
+                    if concept_a != concept_b and snd_a != snd_b and not (
+                            affixes(tup_a, tup_b) or affixes(tup_b, tup_a)):
+                        nodes += [(concept_a, None, f_a, None), (concept_b, None, f_b, None)]
+                        edges += [(concept_a, concept_b, f_a, f_b, ngram, ngram)]
+            stage.items = len(edges)
+        return nodes, edges
+
+    with timer.stage("candidates") as stage:
+        ngrams = defaultdict(list)
+        for form in forms:
+            if len(form[2]) >= minimal_length_threshold + difference_threshold:
+                for ngram in affix_candidates(
+                        form[2], minimal_length_threshold, difference_threshold):
+                    ngrams[ngram] += [form]
+        stage.items = len(ngrams)
+
+    with timer.stage("pairs") as stage:
+        visited_forms = set()
+        for ngram, bucket in sorted(
+                [(a, b) for a, b in ngrams.items() if len(b) > 1],
+                key=lambda x: len(x[0]),
+                reverse=True):
+            for (f_a, concept_a, tup_a, snd_a), (f_b, concept_b, tup_b, snd_b) in \
+                    itertools.combinations(bucket, r=2):
+                if concept_a != concept_b and snd_a != snd_b:
+                    # check for visited form identifiers to only count each substring once
+                    if (f_a, f_b) in visited_forms:
+                        pass
+                    elif affixes(tup_a, tup_b) or affixes(tup_b, tup_a):
+                        visited_forms.update([(f_a, f_b), (f_b, f_a)])
+                    else:
+                        visited_forms.update([(f_a, f_b), (f_b, f_a)])
+                        nodes += [(concept_a, None, f_a, None), (concept_b, None, f_b, None)]
+                        edges += [(concept_a, concept_b, f_a, f_b, ngram, ngram)]
+        stage.items = len(edges)
+    return nodes, edges
+
+
+COMMON_SUBSTRING_COLEXIFICATIONS = Schema(
+        directed=False,
+        nodes=[
+            ("families", "family", None),
+            ("languages", "language", None),
+            ("forms", "form", None),
+            ("varieties", "variety", None)],
+        edges=[
+            ("count", "count"),
+            ("forms", "forms"),
+            ("substrings", "word_a"),
+            ("varieties", "variety"),
+            ("languages", "language"),
+            ("families", "family")],
+        form_pair="{0} {1}",
+        counts=[
+            ("varieties", "variety"), ("languages", "language"),
+            ("families", "family"), ("forms", "form")])
+
+
 def common_substring_colexifications(
         wordlist,
         minimal_length_threshold=4,
         difference_threshold=3,
         concept_attr="concepticon_gloss",
         form_factory=None,
-        family=None):
+        family=None,
+        workers=None,
+        encoder=None,
+        engine="ngrams",
+        output="graph",
+        attributes="lists",
+        cache=None,
+        profile=None,
+        partition_by=None,
+        table_factory=None,
+        form_cache=None):
     """
     Compute common substring colexifications from a wordlist.
 
     @param wordlist: The wordlist in CLToolkit.
     @param minimal_length_threshold: the threshold of the word form that should be the suffix of the other word.
     @param difference_threshold: minimal length difference between source and target.
+    @param engine: Either "ngrams", to compare all forms sharing an n-gram,
+        or "trie", to find the longest substring shared by two forms with an
+        AffixTrie. Both engines yield the same graph. The trie visits each
+        pair of forms once, but building it in Python costs more than it
+        saves on wordlists of the size of IDS, so that "ngrams" is the
+        default.
+
+    The other parameters are those of `affix_colexifications`.
     """
-    graph = nx.Graph()
     # concept conversion, using concepticon gloss as default
     concept_factory = lambda x: getattr(x, concept_attr) if x else None
     form_factory = form_factory or sounds_without_plus
+    encoder = encoder or SegmentEncoder()
 
-    if family is None:
-        languages = [language for language in wordlist.languages]
-    else:
-        languages = [language for language in wordlist.languages if language.family == family]
+    languages = get_languages(wordlist, family=family)
+    partitions = None
+    if partition_by is not None:
+        languages, partitions = partition_languages(languages, partition_by)
+    if profile is not None:
+        languages = profile.iterate(languages)
+    data = (language_data(
+                language, concept_factory, form_factory, encoder=encoder,
+                timer=profile.timer(language.id) if profile else None,
+                form_cache=form_cache)
+            for language in languages)
+    function = functools.partial(
+            _common_substring_language,
+            minimal_length_threshold=minimal_length_threshold,
+            difference_threshold=difference_threshold,
+            engine=engine)
+    table = collect_results(
+            _table(
+                COMMON_SUBSTRING_COLEXIFICATIONS, attributes, decode=encoder.decode,
+                partitions=partitions, table_factory=table_factory),
+            map_languages(
+                function,
+                data,
+                workers=workers,
+                cache=cache.analysis(
+                    function,
+                    encoder=encoder,
+                    form_factory=form_factory,
+                    concept_attr=concept_attr) if cache else None,
+                profile=profile),
+            desc="computing common substring colexifications",
+            profile=profile)
+    return _output(table, output, profile=profile)
 
-    for language in progressbar(languages, desc="computing common substring colexifications"):
-        ngrams = common_ngrams(
-                language, 
-                minimal_length_threshold=minimal_length_threshold,
-                difference_threshold=difference_threshold,
-                form_factory=form_factory,
-                concept_factory=concept_factory
-                )
-        visited_forms = set()
-        for ngram, forms in ngrams:
-            for (f_a, concept_a, str_a, tup_a), (f_b, concept_b, str_b, tup_b) in itertools.combinations(forms, r=2):
-                if concept_a != concept_b and str(f_a.sounds) != str(f_b.sounds):
-                    # check for visited form identifiers to only count each substring once
-                    if (f_a.id, f_b.id) in visited_forms:
-                        pass
-                    elif affixes(tup_a, tup_b) or affixes(tup_b, tup_a):
-                        visited_forms.update([(f_a.id, f_b.id), (f_b.id, f_a.id)])
-                    else:
-                        visited_forms.update([(f_a.id, f_b.id), (f_b.id, f_a.id)])
-                        for (concept, form, tform) in ((concept_a, f_a, str_a), (concept_b, f_b, str_b)):
-                            extend_nodes(
-                                    graph,
-                                    concept,
-                                    families=[language.family],
-                                    languages=[language.glottocode],
-                                    forms=[form.id],
-                                    varieties=[language.id]
-                                    )
-                        extend_edges(
-                                graph,
-                                concept_a,
-                                concept_b,
-                                count=1,
-                                forms=["{0} {1}".format(f_a.id, f_b.id)],
-                                substrings=[" ".join(ngram)],
-                                varieties=[language.id],
-                                languages=[language.glottocode],
-                                families=[language.family],
-                            )
-    add_counts(graph)
-    return graph
 
+
+# per-language functions, graph layouts, and whether words are encoded forms
+# for the analyses; the functions take the thresholds of the corresponding
+# functions above as keyword arguments
+ANALYSES = {
+        "full": (_full_language, FULL_COLEXIFICATIONS, False),
+        "affix": (_affix_language, AFFIX_COLEXIFICATIONS, True),
+        "common_substring": (
+            _common_substring_language, COMMON_SUBSTRING_COLEXIFICATIONS, True),
+        }
+
+
+def _combined_language(forms, analyses, concepts=None, timer=None):
+    """
+    Analyse the forms of one language with several analyses.
+
+    The index of the normalized forms is built once and shared by the
+    analyses using it.
+
+    @param analyses: A list of (analysis, parameters) tuples.
+    @param concepts: The concepts of the full colexifications.
+    @returns: A list of the partial results of the analyses.
+    """
+    timer = timer or NULL_TIMER
+    results, index = [], None
+    for name, parameters in analyses:
+        with timer.stage(name):
+            if name == "full":
+                results.append(_full_language(
+                    [form for form in forms if concepts is None or form[1] in concepts],
+                    timer=timer, **parameters))
+            elif name == "affix":
+                if index is None:
+                    index = form_index(forms)
+                results.append(_affix_language(forms, timer=timer, index=index, **parameters))
+            else:
+                results.append(ANALYSES[name][0](forms, timer=timer, **parameters))
+    return results
+
+
+def combined_colexifications(
+        wordlist,
+        analyses=("full", "affix", "common_substring"),
+        concept_attr="concepticon_gloss",
+        form_factory=None,
+        family=None,
+        workers=None,
+        encoder=None,
+        output="graph",
+        attributes="lists",
+        profile=None,
+        partition_by=None,
+        table_factory=None,
+        form_cache=None):
+    """
+    Compute several kinds of colexifications in one pass over a wordlist.
+
+    The forms of each language are read, normalized, and encoded once, and
+    all analyses of a language run in one call, in a worker process if
+    workers are used. The graphs are the same as those of
+    `full_colexifications`, `affix_colexifications`, and
+    `common_substring_colexifications`.
+
+    @param wordlist: The wordlist in CLToolkit.
+    @param analyses: A list of the names of the analyses in ANALYSES, or a
+        dictionary with the names as keys and dictionaries with the
+        thresholds of the analyses as values, such as {"affix":
+        {"source_threshold": 3}}.
+    @param profile: A Profile, in which the stages of each analysis are
+        recorded within a stage named after the analysis.
+    @returns: A dictionary with the names of the analyses as keys and the
+        graphs, or tables if output is "table", as values. With
+        partition_by, the values are the tuples returned by the analyses.
+
+    The other parameters are those of `affix_colexifications`.
+    """
+    if not isinstance(analyses, dict):
+        analyses = OrderedDict([(name, {}) for name in analyses])
+    for name in analyses:
+        if name not in ANALYSES:
+            raise ValueError("unknown analysis {0}".format(name))
+    concept_factory = lambda x: getattr(x, concept_attr) if x else None
+    form_factory = form_factory or sounds_without_plus
+    encoder = encoder or SegmentEncoder()
+
+    languages = get_languages(wordlist, family=family)
+    partitions = None
+    if partition_by is not None:
+        languages, partitions = partition_languages(languages, partition_by)
+    if profile is not None:
+        languages = profile.iterate(languages)
+    concepts = None
+    if "full" in analyses:
+        concepts = set([concept_factory(concept) for concept in wordlist.concepts if
+                        concept_factory(concept)])
+    data = (language_data(
+                language, concept_factory, form_factory, encoder=encoder,
+                timer=profile.timer(language.id) if profile else None,
+                form_cache=form_cache)
+            for language in languages)
+    tables = [
+            _table(
+                ANALYSES[name][1], attributes,
+                decode=encoder.decode if ANALYSES[name][2] else None,
+                partitions=partitions, table_factory=table_factory)
+            for name in analyses]
+    results = map_languages(
+            functools.partial(
+                _combined_language,
+                analyses=list(analyses.items()),
+                concepts=concepts),
+            data,
+            workers=workers,
+            profile=profile)
+    if profile is None:
+        results = progressbar(results, desc="computing colexifications")
+    for language, result in results:
+        with (profile.timer(language[0]) if profile else NULL_TIMER).stage(
+                "collect", sum([len(nodes) + len(edges) for nodes, edges in result])):
+            for table, (nodes, edges) in zip(tables, result):
+                table.add(language, nodes, edges)
+    return OrderedDict([
+        (name, _output(table, output, profile=profile)) for name, table in zip(analyses, tables)])
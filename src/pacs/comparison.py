@@ -0,0 +1,211 @@
+"""
+Comparison of several colexification graphs over shared node and edge indexes.
+"""
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from pacs.degree import EdgeArrays
+
+__all__ = ['compare_graphs', 'rank', 'spearman', 'kendall_tau', 'kendall_test']
+
+
+def rank(values):
+    """
+    Return the ranks of values, starting from 1, with the average rank for
+    ties.
+    """
+    values = np.asarray(values)
+    order = np.argsort(values, kind="stable")
+    ordered = values[order]
+    starts = np.flatnonzero(np.concatenate([[True], ordered[1:] != ordered[:-1]]))
+    ends = np.append(starts[1:], len(values))
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[order] = np.repeat((starts + ends + 1) / 2, ends - starts)
+    return ranks
+
+
+def _pearson(a, b):
+    a, b = a - a.mean(), b - b.mean()
+    norm = np.sqrt((a * a).sum() * (b * b).sum())
+    return float((a * b).sum() / norm) if norm else np.nan
+
+
+def spearman(a, b):
+    """
+    Return the Spearman rank correlation of two arrays, or NaN if it is not
+    defined.
+    """
+    if len(a) < 2:
+        return np.nan
+    return _pearson(rank(a), rank(b))
+
+
+def _ties(values):
+    _, counts = np.unique(values, return_counts=True)
+    return counts[counts > 1].astype(np.float64)
+
+
+def kendall_test(a, b, block_size=2**22):
+    """
+    Return Kendall's tau-b of two arrays and its two-sided p-value, or NaN
+    for both if they are not defined.
+
+    Concordant and discordant pairs are counted over blocks of pairs, so that
+    at most `block_size` pairs are held in memory. The p-value is computed
+    from the normal approximation of the number of concordant minus
+    discordant pairs with the variance corrected for ties, as the
+    asymptotic method of `scipy.stats.kendalltau`.
+    """
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    n = len(a)
+    if n < 2:
+        return np.nan, np.nan
+    rows = max(1, block_size // n)
+    score = 0
+    for start in range(0, n, rows):
+        stop = min(n, start + rows)
+        score += int((np.sign(a[start:stop, None] - a[None, :]) *
+                      np.sign(b[start:stop, None] - b[None, :])).sum())
+    # each pair is counted twice
+    score //= 2
+    ties_a, ties_b = _ties(a), _ties(b)
+    tied_a, tied_b = (ties_a * (ties_a - 1) / 2).sum(), (ties_b * (ties_b - 1) / 2).sum()
+    pairs = n * (n - 1) / 2
+    norm = math.sqrt((pairs - tied_a) * (pairs - tied_b))
+    if not norm:
+        return np.nan, np.nan
+    m = float(n * (n - 1))
+    variance = (m * (2 * n + 5) - (ties_a * (ties_a - 1) * (2 * ties_a + 5)).sum() -
+                (ties_b * (ties_b - 1) * (2 * ties_b + 5)).sum()) / 18
+    variance += 2 * tied_a * tied_b / m
+    if n > 2:
+        variance += (ties_a * (ties_a - 1) * (ties_a - 2)).sum() * \
+            (ties_b * (ties_b - 1) * (ties_b - 2)).sum() / (9 * m * (n - 2))
+    pvalue = math.erfc(abs(score) / math.sqrt(variance) / math.sqrt(2)) if variance > 0 \
+        else np.nan
+    return score / norm, pvalue
+
+
+def kendall_tau(a, b, block_size=2**22):
+    """
+    Return Kendall's tau-b of two arrays, or NaN if it is not defined.
+    """
+    return kendall_test(a, b, block_size=block_size)[0]
+
+
+def _edge_keys(edges, index, size, directed):
+    """
+    Return the keys of the edges of one graph in the shared node index.
+    """
+    nodes = np.array([index[node] for node in edges.nodes], dtype=np.int64)
+    source, target = nodes[edges.source], nodes[edges.target]
+    if directed and not edges.directed:
+        source, target = np.concatenate([source, target]), np.concatenate([target, source])
+    elif not directed:
+        source, target = np.minimum(source, target), np.maximum(source, target)
+    return source * size + target
+
+
+def compare_graphs(
+        graphs,
+        weight="family_count",
+        threshold=2,
+        kinds=None,
+        directed=False):
+    """
+    Compare several graphs on their shared nodes and edges.
+
+    The nodes of all graphs are aligned on one index, with the weighted
+    degree of each node in each graph as computed by `pacs.util.degree`, and
+    the edges are aligned on one index with their weights in each graph, so
+    that the statistics of all pairs of graphs are computed from the same
+    arrays.
+
+    @param graphs: A dictionary of names and networkx graphs. A graph can
+        occur under several names, for example with different kinds of
+        degrees.
+    @param weight: The edge attribute of the degrees and the weighted overlap.
+    @param threshold: Only edges with weights above the threshold are counted
+        for the degrees.
+    @param kinds: A dictionary of names and kinds of degrees, "degree",
+        "in_degree", or "out_degree", by default "degree".
+    @param directed: Compare the edges as directed edges, where the edges of
+        undirected graphs count in both directions. Otherwise, reciprocal
+        edges of directed graphs are counted once with the highest weight.
+    @returns: A dictionary with the names, the nodes, an array of the degrees
+        of the nodes with NaN for missing nodes, and matrices of the number of
+        common nodes ("common_nodes") and their Jaccard index
+        ("node_jaccard"), the Spearman and Kendall tau-b correlations of the
+        degrees of the common nodes ("spearman", "kendall"), the number of
+        common edges ("common_edges") and their Jaccard index
+        ("edge_jaccard"), and the weighted Jaccard index of the edge weights
+        ("weighted_overlap").
+    """
+    names = list(graphs)
+    kinds = kinds or {}
+    arrays = {}
+    for name in names:
+        if id(graphs[name]) not in arrays:
+            arrays[id(graphs[name])] = EdgeArrays(graphs[name], weights=[weight])
+
+    index = OrderedDict()
+    for name in names:
+        for node in arrays[id(graphs[name])].nodes:
+            index.setdefault(node, len(index))
+    size = len(index)
+    degrees = np.full((len(names), size), np.nan)
+    nodes = np.zeros((len(names), size), dtype=bool)
+    keys = []
+    for i, name in enumerate(names):
+        edges = arrays[id(graphs[name])]
+        positions = np.array([index[node] for node in edges.nodes], dtype=np.int64)
+        nodes[i, positions] = True
+        degrees[i, positions] = getattr(edges, kinds.get(name, "degree"))(
+                weight, [threshold])[0]
+        keys.append(_edge_keys(edges, index, size, directed))
+
+    shared = np.unique(np.concatenate(keys + [np.zeros(0, dtype=np.int64)]))
+    weights = np.zeros((len(names), len(shared)))
+    present = np.zeros((len(names), len(shared)), dtype=bool)
+    for i, (name, key) in enumerate(zip(names, keys)):
+        values = arrays[id(graphs[name])].weight(weight).astype(np.float64)
+        if directed and not arrays[id(graphs[name])].directed:
+            values = np.concatenate([values, values])
+        positions = np.searchsorted(shared, key)
+        np.maximum.at(weights[i], positions, values)
+        present[i, positions] = True
+
+    out = OrderedDict([("names", names), ("nodes", list(index)), ("degrees", degrees)])
+    node_counts = nodes.astype(np.int64)
+    common_nodes = node_counts @ node_counts.T
+    edge_counts = present.astype(np.int64)
+    common_edges = edge_counts @ edge_counts.T
+    out["common_nodes"] = common_nodes
+    out["node_jaccard"] = _jaccard(common_nodes)
+    out["common_edges"] = common_edges
+    out["edge_jaccard"] = _jaccard(common_edges)
+
+    for statistic in ("spearman", "kendall", "kendall_pvalue", "weighted_overlap"):
+        out[statistic] = np.eye(len(names))
+    np.fill_diagonal(out["kendall_pvalue"], 0)
+    for i in range(len(names)):
+        for j in range(i + 1, len(names)):
+            common = nodes[i] & nodes[j]
+            a, b = degrees[i, common], degrees[j, common]
+            out["spearman"][i, j] = out["spearman"][j, i] = spearman(a, b)
+            out["kendall"][i, j], out["kendall_pvalue"][i, j] = kendall_test(a, b)
+            out["kendall"][j, i], out["kendall_pvalue"][j, i] = \
+                out["kendall"][i, j], out["kendall_pvalue"][i, j]
+            total = np.maximum(weights[i], weights[j]).sum()
+            out["weighted_overlap"][i, j] = out["weighted_overlap"][j, i] = \
+                np.minimum(weights[i], weights[j]).sum() / total if total else np.nan
+    return out
+
+
+def _jaccard(common):
+    sizes = np.diag(common)
+    union = sizes[:, None] + sizes[None, :] - common
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(union > 0, common / np.maximum(union, 1), np.nan)
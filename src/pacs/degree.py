@@ -0,0 +1,155 @@
+"""
+Weighted degrees of colexification graphs computed over arrays of edges.
+"""
+import numpy as np
+
+__all__ = ['EdgeArrays', 'degrees']
+
+
+class EdgeArrays:
+    """
+    The edges of a graph as arrays of node indices and weights.
+
+    Edges are stored in the order of the adjacency of the graph, and weights
+    are read from the graph once per attribute. Degrees are computed for
+    several thresholds at once, with one call to `np.bincount` for each kind of
+    degree. Integer weights yield the same degrees as `pacs.util.degree` and
+    the like, float weights may differ in the last digits, since they are
+    added in a different order.
+
+    @param graph: A networkx graph.
+    @param weights: The edge attributes read when the arrays are created.
+        Other attributes are read when they are first used.
+    """
+
+    def __init__(self, graph, weights=()):
+        self.graph = graph
+        self.nodes = list(graph.nodes)
+        self.directed = graph.is_directed()
+        index = {node: i for i, node in enumerate(self.nodes)}
+        edges = list(graph.edges)
+        self.source = np.array([index[a] for a, _ in edges], dtype=np.int64)
+        self.target = np.array([index[b] for _, b in edges], dtype=np.int64)
+        self.loop = self.source == self.target
+        self.weights = {}
+        for weight in weights:
+            self.weight(weight)
+        self._first, self._reverse = None, None
+
+    def __len__(self):
+        return len(self.source)
+
+    def weight(self, name):
+        """
+        Return the weights of the edges for an attribute.
+        """
+        if name not in self.weights:
+            self.weights[name] = np.array(
+                    [data[name] for _, _, data in self.graph.edges(data=True)])
+        return self.weights[name]
+
+    def first(self):
+        """
+        Return for each edge whether its reverse edge occurs before it.
+
+        This is only the case for directed graphs with reciprocal edges.
+        """
+        if self._first is None:
+            self._first = np.zeros(len(self), dtype=bool)
+            if self.directed and len(self):
+                n = len(self.nodes)
+                codes = self.source * n + self.target
+                order = np.argsort(codes, kind="stable")
+                pos = np.searchsorted(codes[order], self.target * n + self.source)
+                pos[pos == len(self)] = 0
+                reverse = order[pos]
+                found = (codes[reverse] == self.target * n + self.source) & ~self.loop
+                self._first = found & (reverse < np.arange(len(self)))
+                self._reverse = np.where(found, reverse, -1)
+        return self._first
+
+    def _sum(self, index, values, mask):
+        """
+        Add the values of edges passing the thresholds to the nodes.
+        """
+        n = len(self.nodes)
+        rows = np.arange(mask.shape[0])[:, None] * n
+        out = np.bincount(
+                (index[None, :] + rows)[mask],
+                weights=np.broadcast_to(values, mask.shape)[mask],
+                minlength=mask.shape[0] * n).reshape(mask.shape[0], n)
+        if values.dtype.kind in "iub":
+            return out.astype(np.int64)
+        return out
+
+    def _mask(self, weight, thresholds):
+        values = self.weight(weight)
+        return values, values[None, :] > np.asarray(thresholds)[:, None]
+
+    def out_degree(self, weight, thresholds=(2, )):
+        """
+        Return the sum of the weights of outgoing edges above each threshold.
+
+        @returns: An array with one row for each threshold and one column for
+            each node.
+        """
+        values, mask = self._mask(weight, thresholds)
+        if self.directed:
+            return self._sum(self.source, values, mask)
+        return self._undirected(values, mask)
+
+    def in_degree(self, weight, thresholds=(2, )):
+        """
+        Return the sum of the weights of incoming edges above each threshold.
+        """
+        values, mask = self._mask(weight, thresholds)
+        if self.directed:
+            return self._sum(self.target, values, mask)
+        return self._undirected(values, mask)
+
+    def degree(self, weight, thresholds=(2, )):
+        """
+        Return the sum of the weights of edges above each threshold.
+
+        Reciprocal edges of directed graphs only count once, with the weight of
+        the first edge above the threshold in the order of the adjacency.
+        """
+        values, mask = self._mask(weight, thresholds)
+        if self.directed and self.first().any():
+            first = self.first()
+            reverse = self._reverse[first]
+            mask[:, first] &= ~mask[:, reverse]
+        return self._undirected(values, mask)
+
+    def _undirected(self, values, mask):
+        # loops only count once for their node
+        return self._sum(self.source, values, mask) + \
+            self._sum(self.target, values, mask & ~self.loop[None, :])
+
+    def as_dict(self, values):
+        """
+        Return the values of one row of degrees as a dictionary of nodes.
+        """
+        return dict(zip(self.nodes, values.tolist()))
+
+
+def degrees(graph, weights, thresholds=(2, ), kinds=("degree", "in_degree", "out_degree")):
+    """
+    Compute weighted degrees of a graph for several weights and thresholds.
+
+    @param graph: A networkx graph.
+    @param weights: The edge attributes used as weights.
+    @param thresholds: Only edges with weights above the threshold are counted.
+    @param kinds: The kinds of degrees, as named by the methods of EdgeArrays.
+    @returns: A dictionary with (kind, weight, threshold) tuples as keys and
+        dictionaries of nodes and their degrees as values, as returned by
+        `pacs.util.degree` and the like.
+    """
+    edges = EdgeArrays(graph, weights=weights)
+    out = {}
+    for kind in kinds:
+        for weight in weights:
+            values = getattr(edges, kind)(weight, thresholds)
+            for threshold, row in zip(thresholds, values):
+                out[kind, weight, threshold] = edges.as_dict(row)
+    return out
@@ -0,0 +1,58 @@
+"""
+Integer encoding of segments and forms.
+"""
+
+
+class SegmentEncoder:
+    """
+    Encode normalized forms as strings of interned segment codes.
+
+    Each segment is interned as a small integer, and a form is stored as a
+    string whose characters have the codes of its segments as code points.
+    These strings take one byte per segment for up to 256 distinct segments,
+    cache their hash, and can be sliced like tuples, so they serve directly as
+    keys in the affix and n-gram indexes. Identical forms share one string.
+    Readable strings with space-separated segments are only built by `decode`.
+
+    An encoder can be shared by all analyses of one wordlist.
+    """
+
+    def __init__(self):
+        self.segments = []
+        self.codes = {}
+        self.forms = {}
+        self.words = {}
+
+    def __len__(self):
+        return len(self.segments)
+
+    def segment(self, segment):
+        """
+        Return the code of a segment, adding it to the inventory if needed.
+        """
+        try:
+            return self.codes[segment]
+        except KeyError:
+            code = chr(len(self.segments))
+            self.codes[segment] = code
+            self.segments.append(segment)
+            return code
+
+    def encode(self, form):
+        """
+        Encode a sequence of segments.
+        """
+        code = "".join([self.segment(segment) for segment in form])
+        return self.forms.setdefault(code, code)
+
+    def decode(self, code):
+        """
+        Return an encoded form as a string with segments separated by spaces.
+        """
+        try:
+            return self.words[code]
+        except KeyError:
+            word = " ".join([self.segments[ord(char)] for char in code])
+            self.words[code] = word
+            return word
+
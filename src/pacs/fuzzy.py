@@ -0,0 +1,375 @@
+"""
+Affix colexifications of forms that match up to a few segments.
+
+Forms are reduced to coarser segments, such as sound classes, and candidate
+pairs of a source form and an affix of a target form are found with hashed
+keys, of masked positions or of MinHash signatures, so that only the
+candidates are compared segment by segment.
+"""
+import functools
+import itertools
+import unicodedata
+
+import numpy as np
+from lingpy import tokens2class
+
+from pacs.colexifications import (
+        AFFIX_COLEXIFICATIONS, sounds_without_plus, get_languages, partition_languages,
+        language_data, map_languages, collect_results, _table, _output)
+from pacs.encoding import SegmentEncoder
+from pacs.profiling import NULL_TIMER
+
+__all__ = ['sound_class', 'strip_diacritics', 'reduce_form', 'minhash_signatures', 'fuzzy_affix_colexifications']
+
+# parameters of the hash functions, (a * x + b) mod 2 ** 64, of the permutations
+_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+@functools.lru_cache(maxsize=2 ** 12)
+def strip_diacritics(segment):
+    """
+    Reduce a segment to its base characters.
+
+    Combining marks and modifier letters, such as those for aspiration,
+    length, or nasalization, are removed, so that "tʰ" and "t", or "aː" and
+    "a", are the same segment. Segments consisting only of such characters
+    are kept.
+    """
+    chars = [char for char in unicodedata.normalize("NFD", segment)
+             if unicodedata.category(char) not in ("Mn", "Lm", "Sk")]
+    return unicodedata.normalize("NFC", "".join(chars)) if chars else segment
+
+
+@functools.lru_cache(maxsize=2 ** 12)
+def sound_class(segment, model="sca"):
+    """
+    Reduce a segment to its sound class in a model of LingPy.
+
+    Sound classes are looked up with `lingpy.tokens2class`, so that, with
+    the SCA model, "tʰ" and "t" are the class "T" and all vowels the class
+    "A". Segments that LingPy does not know are kept.
+
+    @param model: The name of the sound class model, such as "sca", "dolgo",
+        or "asjp".
+    """
+    try:
+        return tokens2class([segment], model)[0]
+    except ValueError:
+        return segment
+
+
+def reduce_form(form, form_factory=sounds_without_plus, reduction=sound_class):
+    """
+    Return the normalized form of a CL Toolkit form with reduced segments.
+
+    @param form_factory: The function returning the normalized form.
+    @param reduction: A function that maps a segment to its reduced segment,
+        such as `sound_class` or `strip_diacritics`.
+    """
+    return tuple([reduction(segment) for segment in form_factory(form)])
+
+
+def _permutations(permutations, seed):
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 2 ** 62, size=permutations, dtype=np.int64).astype(np.uint64) * 2 + 1
+    b = rng.randint(0, 2 ** 62, size=permutations, dtype=np.int64).astype(np.uint64)
+    return a, b
+
+
+def _codes(sequences):
+    """
+    Return the code points of sequences as rows of a matrix padded with -1,
+    and the lengths of the sequences.
+    """
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+    matrix = np.full((len(sequences), max(lengths.max(), 1) if len(lengths) else 1), -1,
+                     dtype=np.int64)
+    if len(lengths):
+        mask = np.arange(matrix.shape[1])[None, :] < lengths[:, None]
+        matrix[mask] = np.fromiter(
+                (ord(char) for sequence in sequences for char in sequence),
+                dtype=np.int64, count=int(lengths.sum()))
+    return matrix, lengths
+
+
+def minhash_signatures(sequences, ngram_size=2, permutations=32, seed=0):
+    """
+    Compute the MinHash signatures of the sets of n-grams of sequences.
+
+    @param sequences: A list of encoded forms, or other strings of characters
+        with code points below 2 ** 16.
+    @param ngram_size: The length of the n-grams. Shorter sequences are
+        treated as one n-gram.
+    @param permutations: The number of hash functions.
+    @returns: An array of unsigned integers with one row per sequence and one
+        column per hash function. Identical sequences have identical
+        signatures, and the probability that two signatures agree in one
+        column approximates the Jaccard similarity of the sets of n-grams.
+    """
+    return _signatures(*_codes(sequences), ngram_size, permutations, seed)
+
+
+def _signatures(matrix, lengths, ngram_size, permutations, seed):
+    sizes = np.minimum(ngram_size, lengths)
+    width = matrix.shape[1]
+    values = np.zeros(matrix.shape, dtype=np.int64)
+    for j in range(ngram_size):
+        shifted = np.full(matrix.shape, 0, dtype=np.int64)
+        shifted[:, :width - j] = matrix[:, j:]
+        values = np.where(j < sizes[:, None], (values << 16) | shifted, values)
+    # mark the size, so n-grams of different sizes differ
+    values |= sizes[:, None] << 48
+    valid = np.arange(width)[None, :] + sizes[:, None] <= lengths[:, None]
+    valid &= sizes[:, None] > 0
+    items, positions = np.nonzero(valid)
+    out = np.zeros((len(lengths), permutations), dtype=np.uint64)
+    if not len(items):
+        return out
+    a, b = _permutations(permutations, seed)
+    with np.errstate(over="ignore"):
+        ngrams = values[items, positions].astype(np.uint64) * _MULTIPLIER
+        hashes = ngrams[:, None] * a[None, :] + b[None, :]
+    starts = np.flatnonzero(np.concatenate([[True], items[1:] != items[:-1]]))
+    out[items[starts]] = np.minimum.reduceat(hashes, starts, axis=0)
+    return out
+
+
+def _band_keys(signatures, bands):
+    """
+    Combine the rows of each band of the signatures into one key.
+    """
+    rows = signatures.shape[1] // bands
+    keys = np.zeros((signatures.shape[0], bands), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(rows):
+            keys = keys * _MULTIPLIER + signatures[:, j::rows][:, :bands]
+    return keys
+
+
+def _substitution_keys(matrix, lengths, max_distance):
+    """
+    Compute keys of sequences in which up to `max_distance` positions are
+    masked.
+
+    Two sequences of the same length differ in at most `max_distance`
+    positions if and only if they share the key of one set of masked
+    positions, up to collisions of the hashes.
+
+    @returns: An array with one row per sequence and one column per set of
+        masked positions. Sets of positions beyond the end of a sequence
+        yield keys of the sequence with fewer masked positions.
+    """
+    width = matrix.shape[1]
+    powers = np.ones(width, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(1, width):
+            powers[j] = powers[j - 1] * _MULTIPLIER
+        codes = (matrix + 2).astype(np.uint64)
+        full = (codes * powers[None, :]).sum(axis=1, dtype=np.uint64)
+        masks = list(itertools.combinations(range(width), min(max_distance, width)))
+        keys = np.zeros((len(lengths), len(masks)), dtype=np.uint64)
+        for k, positions in enumerate(masks):
+            positions = list(positions)
+            # masked positions count as code 0, and padding is never masked
+            inside = np.array(positions)[None, :] < lengths[:, None]
+            keys[:, k] = full - (
+                    codes[:, positions] * powers[positions][None, :] * inside).sum(
+                        axis=1, dtype=np.uint64)
+    return keys
+
+
+def _bucket_pairs(keys, is_source):
+    """
+    Return the pairs of sources and other sequences with the same key.
+
+    @returns: Arrays of the indices of the sources and of the other sequences.
+    """
+    # sort sources before the other sequences of each bucket
+    order = np.lexsort((~is_source, keys))
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+    bucket = np.cumsum(np.isin(np.arange(len(keys)), starts)) - 1
+    sources = np.bincount(bucket, weights=is_source[order]).astype(np.int64)
+    others = ~is_source[order]
+    # each other sequence is paired with the sources at the start of its bucket
+    counts = sources[bucket[others]]
+    first = np.repeat(starts[bucket[others]], counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return order[first + offsets], np.repeat(order[others], counts)
+
+
+def _fuzzy_affix_language(
+        forms,
+        source_threshold=2,
+        target_threshold=5,
+        difference_threshold=2,
+        max_distance=1,
+        index="substitutions",
+        ngram_size=1,
+        permutations=32,
+        bands=16,
+        seed=0,
+        timer=None):
+    timer = timer or NULL_TIMER
+    with timer.stage("candidates") as stage:
+        # sources and the affixes of the targets of the same lengths
+        sources = [k for k, form in enumerate(forms) if len(form[2]) >= source_threshold]
+        targets, windows = [], []
+        for b, form in enumerate(forms):
+            tform = form[2]
+            if len(tform) >= target_threshold:
+                for length in range(source_threshold, len(tform) - difference_threshold + 1):
+                    targets += [b, b]
+                    windows += [tform[:length], tform[len(tform) - length:]]
+        matrix, lengths = _codes([forms[a][2] for a in sources] + windows)
+        if index == "minhash":
+            keys = _band_keys(
+                    _signatures(matrix, lengths, ngram_size, permutations, seed), bands)
+        else:
+            keys = _substitution_keys(matrix, lengths, max_distance)
+        is_source = np.arange(len(lengths)) < len(sources)
+        candidates = []
+        with np.errstate(over="ignore"):
+            for band in range(keys.shape[1]):
+                # only sequences of the same length are compared
+                i, w = _bucket_pairs(
+                        keys[:, band] ^ (lengths.astype(np.uint64) * _MULTIPLIER), is_source)
+                candidates.append(i * len(lengths) + w)
+        candidates = np.unique(np.concatenate(candidates)) if candidates else \
+            np.zeros(0, dtype=np.int64)
+        i, w = np.divmod(candidates, len(lengths))
+        stage.items = len(candidates)
+
+    with timer.stage("pairs") as stage:
+        # sequences of the same length are compared segment by segment
+        distances = (matrix[i] != matrix[w]).sum(axis=1)
+        selected = (distances <= max_distance) & (lengths[i] == lengths[w])
+        a = np.array(sources, dtype=np.int64)[i[selected]]
+        b = np.array(targets, dtype=np.int64)[w[selected] - len(sources)]
+        nodes, edges = [], []
+        previous, visited = None, None
+        for a, b in sorted(set(zip(a.tolist(), b.tolist()))):
+            form_id, concept, tform, _ = forms[a]
+            form_b, concept_b, target, _ = forms[b]
+            if a == b or concept == concept_b:
+                continue
+            if a != previous:
+                nodes += [(concept, "source", form_id, tform)]
+                previous, visited = a, set()
+            if form_b not in visited:
+                visited.add(form_b)
+                nodes += [(concept_b, "target", form_b, target)]
+                edges += [(concept, concept_b, form_id, form_b, tform, target)]
+        stage.items = len(edges)
+    return nodes, edges
+
+
+def fuzzy_affix_colexifications(
+        wordlist,
+        source_threshold=2,
+        target_threshold=5,
+        difference_threshold=2,
+        max_distance=1,
+        reduction=sound_class,
+        index="substitutions",
+        ngram_size=1,
+        permutations=32,
+        bands=16,
+        seed=0,
+        concept_attr="concepticon_gloss",
+        form_factory=None,
+        family=None,
+        workers=None,
+        encoder=None,
+        output="graph",
+        attributes="lists",
+        cache=None,
+        profile=None,
+        partition_by=None,
+        table_factory=None,
+        form_cache=None):
+    """
+    Compute affix colexifications of forms matching up to a few segments.
+
+    Forms are normalized with the form factory and their segments reduced,
+    by default to their sound classes in the SCA model of LingPy. A source
+    form colexifies with a target
+    form if it differs from the prefix or suffix of the same length of the
+    target in at most `max_distance` segments.
+
+    Candidate pairs of sources and affixes of targets of the same length are
+    found with hashed keys, and only the candidates are compared segment by
+    segment. With the index "substitutions", the default, the keys are the
+    sequences with each set of `max_distance` positions masked, which finds
+    all pairs. The MinHash index is opt-in, with `index="minhash"`: its keys
+    are the bands of the MinHash signatures of the sets of n-grams of the
+    sequences, which can miss pairs sharing few n-grams. More bands of fewer
+    permutations find more pairs with more candidates to compare. With `max_distance=0`, both indexes yield the
+    graph of `affix_colexifications` for the reduced forms.
+
+    @param max_distance: The maximal number of segments in which a source
+        and the affix of a target differ.
+    @param index: The index of the candidates, "substitutions", which finds
+        all pairs, or "minhash", which can miss pairs.
+    @param reduction: A function that maps a segment to its reduced segment,
+        such as `sound_class`, the default, a partial function of
+        `sound_class` with another model, or `strip_diacritics`, which only
+        removes diacritics. It is applied to the result of the form factory.
+    @param ngram_size: The length of the n-grams of segments of the MinHash
+        signatures. Sets of single
+        segments, the default, keep a high similarity for short forms
+        differing in one segment, for which longer n-grams are often all
+        different.
+    @param permutations: The number of hash functions of the MinHash
+        signatures.
+    @param bands: The number of bands into which the signatures are split.
+    @param seed: The seed of the hash functions.
+    @returns: A graph with the attributes of `affix_colexifications`, in
+        which the words are the reduced forms.
+
+    The other parameters are those of `affix_colexifications`.
+    """
+    concept_factory = lambda x: getattr(x, concept_attr) if x else None
+    form_factory = functools.partial(
+            reduce_form, form_factory=form_factory or sounds_without_plus, reduction=reduction)
+    encoder = encoder or SegmentEncoder()
+
+    languages = get_languages(wordlist, family=family)
+    partitions = None
+    if partition_by is not None:
+        languages, partitions = partition_languages(languages, partition_by)
+    if profile is not None:
+        languages = profile.iterate(languages)
+    data = (language_data(
+                language, concept_factory, form_factory, encoder=encoder,
+                timer=profile.timer(language.id) if profile else None,
+                form_cache=form_cache)
+            for language in languages)
+    function = functools.partial(
+            _fuzzy_affix_language,
+            source_threshold=source_threshold,
+            target_threshold=target_threshold,
+            difference_threshold=difference_threshold,
+            max_distance=max_distance,
+            index=index,
+            ngram_size=ngram_size,
+            permutations=permutations,
+            bands=bands,
+            seed=seed)
+    table = collect_results(
+            _table(
+                AFFIX_COLEXIFICATIONS, attributes, decode=encoder.decode,
+                partitions=partitions, table_factory=table_factory),
+            map_languages(
+                function,
+                data,
+                workers=workers,
+                cache=cache.analysis(
+                    function,
+                    encoder=encoder,
+                    form_factory=form_factory,
+                    concept_attr=concept_attr) if cache else None,
+                profile=profile),
+            desc="computing fuzzy affix colexifications",
+            profile=profile)
+    return _output(table, output, profile=profile)
@@ -0,0 +1,174 @@
+"""
+Colexification graphs that can be updated language by language.
+"""
+import functools
+
+import networkx as nx
+
+from pacs.colexifications import (
+        ANALYSES, sounds_without_plus, extend_nodes, extend_edges, get_languages,
+        language_data, map_languages)
+from pacs.encoding import SegmentEncoder
+from pacs.occurrences import node_attributes, edge_attributes
+
+__all__ = ['ColexificationGraph']
+
+
+class ColexificationGraph:
+    """
+    A colexification graph to which languages can be added and from which
+    they can be removed.
+
+    Nodes and edges have the same attributes as in the graphs returned by the
+    analyses in `pacs.colexifications`. The lists of occurrences are aligned
+    with the lists of varieties, which are used to subtract the occurrences of
+    a variety. Each update only changes the nodes and edges of the languages
+    it touches, and their `*_count` attributes are recomputed in place.
+
+    @param analysis: The name of the analysis, one of "full", "affix", and
+        "common_substring".
+    @param concept_attr: The attribute of the Concept class in CL Toolkit.
+    @param form_factory: The function returning the normalized form.
+    @param parameters: The thresholds of the analysis.
+    """
+
+    def __init__(
+            self,
+            analysis="full",
+            concept_attr="concepticon_gloss",
+            form_factory=None,
+            **parameters):
+        self.function, self.schema, encoded = ANALYSES[analysis]
+        self.parameters = parameters
+        self.graph = nx.DiGraph() if self.schema.directed else nx.Graph()
+        self.concept_factory = lambda x: getattr(x, concept_attr) if x else None
+        self.form_factory = form_factory or sounds_without_plus
+        self.encoder = SegmentEncoder() if encoded else None
+        # nodes and edges touched by each variety
+        self.varieties = {}
+
+    def __contains__(self, variety):
+        return variety in self.varieties
+
+    def _add(self, language, result):
+        nodes, edges = result
+        if language[0] in self.varieties:
+            self.remove_language(language[0])
+        decode = self.encoder.decode if self.encoder else (lambda word: word)
+        for concept, role, form, word in nodes:
+            extend_nodes(
+                    self.graph,
+                    concept,
+                    **node_attributes(
+                        self.schema,
+                        role,
+                        form,
+                        word if word is None else decode(word),
+                        language))
+        for concept_a, concept_b, form_a, form_b, word_a, word_b in edges:
+            extend_edges(
+                    self.graph,
+                    concept_a,
+                    concept_b,
+                    **edge_attributes(
+                        self.schema,
+                        form_a,
+                        form_b,
+                        decode(word_a),
+                        decode(word_b),
+                        language))
+        touched = (
+                set([node[0] for node in nodes]),
+                set([edge[:2] for edge in edges]))
+        self.varieties[language[0]] = touched
+        self._update_counts(*touched)
+
+    def add_language(self, language, concepts=None):
+        """
+        Add a CL Toolkit language, replacing it if it was added before.
+
+        @param concepts: If set, only forms whose concepts are in this set are
+            kept, as `full_colexifications` keeps the concepts of the wordlist.
+        """
+        language, forms = language_data(
+                language, self.concept_factory, self.form_factory, concepts=concepts,
+                encoder=self.encoder)
+        self._add(language, self.function(forms, **self.parameters))
+
+    def add_wordlist(self, wordlist, family=None, workers=None, concepts=None):
+        """
+        Add all languages of a wordlist, optionally restricted to one family.
+
+        @param concepts: If set, only forms whose concepts are in this set are
+            kept. Use "wordlist" for the concepts of the wordlist, with which
+            the graph of the "full" analysis is that of `full_colexifications`.
+        """
+        if concepts == "wordlist":
+            concepts = set([self.concept_factory(concept) for concept in wordlist.concepts
+                            if self.concept_factory(concept)])
+        data = (language_data(
+                    language, self.concept_factory, self.form_factory, concepts=concepts,
+                    encoder=self.encoder)
+                for language in get_languages(wordlist, family=family))
+        function = functools.partial(self.function, **self.parameters)
+        for language, result in map_languages(function, data, workers=workers):
+            self._add(language, result)
+
+    def remove_language(self, language):
+        """
+        Remove a language, given as CL Toolkit language or by its ID.
+        """
+        variety = getattr(language, "id", language)
+        nodes, edges = self.varieties.pop(variety)
+        for node in nodes:
+            data = self.graph.nodes[node]
+            for role, attrs in self._aligned(self.schema.nodes).items():
+                self._subtract(data, attrs, variety)
+            if not data[self._varieties(self.schema.nodes, None)]:
+                self.graph.remove_node(node)
+        edge_attrs = [(attr, column, None) for attr, column in self.schema.edges
+                      if column != "count"]
+        for node_a, node_b in edges:
+            if not self.graph.has_edge(node_a, node_b):
+                continue
+            data = self.graph[node_a][node_b]
+            removed = self._subtract(data, edge_attrs, variety)
+            if "count" in data:
+                data["count"] -= removed
+            if not data[self._varieties(edge_attrs, None)]:
+                self.graph.remove_edge(node_a, node_b)
+        self._update_counts(
+                [node for node in nodes if node in self.graph],
+                [edge for edge in edges if self.graph.has_edge(*edge)])
+
+    @staticmethod
+    def _aligned(attrs):
+        out = {}
+        for attr, column, role in attrs:
+            out.setdefault(role, []).append((attr, column, role))
+        return out
+
+    @staticmethod
+    def _varieties(attrs, role):
+        for attr, column, rrole in attrs:
+            if column == "variety" and rrole == role:
+                return attr
+
+    def _subtract(self, data, attrs, variety):
+        """
+        Remove the occurrences of a variety from aligned lists.
+        """
+        varieties = data[self._varieties(attrs, attrs[0][2])]
+        keep = [value != variety for value in varieties]
+        for attr, _, _ in attrs:
+            data[attr] = [value for value, k in zip(data[attr], keep) if k]
+        return len(keep) - sum(keep)
+
+    def _update_counts(self, nodes, edges):
+        for pl, sg in self.schema.counts:
+            for node in nodes:
+                data = self.graph.nodes[node]
+                data[sg + "_count"] = len(set(data[pl]))
+            for node_a, node_b in edges:
+                data = self.graph[node_a][node_b]
+                data[sg + "_count"] = len(set(data[pl]))
@@ -0,0 +1,462 @@
+"""
+Columnar storage of colexification occurrences.
+"""
+from array import array
+from collections import OrderedDict, namedtuple
+
+import networkx as nx
+import numpy as np
+
+__all__ = ['Schema', 'OccurrenceTable', 'CountTable', 'PartitionedTable']
+
+Schema = namedtuple("Schema", ["directed", "nodes", "edges", "form_pair", "counts"])
+Schema.__doc__ = """
+Layout of the graph produced by an analysis.
+
+@param directed: Whether the graph is directed.
+@param nodes: A list of (attribute, column, role) tuples for the list
+    attributes of nodes. Columns are "form", "word", "variety", "language",
+    and "family". If the role is not None, the list only contains the values
+    of occurrences with this role.
+@param edges: A list of (attribute, column) tuples for the list attributes of
+    edges. Columns are "count", "forms", "word_a", "word_b", "variety",
+    "language", and "family", where "forms" is the pair of form IDs
+    formatted with `form_pair` and "count" is the number of occurrences.
+@param form_pair: The format string for pairs of form IDs.
+@param counts: A list of (attribute, name) tuples of list attributes whose
+    distinct values are counted as `name + "_count"` in nodes and edges.
+"""
+
+ROLES = {None: 0, "source": 1, "target": 2}
+NODE_COLUMNS = ["concept", "role", "form", "word", "variety"]
+EDGE_COLUMNS = ["concept_a", "concept_b", "form_a", "form_b", "word_a", "word_b", "variety"]
+
+
+def node_attributes(schema, role, form, word, language):
+    """
+    Return the attributes of one node occurrence, as passed to `extend_nodes`.
+
+    @param language: A (variety, language, family) tuple.
+    """
+    values = dict(zip(["variety", "language", "family"], language), form=form, word=word)
+    return {attr: [values[column]] if rrole is None or rrole == role else []
+            for attr, column, rrole in schema.nodes}
+
+
+def edge_attributes(schema, form_a, form_b, word_a, word_b, language):
+    """
+    Return the attributes of one edge occurrence, as passed to `extend_edges`.
+
+    @param language: A (variety, language, family) tuple.
+    """
+    values = dict(
+            zip(["variety", "language", "family"], language),
+            word_a=word_a,
+            word_b=word_b,
+            forms=schema.form_pair.format(form_a, form_b))
+    return {attr: 1 if column == "count" else [values[column]]
+            for attr, column in schema.edges}
+
+
+def _groups(keys):
+    """
+    Group rows by key, ordering the groups by the first occurrence of a key.
+
+    @returns: The row indices sorted by group, the group index of each of
+        these rows, and the start of each group in the sorted rows.
+    """
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    # renumber groups by first occurrence
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first, kind="stable")] = np.arange(len(first))
+    group = rank[inverse.ravel()]
+    order = np.argsort(group, kind="stable")
+    group = group[order]
+    starts = np.searchsorted(group, np.arange(len(first)))
+    return order, group, starts
+
+
+def _split(values, starts):
+    ends = list(starts[1:]) + [len(values)]
+    return [values[start:end] for start, end in zip(starts, ends)]
+
+
+def _distinct(group, values, size):
+    """
+    Count the distinct values in each group.
+    """
+    if not len(values):
+        return np.zeros(size, dtype=np.int64)
+    pairs = np.unique(np.stack([group, values]), axis=1)
+    return np.bincount(pairs[0], minlength=size)
+
+
+class OccurrenceTable:
+    """
+    Store the occurrences of an analysis as flat integer columns.
+
+    Each node occurrence is a (concept, role, form, word, variety) row and
+    each edge occurrence a (concept A, concept B, form A, form B, word A, word
+    B, variety) row, where all values are indices into one table of interned
+    values. Varieties point to a table of (variety, language, family) rows.
+    The networkx graph is only built on request with `to_graph`, grouping all
+    rows at once.
+
+    @param schema: The Schema of the graph produced from the table.
+    @param decode: A function that converts encoded words to strings.
+    """
+
+    def __init__(self, schema, decode=None):
+        self.schema = schema
+        self.decode = decode
+        self.values = []
+        self._index = {}
+        self.languages = []
+        self.nodes = {column: array("q") for column in NODE_COLUMNS}
+        self.edges = {column: array("q") for column in EDGE_COLUMNS}
+
+    def __len__(self):
+        return len(self.edges["variety"])
+
+    def intern(self, value):
+        try:
+            return self._index[value]
+        except KeyError:
+            self._index[value] = len(self.values)
+            self.values.append(value)
+            return self._index[value]
+
+    def add(self, language, nodes, edges):
+        """
+        Add the partial result of one language.
+
+        @param language: A (variety, language, family) tuple.
+        @param nodes: A list of (concept, role, form, word) tuples.
+        @param edges: A list of (concept A, concept B, form A, form B, word A,
+            word B) tuples.
+        """
+        variety = len(self.languages)
+        self.languages.append(tuple([self.intern(value) for value in language]))
+        for columns, rows, names in (
+                (self.nodes, nodes, NODE_COLUMNS),
+                (self.edges, edges, EDGE_COLUMNS)):
+            if not rows:
+                continue
+            for name, values in zip(names, zip(*rows)):
+                if name == "role":
+                    columns[name].extend([ROLES[role] for role in values])
+                else:
+                    columns[name].extend([self.intern(value) for value in values])
+            columns["variety"].extend([variety] * len(rows))
+
+    def select(self, nodes, edges, columns=None):
+        """
+        Return a table with a selection of the rows of this table.
+
+        The tables share their interned values and languages.
+
+        @param nodes: The indices of the node rows, in the order of the new
+            table.
+        @param edges: The indices of the edge rows.
+        @param columns: A dictionary with edge columns replacing the selected
+            columns, such as words, as arrays of interned values.
+        """
+        table = OccurrenceTable(self.schema, decode=self.decode)
+        table.values, table._index, table.languages = self.values, self._index, self.languages
+        for source, target, rows in (
+                (self.nodes, table.nodes, nodes),
+                (self.edges, table.edges, edges)):
+            rows = np.asarray(rows, dtype=np.int64)
+            for name, column in source.items():
+                if len(rows):
+                    target[name].frombytes(np.frombuffer(column, dtype=np.int64)[rows].tobytes())
+        for name, values in (columns or {}).items():
+            table.edges[name] = array("q", np.asarray(values, dtype=np.int64).tobytes())
+        return table
+
+    def _columns(self, columns):
+        out = {name: np.frombuffer(column, dtype=np.int64) if len(column) else
+               np.zeros(0, dtype=np.int64) for name, column in columns.items()}
+        languages = np.array(self.languages, dtype=np.int64).reshape(-1, 3)
+        variety = out.pop("variety")
+        out["variety"] = languages[variety, 0]
+        out["language"] = languages[variety, 1]
+        out["family"] = languages[variety, 2]
+        return out
+
+    def _objects(self, words):
+        objects = np.empty(len(self.values), dtype=object)
+        objects[:] = self.values
+        decoded = objects.copy()
+        if self.decode:
+            for i in np.unique(np.concatenate(words)):
+                if self.values[i] is not None:
+                    decoded[i] = self.decode(self.values[i])
+        return objects, decoded
+
+    def to_graph(self, lists=True):
+        """
+        Build the networkx graph with list attributes and counts.
+
+        @param lists: Add the list attributes of nodes and edges. Otherwise,
+            only the counts are added, as in the graph built by a CountTable.
+        """
+        graph = nx.DiGraph() if self.schema.directed else nx.Graph()
+        objects, words = self._objects([
+            np.frombuffer(self.nodes["word"], dtype=np.int64),
+            np.frombuffer(self.edges["word_a"], dtype=np.int64),
+            np.frombuffer(self.edges["word_b"], dtype=np.int64)])
+        graph.add_nodes_from(zip(*self.node_groups(lists, objects, words)))
+        graph.add_edges_from(zip(*self.edge_groups(lists, objects, words)))
+        return graph
+
+    def _column(self, columns, name, objects, words):
+        return (words if name.startswith("word") else objects)[columns[name]]
+
+    def node_groups(self, lists=True, objects=None, words=None):
+        """
+        Group the node occurrences by concept.
+
+        @returns: The list of concepts, in the order of their first
+            occurrence, and the list of their attributes.
+        """
+        nodes = self._columns(self.nodes)
+        if objects is None:
+            objects, words = self._objects([nodes["word"]])
+        order, group, starts = _groups(nodes["concept"])
+        size = len(starts)
+        attributes = [{} for _ in range(size)]
+        for attr, name, role in (self.schema.nodes if lists else []):
+            if role is None:
+                split = _split(
+                        self._column(nodes, name, objects, words)[order].tolist(), starts)
+            else:
+                selected = nodes["role"][order] == ROLES[role]
+                counts = np.bincount(group[selected], minlength=size)
+                split = _split(
+                        self._column(nodes, name, objects, words)[order[selected]].tolist(),
+                        np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64))
+            for data, values in zip(attributes, split):
+                data[attr] = values
+        self._add_counts(attributes, nodes, order, group, size)
+        concepts = objects[nodes["concept"][order[starts]]].tolist() if size else []
+        return concepts, attributes
+
+    def edge_groups(self, lists=True, objects=None, words=None):
+        """
+        Group the edge occurrences by pairs of concepts, which are unordered
+        if the graph is undirected.
+
+        @returns: The list of the first concepts, the list of the second
+            concepts, in the order of the first occurrence of each edge, and
+            the list of their attributes.
+        """
+        edges = self._columns(self.edges)
+        if objects is None:
+            objects, words = self._objects([edges["word_a"], edges["word_b"]])
+        concept_a, concept_b = edges["concept_a"], edges["concept_b"]
+        if self.schema.directed:
+            keys = concept_a * len(self.values) + concept_b
+        else:
+            keys = (np.minimum(concept_a, concept_b) * len(self.values) +
+                    np.maximum(concept_a, concept_b))
+        order, group, starts = _groups(keys)
+        size = len(starts)
+        attributes = [{} for _ in range(size)]
+        for attr, name in self.schema.edges:
+            if name != "count" and not lists:
+                continue
+            if name == "count":
+                split = np.diff(np.append(starts, len(order))).tolist()
+            elif name == "forms":
+                split = _split([self.schema.form_pair.format(a, b) for a, b in zip(
+                    objects[edges["form_a"][order]].tolist(),
+                    objects[edges["form_b"][order]].tolist())], starts)
+            else:
+                split = _split(
+                        self._column(edges, name, objects, words)[order].tolist(), starts)
+            for data, values in zip(attributes, split):
+                data[attr] = values
+        edges["form"] = edges["form_a"] * len(self.values) + edges["form_b"]
+        self._add_counts(attributes, edges, order, group, size)
+        first = order[starts]
+        return (objects[concept_a[first]].tolist(), objects[concept_b[first]].tolist(),
+                attributes)
+
+    def _add_counts(self, attributes, columns, order, group, size):
+        names = {"varieties": "variety", "languages": "language",
+                 "families": "family", "forms": "form"}
+        for attr, name in self.schema.counts:
+            counts = _distinct(group, columns[names[attr]][order], size)
+            for data, count in zip(attributes, counts.tolist()):
+                data[name + "_count"] = count
+
+    def iter_nodes(self):
+        """
+        Yield node occurrences as (concept, role, form, word, variety,
+        language, family) tuples.
+        """
+        roles = {code: role for role, code in ROLES.items()}
+        nodes = self._columns(self.nodes)
+        decode = self.decode or (lambda word: word)
+        for row in zip(*[nodes[name].tolist() for name in [
+                "concept", "role", "form", "word", "variety", "language", "family"]]):
+            word = self.values[row[3]]
+            yield (self.values[row[0]], roles[row[1]], self.values[row[2]],
+                   word if word is None else decode(word)) + tuple(
+                           [self.values[value] for value in row[4:]])
+
+    def iter_edges(self):
+        """
+        Yield edge occurrences as (concept A, concept B, form A, form B, word
+        A, word B, variety, language, family) tuples.
+        """
+        edges = self._columns(self.edges)
+        decode = self.decode or (lambda word: word)
+        for row in zip(*[edges[name].tolist() for name in [
+                "concept_a", "concept_b", "form_a", "form_b", "word_a", "word_b",
+                "variety", "language", "family"]]):
+            values = [self.values[value] for value in row]
+            values[4:6] = [decode(word) for word in values[4:6]]
+            yield tuple(values)
+
+
+def _bits(bitset):
+    return bin(bitset).count("1")
+
+
+class CountTable:
+    """
+    Count the distinct varieties, languages, families, and forms of nodes and
+    edges while occurrences are added.
+
+    Varieties, languages, and families are interned as small integers and
+    stored as bitsets for each node and edge, forms as sets of interned
+    integers. Occurrence lists are never kept, so the table only supports
+    the `*_count` attributes of the graph and the `count` of edges.
+
+    @param schema: The Schema of the graph produced from the table.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.indices = {name: {} for name in ["variety", "language", "family", "form"]}
+        self.nodes = {}
+        self.edges = {}
+        self._forms = "forms" in [attr for attr, _ in schema.counts]
+
+    def __len__(self):
+        return sum([entry[0] for entry in self.edges.values()])
+
+    def _index(self, name, value):
+        index = self.indices[name]
+        try:
+            return index[value]
+        except KeyError:
+            index[value] = len(index)
+            return index[value]
+
+    def add(self, language, nodes, edges):
+        """
+        Add the partial result of one language.
+
+        @param language: A (variety, language, family) tuple.
+        @param nodes: A list of (concept, role, form, word) tuples.
+        @param edges: A list of (concept A, concept B, form A, form B, word A,
+            word B) tuples.
+        """
+        bits = [1 << self._index(name, value) for name, value in zip(
+            ["variety", "language", "family"], language)]
+        directed = self.schema.directed
+
+        touched = {}
+        for concept, _, form, _ in nodes:
+            entry = self.nodes.get(concept)
+            if entry is None:
+                entry = self.nodes[concept] = [0, 0, 0, 0, set()]
+            entry[0] += 1
+            if self._forms:
+                entry[4].add(self._index("form", form))
+            touched[concept] = entry
+        for entry in touched.values():
+            entry[1] |= bits[0]
+            entry[2] |= bits[1]
+            entry[3] |= bits[2]
+
+        touched = {}
+        for concept_a, concept_b, form_a, form_b, _, _ in edges:
+            key = (concept_a, concept_b)
+            if key not in self.edges and not directed and (concept_b, concept_a) in self.edges:
+                key = (concept_b, concept_a)
+            entry = self.edges.get(key)
+            if entry is None:
+                entry = self.edges[key] = [0, 0, 0, 0, set()]
+            entry[0] += 1
+            if self._forms:
+                entry[4].add((self._index("form", form_a), self._index("form", form_b)))
+            touched[key] = entry
+        for entry in touched.values():
+            entry[1] |= bits[0]
+            entry[2] |= bits[1]
+            entry[3] |= bits[2]
+
+    def _counts(self, entry):
+        values = {"varieties": _bits(entry[1]), "languages": _bits(entry[2]),
+                  "families": _bits(entry[3]), "forms": len(entry[4])}
+        return {name + "_count": values[attr] for attr, name in self.schema.counts}
+
+    def to_graph(self):
+        """
+        Build the networkx graph with counts.
+        """
+        graph = nx.DiGraph() if self.schema.directed else nx.Graph()
+        graph.add_nodes_from(
+                [(concept, self._counts(entry)) for concept, entry in self.nodes.items()])
+        with_count = "count" in [name for _, name in self.schema.edges]
+        for (concept_a, concept_b), entry in self.edges.items():
+            data = {"count": entry[0]} if with_count else {}
+            data.update(self._counts(entry))
+            graph.add_edge(concept_a, concept_b, **data)
+        return graph
+
+
+class PartitionedTable:
+    """
+    Add the partial results of languages to a table of all languages and to a
+    table of the partition of each language, such as its family.
+
+    The partial result of each language is computed once and added to both
+    tables, and the graphs of all partitions are built from their tables.
+
+    @param factory: A function that returns an empty OccurrenceTable or
+        CountTable.
+    @param partition: A function that returns the partition of a language,
+        given as (variety, language, family) tuple.
+    """
+
+    def __init__(self, factory, partition):
+        self.factory = factory
+        self.partition = partition
+        self.table = factory()
+        self.partitions = OrderedDict()
+
+    def __len__(self):
+        return len(self.table)
+
+    def add(self, language, nodes, edges):
+        self.table.add(language, nodes, edges)
+        key = self.partition(language)
+        if key not in self.partitions:
+            self.partitions[key] = self.factory()
+        self.partitions[key].add(language, nodes, edges)
+
+    def to_graph(self):
+        """
+        Build the graph of all languages and the graphs of the partitions.
+
+        @returns: A tuple of the graph of all languages and a dictionary with
+            the partitions as keys and their graphs as values, in the order in
+            which the partitions were first seen.
+        """
+        return self.table.to_graph(), OrderedDict([
+            (key, table.to_graph()) for key, table in self.partitions.items()])
@@ -0,0 +1,206 @@
+"""
+Timing of the stages of the analyses, per stage and language.
+"""
+from time import perf_counter
+from collections import OrderedDict
+
+__all__ = ['Profile', 'StageTimer', 'NULL_TIMER']
+
+
+class Stage:
+    """
+    A context manager that records the wall time of a stage.
+
+    The number of items processed in the stage can be set while it runs.
+    """
+    __slots__ = ["timer", "name", "items", "start"]
+
+    def __init__(self, timer, name, items=0):
+        self.timer = timer
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.timer.record(self.name, perf_counter() - self.start, 1, self.items)
+
+
+class StageTimer:
+    """
+    Collect the timings of the stages of one language.
+
+    Records are (stage, seconds, calls, items) tuples, which are passed to the
+    Profile of the timer, or stored in `records` if it has none, as in worker
+    processes.
+    """
+
+    def __init__(self, profile=None, language=None):
+        self.profile = profile
+        self.language = language
+        self.records = []
+
+    def stage(self, name, items=0):
+        return Stage(self, name, items=items)
+
+    def record(self, name, seconds, calls=1, items=0):
+        if self.profile is None:
+            self.records.append((name, seconds, calls, items))
+        else:
+            self.profile.add(name, self.language, seconds, calls, items)
+
+    def timed(self, name, function):
+        """
+        Return a function recording the time of each call of a function.
+
+        The calls are recorded as one stage when `flush` is called.
+        """
+        total = [0.0, 0]
+
+        def wrapper(*args, **kw):
+            start = perf_counter()
+            try:
+                return function(*args, **kw)
+            finally:
+                total[0] += perf_counter() - start
+                total[1] += 1
+
+        def flush():
+            if total[1]:
+                self.record(name, total[0], total[1], total[1])
+            total[0], total[1] = 0.0, 0
+        wrapper.flush = flush
+        return wrapper
+
+
+class _NullStage:
+    __slots__ = ["items"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class _NullTimer:
+    """
+    A timer that records nothing, used when profiling is switched off.
+    """
+    _stage = _NullStage()
+
+    def stage(self, name, items=0):
+        return self._stage
+
+    def record(self, name, seconds, calls=1, items=0):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Profile:
+    """
+    Record wall time, calls, and items of the stages of an analysis.
+
+    Stages are recorded for each language, and stages that do not belong to
+    a language, such as building the graph, with the language None. The stages
+    of the analyses are:
+
+    - "read": getting the next language with its forms from the wordlist,
+    - "forms": accessing the forms of a language,
+    - "form_factory": normalizing the forms, one call per form,
+    - "cache": looking up the result of a language in the cache,
+    - "analysis": analysing a language, which comprises the stages
+      "candidates", "pairs", and "filter",
+    - "collect": adding the nodes and edges of a language to the table,
+    - "graph": building the graph from the table,
+    - "permutations": computing the permutations of a PermutationTest, with
+      the number of permutations as items.
+
+    @param callback: A function called with the stage, the language, the
+        seconds, the calls, and the items of each record, which can be used to
+        monitor the throughput while an analysis runs.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.stages = OrderedDict()
+
+    def add(self, stage, language, seconds, calls=1, items=0):
+        try:
+            record = self.stages[stage, language]
+        except KeyError:
+            record = self.stages[stage, language] = [0.0, 0, 0]
+        record[0] += seconds
+        record[1] += calls
+        record[2] += items
+        if self.callback is not None:
+            self.callback(stage, language, seconds, calls, items)
+
+    def merge(self, language, records):
+        """
+        Add the records of a StageTimer of a worker process.
+        """
+        for stage, seconds, calls, items in records:
+            self.add(stage, language, seconds, calls, items)
+
+    def timer(self, language=None):
+        """
+        Return a StageTimer adding its records to the profile.
+        """
+        return StageTimer(self, language)
+
+    def iterate(self, iterable, stage="read"):
+        """
+        Iterate over languages, recording the time to get each of them.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add(stage, getattr(item, "id", None), perf_counter() - start, 1, 1)
+            yield item
+
+    def report(self):
+        """
+        @returns: A list of dictionaries with the stage, language, seconds,
+            calls, and items of each record.
+        """
+        return [
+                {"stage": stage, "language": language, "seconds": seconds,
+                 "calls": calls, "items": items}
+                for (stage, language), (seconds, calls, items) in self.stages.items()]
+
+    def summary(self):
+        """
+        @returns: A dictionary with the seconds, calls, items, and languages
+            of each stage, summed over the languages.
+        """
+        out = OrderedDict()
+        for (stage, language), (seconds, calls, items) in self.stages.items():
+            if stage not in out:
+                out[stage] = {"seconds": 0.0, "calls": 0, "items": 0, "languages": 0}
+            out[stage]["seconds"] += seconds
+            out[stage]["calls"] += calls
+            out[stage]["items"] += items
+            out[stage]["languages"] += int(language is not None)
+        return out
+
+
+def profiled(function, forms):
+    """
+    Analyse the forms of one language and return the result with the timings.
+
+    Used by `map_languages` for analyses with a Profile, so that the timings
+    can be returned from worker processes.
+    """
+    timer = StageTimer()
+    with timer.stage("analysis", items=len(forms)):
+        result = function(forms, timer=timer)
+    return result, timer.records
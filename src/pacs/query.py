@@ -0,0 +1,144 @@
+"""
+Queries of the edges of colexification graphs over sorted indexes.
+"""
+import networkx as nx
+import numpy as np
+
+from pacs.degree import EdgeArrays
+
+__all__ = ['EdgeIndex']
+
+
+class EdgeIndex:
+    """
+    Answer threshold, top-k, and concept queries on the edges of a graph.
+
+    Edges are numbered in the order of the adjacency of the graph, as in
+    EdgeArrays. For each attribute queried, such as "family_count" or
+    "count", the edges are sorted once by decreasing value, ties in the order
+    of the graph, so that the edges above a threshold and the top k edges are
+    prefixes of the sorted edges. Concept queries start from the edges of the
+    concepts, which are found over an index of the edges of each node,
+    without scanning all edges.
+
+    Results are arrays of edge numbers, which can be combined with numpy, and
+    turned into lists of edges with `edges` or into views of the graph with
+    `view`, which filter the graph without copying it. The index does not
+    follow changes of the graph.
+
+    @param graph: A networkx graph.
+    @param attributes: The edge attributes indexed when the index is created.
+        Other attributes are indexed when they are first queried.
+    """
+
+    def __init__(self, graph, attributes=()):
+        self.graph = graph
+        self.arrays = EdgeArrays(graph)
+        self.index = {node: i for i, node in enumerate(self.arrays.nodes)}
+        self._orders = {}
+        for attribute in attributes:
+            self.order(attribute)
+        self._incidence = None
+
+    def __len__(self):
+        return len(self.arrays)
+
+    def order(self, attribute):
+        """
+        Return the edges sorted by decreasing value of an attribute, with the
+        sorted values.
+        """
+        if attribute not in self._orders:
+            values = self.arrays.weight(attribute)
+            order = np.lexsort((np.arange(len(values)), -values))
+            rank = np.empty(len(values), dtype=np.int64)
+            rank[order] = np.arange(len(values))
+            self._orders[attribute] = (order, values[order], rank)
+        return self._orders[attribute][:2]
+
+    def incident(self, concepts):
+        """
+        Return the edges of a list of concepts, in the order of the graph.
+
+        Concepts that are not in the graph are ignored.
+        """
+        if self._incidence is None:
+            ends = np.concatenate([self.arrays.source, self.arrays.target])
+            order = np.argsort(ends, kind="stable")
+            pointers = np.concatenate([[0], np.cumsum(np.bincount(
+                ends, minlength=len(self.arrays.nodes)))])
+            self._incidence = (pointers, order % max(1, len(self)))
+        pointers, edges = self._incidence
+        nodes = [self.index[concept] for concept in concepts if concept in self.index]
+        if not nodes:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(
+            [edges[pointers[node]:pointers[node + 1]] for node in nodes]))
+
+    def select(
+            self,
+            attribute="family_count",
+            minimum=None,
+            top=None,
+            concepts=None,
+            within=True):
+        """
+        Select the edges with the highest values of an attribute.
+
+        @param attribute: The attribute of the thresholds and the top edges.
+        @param minimum: Only keep edges whose value is at least the minimum.
+        @param top: Only keep the top edges, after the other conditions.
+        @param concepts: Only keep edges of these concepts.
+        @param within: Only keep edges whose concepts are both in the
+            concepts, otherwise edges with one concept in the concepts are kept.
+        @returns: An array of edge numbers, sorted by decreasing value.
+        """
+        order, values = self.order(attribute)
+        if concepts is None:
+            stop = len(order)
+            if minimum is not None:
+                stop = int(np.searchsorted(-values, -minimum, side="right"))
+            selected = order[:stop]
+        else:
+            concepts = set(concepts)
+            selected = self.incident(concepts)
+            if within:
+                inside = np.zeros(len(self.arrays.nodes), dtype=bool)
+                inside[[self.index[c] for c in concepts if c in self.index]] = True
+                selected = selected[
+                    inside[self.arrays.source[selected]] & inside[self.arrays.target[selected]]]
+            selected = selected[np.argsort(self._orders[attribute][2][selected])]
+            if minimum is not None:
+                selected = selected[self.arrays.weight(attribute)[selected] >= minimum]
+        if top is not None:
+            selected = selected[:top]
+        return selected
+
+    def edges(self, selected, data=False):
+        """
+        Return the edges of an array of edge numbers.
+
+        @param data: Return (concept A, concept B, attributes) tuples.
+        """
+        nodes = self.arrays.nodes
+        if data:
+            return [(nodes[a], nodes[b], self.graph[nodes[a]][nodes[b]]) for a, b in zip(
+                self.arrays.source[selected].tolist(), self.arrays.target[selected].tolist())]
+        return [(nodes[a], nodes[b]) for a, b in zip(
+            self.arrays.source[selected].tolist(), self.arrays.target[selected].tolist())]
+
+    def view(self, selected=None, nodes=None):
+        """
+        Return a view of the graph with the selected edges.
+
+        @param selected: An array of edge numbers, by default all edges.
+        @param nodes: The nodes of the view, by default all nodes of the graph.
+        """
+        filter_node, filter_edge = nx.filters.no_filter, nx.filters.no_filter
+        if nodes is not None:
+            filter_node = nx.filters.show_nodes(
+                    [node for node in nodes if node in self.index])
+        if selected is not None:
+            show = nx.filters.show_diedges if self.arrays.directed else nx.filters.show_edges
+            filter_edge = show(self.edges(selected))
+        return nx.subgraph_view(self.graph, filter_node=filter_node, filter_edge=filter_edge)
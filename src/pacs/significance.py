@@ -0,0 +1,300 @@
+"""
+Permutation tests of colexifications against shuffled concepts.
+"""
+import functools
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from tqdm import tqdm as progressbar
+
+from pacs.colexifications import (
+        ANALYSES, full_colexifications, affix_colexifications,
+        common_substring_colexifications, sounds_without_plus, get_languages,
+        language_data, map_languages)
+from pacs.encoding import SegmentEncoder
+from pacs.profiling import NULL_TIMER
+
+__all__ = ['PermutationTest', 'permutation_test']
+
+# the column of the language tuple counted by each statistic
+STATISTICS = {"variety_count": 0, "language_count": 1, "family_count": 2}
+
+GRAPHS = {
+        "full": full_colexifications,
+        "affix": affix_colexifications,
+        "common_substring": common_substring_colexifications,
+        }
+
+
+def _pairs_language(forms, function=None, timer=None):
+    """
+    Return the pairs of forms colexifying in one language, whatever their
+    concepts, and the concepts of the forms.
+
+    The analysis runs with a distinct label for each form, so that no pair is
+    discarded for linking a concept to itself.
+    """
+    labelled = [(form[0], k, form[2], form[3]) for k, form in enumerate(forms)]
+    _, edges = function(labelled, timer=timer)
+    pairs = np.array([edge[:2] for edge in edges], dtype=np.int32).reshape(-1, 2)
+    return pairs, [form[1] for form in forms]
+
+
+def _permutation_counts(data, permutations, seed):
+    """
+    Count the units in which the observed edges occur for a batch of
+    permutations.
+
+    @param data: The arrays of a PermutationTest for one statistic.
+    @param permutations: The number of permutations of the batch, or None for
+        the observed counts.
+    @returns: An array with one row per permutation and one column per edge.
+    """
+    keys, directed, size, units = data
+    rng = np.random.default_rng(seed)
+    rows = 1 if permutations is None else permutations
+    counts = np.zeros((rows, len(keys)), dtype=np.int64)
+    offsets = np.arange(rows, dtype=np.int64)[:, None] * len(keys)
+    for languages in units:
+        flat = []
+        for pairs, concepts in languages:
+            if not len(pairs):
+                continue
+            if permutations is None:
+                permuted = concepts[None, :]
+            else:
+                permuted = rng.permuted(np.tile(concepts, (rows, 1)), axis=1)
+            concept_a, concept_b = permuted[:, pairs[:, 0]], permuted[:, pairs[:, 1]]
+            valid = concept_a != concept_b
+            if not directed:
+                concept_a, concept_b = (
+                        np.minimum(concept_a, concept_b), np.maximum(concept_a, concept_b))
+            edge = concept_a * size + concept_b
+            index = np.searchsorted(keys, edge).clip(max=len(keys) - 1)
+            found = valid & (keys[index] == edge)
+            flat.append((offsets + index)[found])
+        if flat:
+            counts.ravel()[np.unique(np.concatenate(flat))] += 1
+    return counts
+
+
+_DATA = None
+
+
+def _initialize(data):
+    global _DATA
+    _DATA = data
+
+
+def _exceedances(batch, observed):
+    permutations, seed = batch
+    return (_permutation_counts(_DATA, permutations, seed) >= observed[None, :]).sum(axis=0)
+
+
+class PermutationTest:
+    """
+    Test colexifications against the colexifications of shuffled concepts.
+
+    The pairs of forms colexifying in each language are computed once, for
+    all forms regardless of their concepts, and stored as integer arrays
+    with the concepts of the forms. A permutation shuffles the concepts of
+    the forms of each language, which then yield the edges of the
+    permutation without running the analysis again, so that batches of
+    permutations are computed with array operations.
+
+    @param wordlist: The wordlist in CLToolkit.
+    @param analysis: The name of the analysis, one of "full", "affix", and
+        "common_substring".
+    @param parameters: The thresholds of the analysis.
+    @param profile: A Profile recording the stages of the analysis of each
+        language, and the stage "permutations" of `pvalues`.
+
+    The other parameters are those of `affix_colexifications`.
+    """
+
+    def __init__(
+            self,
+            wordlist,
+            analysis="affix",
+            concept_attr="concepticon_gloss",
+            form_factory=None,
+            family=None,
+            workers=None,
+            encoder=None,
+            form_cache=None,
+            profile=None,
+            **parameters):
+        function, schema, encoded = ANALYSES[analysis]
+        self.directed = schema.directed
+        concept_factory = lambda x: getattr(x, concept_attr) if x else None
+        form_factory = form_factory or sounds_without_plus
+        encoder = (encoder or SegmentEncoder()) if encoded else None
+        concepts = None
+        if analysis == "full":
+            concepts = set([concept_factory(concept) for concept in wordlist.concepts if
+                            concept_factory(concept)])
+        self.profile = profile
+        languages = get_languages(wordlist, family=family)
+        if profile is not None:
+            languages = profile.iterate(languages)
+        data = (language_data(
+                    language, concept_factory, form_factory, concepts=concepts,
+                    encoder=encoder, timer=profile.timer(language.id) if profile else None,
+                    form_cache=form_cache)
+                for language in languages)
+        self.concepts, index = [], {}
+        self.languages, self.pairs = [], []
+        for language, (pairs, form_concepts) in progressbar(map_languages(
+                functools.partial(
+                    _pairs_language, function=functools.partial(function, **parameters)),
+                data,
+                workers=workers,
+                profile=profile), desc="computing pairs of forms", disable=profile is not None):
+            for concept in form_concepts:
+                if concept not in index:
+                    index[concept] = len(self.concepts)
+                    self.concepts.append(concept)
+            self.languages.append(language)
+            self.pairs.append((pairs, np.array(
+                [index[concept] for concept in form_concepts], dtype=np.int64)))
+        self._edges = {}
+
+    def _data(self, statistic, keys=None):
+        """
+        Return the arrays passed to `_permutation_counts`, with the languages
+        grouped by the units counted by the statistic.
+        """
+        units = OrderedDict()
+        for language, pairs in zip(self.languages, self.pairs):
+            units.setdefault(language[STATISTICS[statistic]], []).append(pairs)
+        if keys is None:
+            keys = np.arange(len(self.concepts) ** 2, dtype=np.int64)
+        return keys, self.directed, len(self.concepts), list(units.values())
+
+    def observed(self, statistic="family_count"):
+        """
+        Return the observed edges with their statistic.
+
+        @param statistic: The statistic of the edges, "family_count",
+            "language_count", or "variety_count".
+        @returns: A list of (concept A, concept B) tuples, with concept A
+            before concept B in the order of the concepts for undirected
+            graphs, and an array of the statistic of each edge.
+        """
+        if statistic not in self._edges:
+            edges = set()
+            size = len(self.concepts)
+            for pairs, concepts in self.pairs:
+                concept_a, concept_b = concepts[pairs[:, 0]], concepts[pairs[:, 1]]
+                valid = concept_a != concept_b
+                concept_a, concept_b = concept_a[valid], concept_b[valid]
+                if not self.directed:
+                    concept_a, concept_b = (
+                            np.minimum(concept_a, concept_b), np.maximum(concept_a, concept_b))
+                edges.update((concept_a * size + concept_b).tolist())
+            keys = np.array(sorted(edges), dtype=np.int64)
+            values = _permutation_counts(self._data(statistic, keys), None, None)[0]
+            self._edges[statistic] = (keys, values)
+        keys, values = self._edges[statistic]
+        size = len(self.concepts)
+        return [(self.concepts[key // size], self.concepts[key % size])
+                for key in keys.tolist()], values
+
+    def pvalues(
+            self,
+            permutations=1000,
+            statistic="family_count",
+            seed=0,
+            batch_size=100,
+            workers=None):
+        """
+        Compute the empirical p-values of the observed edges.
+
+        The p-value of an edge is (1 + k) / (1 + n), where k is the number of
+        the n permutations in which the statistic of the edge is at least as
+        high as observed. Permutations are computed in batches, each with its
+        own random generator derived from the seed, so that the p-values do
+        not depend on the number of workers.
+
+        @param permutations: The number of permutations.
+        @param seed: The seed of the random generators.
+        @param batch_size: The number of permutations computed together.
+        @param workers: The number of worker processes computing batches.
+        @returns: A list of (concept A, concept B) tuples, the array of the
+            observed statistic, and the array of p-values of the edges.
+        """
+        edges, observed = self.observed(statistic)
+        data = self._data(statistic, self._edges[statistic][0])
+        sizes = [min(batch_size, permutations - start)
+                 for start in range(0, permutations, batch_size)]
+        batches = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+        exceedances = np.zeros(len(edges), dtype=np.int64)
+        disable = self.profile is not None
+        with (self.profile.timer() if self.profile else NULL_TIMER).stage(
+                "permutations", permutations):
+            if not workers or workers < 2:
+                _initialize(data)
+                for batch in progressbar(
+                        batches, desc="computing permutations", disable=disable):
+                    exceedances += _exceedances(batch, observed)
+            else:
+                with ProcessPoolExecutor(
+                        max_workers=workers, initializer=_initialize,
+                        initargs=(data, )) as executor:
+                    for result in progressbar(executor.map(
+                            functools.partial(_exceedances, observed=observed), batches),
+                            total=len(batches), desc="computing permutations",
+                            disable=disable):
+                        exceedances += result
+        return edges, observed, (1 + exceedances) / (1 + permutations)
+
+    def annotate(self, graph, edges, pvalues, statistic="family_count"):
+        """
+        Add the p-values to the edges of a graph of the same analysis, as
+        attribute `statistic + "_pvalue"`.
+        """
+        name = statistic + "_pvalue"
+        for (concept_a, concept_b), pvalue in zip(edges, pvalues.tolist()):
+            if graph.has_edge(concept_a, concept_b):
+                graph[concept_a][concept_b][name] = pvalue
+        return graph
+
+
+def permutation_test(
+        wordlist,
+        analysis="affix",
+        permutations=1000,
+        statistic="family_count",
+        seed=0,
+        batch_size=100,
+        workers=None,
+        concept_attr="concepticon_gloss",
+        form_factory=None,
+        family=None,
+        encoder=None,
+        form_cache=None,
+        profile=None,
+        **parameters):
+    """
+    Compute the graph of an analysis with empirical p-values of its edges.
+
+    @returns: The graph of the analysis, whose edges have the p-value of the
+        statistic, such as "family_count_pvalue", next to the statistic.
+
+    The parameters are those of `PermutationTest` and
+    `PermutationTest.pvalues`.
+    """
+    encoder = encoder or SegmentEncoder()
+    test = PermutationTest(
+            wordlist, analysis=analysis, concept_attr=concept_attr,
+            form_factory=form_factory, family=family, workers=workers, encoder=encoder,
+            form_cache=form_cache, profile=profile, **parameters)
+    edges, _, pvalues = test.pvalues(
+            permutations=permutations, statistic=statistic, seed=seed,
+            batch_size=batch_size, workers=workers)
+    kw = {} if analysis == "full" else {"encoder": encoder}
+    graph = GRAPHS[analysis](
+            wordlist, concept_attr=concept_attr, form_factory=form_factory, family=family,
+            workers=workers, form_cache=form_cache, profile=profile, **kw, **parameters)
+    return test.annotate(graph, edges, pvalues, statistic=statistic)
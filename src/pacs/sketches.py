@@ -0,0 +1,240 @@
+"""
+Approximate distinct counts of colexifications with HyperLogLog sketches.
+"""
+import hashlib
+import math
+
+import networkx as nx
+import numpy as np
+
+__all__ = ['HyperLogLog', 'SketchTable']
+
+
+def stable_hash(value):
+    """
+    Return a 64 bit hash of a value that is the same in all processes.
+
+    Unlike `hash`, the hash of strings does not depend on the process, so
+    that sketches from different runs can be merged.
+    """
+    if not isinstance(value, bytes):
+        value = repr(value).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "little")
+
+
+class HyperLogLog:
+    """
+    A mergeable sketch of the number of distinct values added to it.
+
+    A sketch holds the 64 bit hashes of its values until it has more than
+    `2 ** precision / 16` of them, which are counted exactly, and is then
+    converted to `2 ** precision` registers of one byte, from which the
+    count is estimated with a relative standard error of `1.04 / sqrt(2 **
+    precision)`, about 3.3% for the default precision of 10, using linear
+    counting for small counts. The error holds for large numbers of
+    registers: with fewer than 64 registers, counts of the order of the
+    number of registers can be off by more. Sketches of the same precision
+    are merged by keeping the maximum of each register, which gives the same
+    sketch as adding all values to one sketch.
+
+    @param precision: The number of bits of the hashes that select a
+        register, between 4 and 16.
+    """
+    __slots__ = ["precision", "hashes", "registers"]
+
+    def __init__(self, precision=10):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.hashes = set()
+        self.registers = None
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    def add_hash(self, value):
+        """
+        Add the 64 bit hash of a value.
+        """
+        if self.registers is None:
+            self.hashes.add(value)
+            if len(self.hashes) > (1 << self.precision) >> 4:
+                self._dense()
+        else:
+            self._register(value)
+
+    def add(self, value):
+        self.add_hash(stable_hash(value))
+
+    def _register(self, value):
+        bits = 64 - self.precision
+        rest = value & ((1 << bits) - 1)
+        rank = bits - rest.bit_length() + 1
+        index = value >> bits
+        if self.registers[index] < rank:
+            self.registers[index] = rank
+
+    def _dense(self):
+        self.registers = bytearray(1 << self.precision)
+        for value in self.hashes:
+            self._register(value)
+        self.hashes = set()
+
+    def update(self, other):
+        """
+        Merge another sketch of the same precision into the sketch.
+        """
+        if other.precision != self.precision:
+            raise ValueError("sketches of different precisions cannot be merged")
+        if other.registers is None:
+            for value in other.hashes:
+                self.add_hash(value)
+            return
+        if self.registers is None:
+            self._dense()
+        self.registers = bytearray(np.maximum(
+            np.frombuffer(self.registers, dtype=np.uint8),
+            np.frombuffer(other.registers, dtype=np.uint8)).tobytes())
+
+    def count(self):
+        """
+        Return the exact or estimated number of distinct values.
+        """
+        if self.registers is None:
+            return len(self.hashes)
+        size = 1 << self.precision
+        registers = np.frombuffer(self.registers, dtype=np.uint8)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(size, 0.7213 / (1 + 1.079 / size))
+        estimate = alpha * size * size / np.ldexp(1.0, -registers.astype(np.int64)).sum()
+        zeros = int((registers == 0).sum())
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(size / zeros)
+        return int(round(estimate))
+
+
+class SketchTable:
+    """
+    Estimate the distinct varieties, languages, families, and forms of nodes
+    and edges with HyperLogLog sketches while occurrences are added.
+
+    Like a CountTable, the table only supports the `*_count` attributes of
+    the graph and the `count` of edges, which is exact, but it keeps one
+    HyperLogLog sketch for each count of each node and edge instead of sets
+    of values. Values are hashed with a hash that does not depend on the
+    process, so that tables of different parts of a wordlist, computed in
+    different processes or runs, can be merged with `update`. Counts up to
+    `2 ** precision / 16` are exact, larger counts have a relative standard
+    error of `1.04 / sqrt(2 ** precision)`.
+
+    The table can be used with the analyses by passing
+    `table_factory=SketchTable`, or a partial function setting the
+    precision.
+
+    @param schema: The Schema of the graph produced from the table.
+    @param decode: Not used, since words are not stored.
+    @param precision: The precision of the sketches.
+    """
+
+    def __init__(self, schema, decode=None, precision=10):
+        self.schema = schema
+        self.precision = precision
+        self.nodes = {}
+        self.edges = {}
+        self._forms = "forms" in [attr for attr, _ in schema.counts]
+
+    def __len__(self):
+        return sum([entry[0] for entry in self.edges.values()])
+
+    @property
+    def relative_error(self):
+        """
+        The relative standard error of counts larger than the exact range.
+        """
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    def _entry(self):
+        return [0] + [HyperLogLog(self.precision) for _ in range(4)]
+
+    def add(self, language, nodes, edges):
+        """
+        Add the partial result of one language.
+
+        @param language: A (variety, language, family) tuple.
+        @param nodes: A list of (concept, role, form, word) tuples.
+        @param edges: A list of (concept A, concept B, form A, form B, word A,
+            word B) tuples.
+        """
+        hashes = [stable_hash(value) for value in language]
+        directed = self.schema.directed
+
+        touched = {}
+        for concept, _, form, _ in nodes:
+            entry = self.nodes.get(concept)
+            if entry is None:
+                entry = self.nodes[concept] = self._entry()
+            entry[0] += 1
+            if self._forms:
+                entry[4].add(form)
+            touched[concept] = entry
+        for entry in touched.values():
+            for sketch, value in zip(entry[1:4], hashes):
+                sketch.add_hash(value)
+
+        touched = {}
+        for concept_a, concept_b, form_a, form_b, _, _ in edges:
+            key = (concept_a, concept_b)
+            if key not in self.edges and not directed and (concept_b, concept_a) in self.edges:
+                key = (concept_b, concept_a)
+            entry = self.edges.get(key)
+            if entry is None:
+                entry = self.edges[key] = self._entry()
+            entry[0] += 1
+            if self._forms:
+                entry[4].add((form_a, form_b))
+            touched[key] = entry
+        for entry in touched.values():
+            for sketch, value in zip(entry[1:4], hashes):
+                sketch.add_hash(value)
+
+    def update(self, other):
+        """
+        Merge a SketchTable of other languages, with the same schema and
+        precision, into the table.
+
+        Nodes and edges that only occur in the other table are added after
+        those of the table, as if its languages had been added afterwards.
+        """
+        if other.precision != self.precision:
+            raise ValueError("tables of different precisions cannot be merged")
+        for own, theirs, is_edges in ((self.nodes, other.nodes, False),
+                                      (self.edges, other.edges, True)):
+            for key, entry in theirs.items():
+                if is_edges and key not in own and not self.schema.directed and \
+                        (key[1], key[0]) in own:
+                    key = (key[1], key[0])
+                target = own.get(key)
+                if target is None:
+                    target = own[key] = self._entry()
+                target[0] += entry[0]
+                for sketch, sketch_b in zip(target[1:], entry[1:]):
+                    sketch.update(sketch_b)
+
+    def _counts(self, entry):
+        values = {"varieties": entry[1], "languages": entry[2], "families": entry[3],
+                  "forms": entry[4]}
+        return {name + "_count": values[attr].count() for attr, name in self.schema.counts}
+
+    def to_graph(self):
+        """
+        Build the networkx graph with estimated counts.
+        """
+        graph = nx.DiGraph() if self.schema.directed else nx.Graph()
+        graph.add_nodes_from(
+                [(concept, self._counts(entry)) for concept, entry in self.nodes.items()])
+        with_count = "count" in [name for _, name in self.schema.edges]
+        for (concept_a, concept_b), entry in self.edges.items():
+            data = {"count": entry[0]} if with_count else {}
+            data.update(self._counts(entry))
+            graph.add_edge(concept_a, concept_b, **data)
+        return graph
@@ -0,0 +1,206 @@
+"""
+Accumulation of colexification occurrences in sorted runs on disk.
+"""
+import os
+import tempfile
+from array import array
+
+import networkx as nx
+import numpy as np
+
+from pacs.occurrences import NODE_COLUMNS, EDGE_COLUMNS, OccurrenceTable
+
+__all__ = ['SpillingTable']
+
+
+class SpillingTable:
+    """
+    Store the occurrences of an analysis in sorted runs on disk.
+
+    Occurrences are added to an OccurrenceTable in memory. When its columns
+    exceed the memory limit, the rows are sorted by node or edge and
+    written as a run to a temporary directory. The runs are merged in blocks
+    of complete nodes and edges when the graph is built, so that only one
+    block of occurrences is held in memory besides the graph. Interned
+    values, such as concepts, form IDs, and words, are kept in memory.
+
+    Only the integer rows of the occurrences are bounded by the memory
+    limit. The intern table grows with the number of distinct concepts,
+    form IDs, and words, which is of the order of the forms of the wordlist,
+    and `to_graph` builds the whole graph, with its list attributes, in
+    memory. Use `iter_graph_nodes` and `iter_graph_edges` to write the graph
+    without building it, or `to_graph(lists=False)` to keep only counts.
+
+    The graph is the same as the graph built by an OccurrenceTable with the
+    same rows. The table can be used with the analyses by passing
+    `table_factory=SpillingTable`, or a partial function setting its
+    arguments.
+
+    @param schema: The Schema of the graph produced from the table.
+    @param decode: A function that converts encoded words to strings.
+    @param memory_limit: The number of bytes of the occurrences held in memory
+        before they are written to disk, which is also the approximate size
+        of the blocks merged when the graph is built.
+    @param directory: The directory in which the temporary directory with the
+        runs is created, by default the directory of `tempfile`.
+    """
+
+    def __init__(self, schema, decode=None, memory_limit=2**28, directory=None):
+        self.schema = schema
+        self.decode = decode
+        self.memory_limit = memory_limit
+        self.buffer = OccurrenceTable(schema, decode=decode)
+        self.directory = tempfile.TemporaryDirectory(prefix="pacs-", dir=directory)
+        self.runs = {"nodes": [], "edges": []}
+        self.rows = {"nodes": 0, "edges": 0}
+
+    def __len__(self):
+        return self.rows["edges"] + len(self.buffer)
+
+    def close(self):
+        """
+        Delete the runs on disk.
+        """
+        self.directory.cleanup()
+        self.runs = {"nodes": [], "edges": []}
+
+    def add(self, language, nodes, edges):
+        """
+        Add the partial result of one language.
+
+        @param language: A (variety, language, family) tuple.
+        @param nodes: A list of (concept, role, form, word) tuples.
+        @param edges: A list of (concept A, concept B, form A, form B, word A,
+            word B) tuples.
+        """
+        self.buffer.add(language, nodes, edges)
+        size = 8 * (len(self.buffer.nodes["variety"]) * len(NODE_COLUMNS) +
+                    len(self.buffer) * len(EDGE_COLUMNS))
+        if size >= self.memory_limit:
+            self.spill()
+
+    def _keys(self, kind, columns):
+        if kind == "nodes":
+            return columns["concept"]
+        concept_a, concept_b = columns["concept_a"], columns["concept_b"]
+        if not self.schema.directed:
+            concept_a, concept_b = (
+                    np.minimum(concept_a, concept_b), np.maximum(concept_a, concept_b))
+        return (concept_a << 32) | concept_b
+
+    def spill(self):
+        """
+        Write the occurrences held in memory as sorted runs to disk.
+
+        A run is an array with one row for the keys of the nodes or edges,
+        one row for the numbers of the occurrences, and one row for each
+        column, sorted by key and occurrence.
+        """
+        for kind, names in (("nodes", NODE_COLUMNS), ("edges", EDGE_COLUMNS)):
+            columns = getattr(self.buffer, kind)
+            size = len(columns["variety"])
+            if not size:
+                continue
+            values = {name: np.frombuffer(columns[name], dtype=np.int64) for name in names}
+            rows = np.arange(self.rows[kind], self.rows[kind] + size, dtype=np.int64)
+            keys = self._keys(kind, values)
+            order = np.lexsort((rows, keys))
+            run = np.empty((2 + len(names), size), dtype=np.int64)
+            for i, column in enumerate([keys, rows] + [values[name] for name in names]):
+                run[i] = column[order]
+            path = os.path.join(
+                    self.directory.name, "{0}-{1}.npy".format(kind, len(self.runs[kind])))
+            np.save(path, run)
+            self.runs[kind].append(path)
+            self.rows[kind] += size
+            setattr(self.buffer, kind, {name: array("q") for name in names})
+
+    def _blocks(self, kind):
+        """
+        Merge the sorted runs in blocks of complete nodes or edges.
+
+        Each block ends with the smallest key reached by any run when
+        advancing all runs by their share of the block size, so that no node
+        or edge is split between blocks.
+        """
+        runs = [np.load(path, mmap_mode="r") for path in self.runs[kind]]
+        width = 2 + len(NODE_COLUMNS if kind == "nodes" else EDGE_COLUMNS)
+        step = max(1, self.memory_limit // (8 * width * max(1, len(runs))))
+        cursors = [0 for _ in runs]
+        while True:
+            active = [i for i, run in enumerate(runs) if cursors[i] < run.shape[1]]
+            if not active:
+                return
+            end = min([
+                runs[i][0, min(cursors[i] + step, runs[i].shape[1]) - 1] for i in active])
+            parts = []
+            for i in active:
+                stop = cursors[i] + int(np.searchsorted(
+                    runs[i][0, cursors[i]:], end, side="right"))
+                parts.append(np.array(runs[i][:, cursors[i]:stop]))
+                cursors[i] = stop
+            block = np.concatenate(parts, axis=1)
+            yield block[:, np.lexsort((block[1], block[0]))]
+
+    def _groups(self, kind, lists):
+        """
+        Yield the first occurrences of the nodes or edges of each block with
+        the result of `node_groups` or `edge_groups` for the block.
+        """
+        names = NODE_COLUMNS if kind == "nodes" else EDGE_COLUMNS
+        for block in self._blocks(kind):
+            keys, rows = block[0], block[1]
+            starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+            first = rows[starts]
+            # order the block by first occurrence as in the OccurrenceTable
+            order = np.lexsort((rows, np.repeat(first, np.diff(np.append(starts, len(keys))))))
+            table = OccurrenceTable(self.schema, decode=self.decode)
+            table.values, table._index, table.languages = (
+                    self.buffer.values, self.buffer._index, self.buffer.languages)
+            for name, values in zip(names, block[2:, order]):
+                getattr(table, kind)[name] = array("q", values.tobytes())
+            if kind == "nodes":
+                yield np.sort(first), table.node_groups(lists)
+            else:
+                yield np.sort(first), table.edge_groups(lists)
+
+    def iter_graph_nodes(self, lists=True):
+        """
+        Yield the nodes of the graph as (concept, attributes) tuples, ordered
+        by the interned concepts, without building the graph.
+        """
+        self.spill()
+        for _, (concepts, attributes) in self._groups("nodes", lists):
+            yield from zip(concepts, attributes)
+
+    def iter_graph_edges(self, lists=True):
+        """
+        Yield the edges of the graph as (concept A, concept B, attributes)
+        tuples, ordered by the interned concepts, without building the graph.
+        """
+        self.spill()
+        for _, (concept_a, concept_b, attributes) in self._groups("edges", lists):
+            yield from zip(concept_a, concept_b, attributes)
+
+    def to_graph(self, lists=True):
+        """
+        Build the networkx graph with list attributes and counts.
+
+        @param lists: Add the list attributes of nodes and edges. Otherwise,
+            only the counts are added.
+        """
+        self.spill()
+        graph = nx.DiGraph() if self.schema.directed else nx.Graph()
+        for kind in ("nodes", "edges"):
+            firsts, groups = [], []
+            for first, group in self._groups(kind, lists):
+                firsts.append(first)
+                groups.extend(zip(*group))
+            # blocks are ordered by key, the graph by first occurrence
+            order = np.argsort(np.concatenate(
+                firsts or [np.zeros(0, dtype=np.int64)]), kind="stable").tolist()
+            if kind == "nodes":
+                graph.add_nodes_from([groups[i] for i in order])
+            else:
+                graph.add_edges_from([groups[i] for i in order])
+        return graph
@@ -0,0 +1,147 @@
+"""
+Neighborhoods of all nodes of a graph computed in batches over a CSR adjacency.
+"""
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+__all__ = ['Adjacency', 'neighborhoods']
+
+
+class Adjacency:
+    """
+    The adjacency of a graph in compressed sparse row format.
+
+    The neighbors of the node with index i are `indices[indptr[i]:indptr[i +
+    1]]`, which are the successors of the node in directed graphs, as in
+    `graph[node]`.
+    """
+
+    def __init__(self, graph):
+        self.nodes = list(graph.nodes)
+        index = {node: i for i, node in enumerate(self.nodes)}
+        degrees = [len(graph[node]) for node in self.nodes]
+        self.indptr = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum(degrees)
+        self.indices = np.array(
+                [index[neighbor] for node in self.nodes for neighbor in graph[node]],
+                dtype=np.int64)
+        self.degrees = np.diff(self.indptr)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def expand(self, codes):
+        """
+        Return the neighbors of a batch of frontiers.
+
+        @param codes: A sorted array of row * len(self) + node codes, where
+            row identifies the frontier to which a node belongs.
+        @returns: The sorted and unique codes of the neighbors of each frontier.
+        """
+        n = len(self)
+        rows, nodes = np.divmod(codes, n)
+        starts, ends = self.indptr[nodes], self.indptr[nodes + 1]
+        counts = ends - starts
+        # positions of all neighbors in self.indices, one range for each node
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        positions = offsets + np.arange(counts.sum())
+        return np.unique(np.repeat(rows, counts) * n + self.indices[positions])
+
+
+def _count(codes, n, size):
+    return np.bincount(codes // n, minlength=size)
+
+
+def batch_neighborhoods(adjacency, batch, max_distance=2, max_nodes_pre=30, max_nodes_post=50):
+    """
+    Compute the neighborhoods of a batch of nodes at once.
+
+    Each node is expanded by generations of neighbors, as long as the
+    neighborhood has at most `max_nodes_pre` nodes, the maximal distance is
+    not reached, and the next generation has at most `max_nodes_post` nodes.
+
+    @param adjacency: The Adjacency of the graph.
+    @param batch: An array of node indices.
+    @returns: An array of the node indices of all neighborhoods and an array
+        of the offsets of the neighborhood of each node of the batch in it.
+    """
+    n, size = len(adjacency), len(batch)
+    generation = np.arange(size, dtype=np.int64) * n + np.asarray(batch, dtype=np.int64)
+    union = generation
+    active = np.ones(size, dtype=bool)
+    depth = 1
+    while depth <= max_distance:
+        active &= (_count(generation, n, size) > 0) & (_count(union, n, size) <= max_nodes_pre)
+        if not active.any():
+            break
+        generation = generation[active[generation // n]]
+        # the next generation is at least as large as the largest number of
+        # neighbors of a node, so these frontiers need not be expanded
+        largest = np.zeros(size, dtype=np.int64)
+        np.maximum.at(largest, generation // n, adjacency.degrees[generation % n])
+        active &= largest <= max_nodes_post
+        generation = adjacency.expand(generation[active[generation // n]])
+        # adding another generation would push a neighborhood over the limit
+        active &= _count(generation, n, size) <= max_nodes_post
+        generation = generation[active[generation // n]]
+        union = np.union1d(union, generation)
+        depth += 1
+    return union % n, np.searchsorted(union, np.arange(size + 1) * n)
+
+
+_ADJACENCY = None
+
+
+def _initialize(adjacency):
+    global _ADJACENCY
+    _ADJACENCY = adjacency
+
+
+def _batch(batch, **kw):
+    return batch_neighborhoods(_ADJACENCY, batch, **kw)
+
+
+def neighborhoods(
+        graph,
+        max_distance=2,
+        max_nodes_pre=30,
+        max_nodes_post=50,
+        batch_size=1024,
+        workers=None):
+    """
+    Yield the neighborhoods of all nodes of a graph, as `pacs.util.iter_subgraphs`.
+
+    Nodes are processed in batches, in which the frontiers of all nodes are
+    expanded together with array operations on the CSR adjacency of the graph.
+
+    @param batch_size: The number of nodes expanded together.
+    @param workers: Number of worker processes. When set to None or 1, the
+        batches are computed in the current process.
+    @returns: A generator yielding (node, subgraph) pairs, where the subgraph
+        is a list of node IDs, in the order of the nodes of the graph.
+    """
+    adjacency = Adjacency(graph)
+    batches = [np.arange(i, min(i + batch_size, len(adjacency)))
+               for i in range(0, len(adjacency), batch_size)]
+    kw = dict(
+            max_distance=max_distance,
+            max_nodes_pre=max_nodes_pre,
+            max_nodes_post=max_nodes_post)
+    if not workers or workers < 2:
+        for batch in batches:
+            yield from _subgraphs(adjacency, batch, batch_neighborhoods(adjacency, batch, **kw))
+        return
+    with ProcessPoolExecutor(
+            max_workers=workers, initializer=_initialize, initargs=(adjacency, )) as executor:
+        for batch, result in zip(batches, executor.map(functools.partial(_batch, **kw), batches)):
+            yield from _subgraphs(adjacency, batch, result)
+
+
+def _subgraphs(adjacency, batch, result):
+    members, bounds = result
+    members = [adjacency.nodes[member] for member in members.tolist()]
+    bounds = bounds.tolist()
+    for i, node in enumerate(batch.tolist()):
+        yield adjacency.nodes[node], members[bounds[i]:bounds[i + 1]]
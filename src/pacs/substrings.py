@@ -0,0 +1,310 @@
+"""
+Trie index for substrings shared in affix position.
+"""
+import itertools
+from collections import defaultdict
+
+import numpy as np
+
+
+class AffixTrie:
+    """
+    Index all prefixes and suffixes of the forms of one language.
+
+    The index consists of a trie of the forms and a trie of the reversed forms.
+    Forms are truncated to the part in which affix candidates can occur, so
+    that the deepest node shared by two forms in one of the tries yields their
+    longest shared prefix (or suffix). Pairs of forms can thus be enumerated
+    once at this node, rather than once for each n-gram they share.
+
+    @param forms: A list of forms, which can be tuples or encoded strings.
+    @param minimal_length_threshold: Minimal length of a shared substring.
+    @param difference_threshold: Minimal difference between the length of a
+        substring and the length of the form in which it occurs.
+    """
+
+    def __init__(self, forms, minimal_length_threshold, difference_threshold):
+        self.forms = forms
+        self.minimal_length = minimal_length_threshold
+        self.difference = difference_threshold
+        self.prefixes = self._build(
+                [form[:len(form) - difference_threshold] for form in forms])
+        self.suffixes = self._build(
+                [form[difference_threshold:][::-1] for form in forms])
+        self._ranks = {}
+
+    @staticmethod
+    def _build(forms):
+        # a node consists of its children, the forms passing through it, and
+        # the forms ending in it
+        root = [{}, [], []]
+        for i, form in enumerate(forms):
+            node = root
+            for char in form:
+                try:
+                    node = node[0][char]
+                except KeyError:
+                    node[0][char] = [{}, [], []]
+                    node = node[0][char]
+                node[1].append(i)
+            node[2].append(i)
+        return root
+
+    @staticmethod
+    def _lookup(root, sequence):
+        node = root
+        for char in sequence:
+            node = node[0].get(char)
+            if node is None:
+                return None
+        return node
+
+    def _common(self, root, reverse=False):
+        """
+        Yield the n-grams shared by pairs of forms at their deepest common node.
+        """
+        stack = [(child, 1) for child in root[0].values()]
+        while stack:
+            node, depth = stack.pop()
+            # no pairs can be found below nodes with only one form
+            if len(node[1]) < 2:
+                continue
+            children = list(node[0].values())
+            stack += [(child, depth + 1) for child in children]
+            if depth < self.minimal_length:
+                continue
+            pairs = list(itertools.combinations(node[2], r=2))
+            for group_a, group_b in itertools.combinations(
+                    [node[2]] + [child[1] for child in children], r=2):
+                pairs += [(i, j) if i < j else (j, i) for i, j in
+                          itertools.product(group_a, group_b)]
+            if pairs:
+                form = self.forms[node[1][0]]
+                yield form[len(form) - depth:] if reverse else form[:depth], pairs
+
+    def rank(self, ngram):
+        """
+        Return the sort key of an n-gram in the n-gram index of `common_ngrams`.
+
+        N-grams are sorted by decreasing length and then by the position at
+        which they were first added to the index, which is determined by the
+        first form in which they occur and their position in the list of
+        affix candidates of this form.
+        """
+        try:
+            return self._ranks[ngram]
+        except KeyError:
+            pass
+        offset = 2 * (len(ngram) - self.minimal_length)
+        candidates = []
+        node = self._lookup(self.prefixes, ngram)
+        if node is not None:
+            candidates += [(node[1][0], offset)]
+        node = self._lookup(self.suffixes, ngram[::-1])
+        if node is not None:
+            candidates += [(node[1][0], offset + 1)]
+        rank = (-len(ngram), min(candidates))
+        self._ranks[ngram] = rank
+        return rank
+
+    def shared_lengths(self):
+        """
+        Return the lengths of the substrings in affix position shared by pairs.
+
+        @returns: A dictionary with the length of the longest shared prefix of
+            (i, j) tuples of form indices, with i < j, a dictionary with the
+            length of their longest shared suffix, and a list of (i, j),
+            length, k tuples for suffixes of form k which are prefixes of the
+            other form.
+        """
+        prefixes, suffixes, crosses = {}, {}, []
+        for ngram, pairs in self._common(self.prefixes):
+            prefixes.update(dict.fromkeys(pairs, len(ngram)))
+        for ngram, pairs in self._common(self.suffixes, reverse=True):
+            suffixes.update(dict.fromkeys(pairs, len(ngram)))
+        for j, form in enumerate(self.forms):
+            for length in range(self.minimal_length, len(form) - self.difference + 1):
+                node = self._lookup(self.prefixes, form[len(form) - length:])
+                if node is not None:
+                    crosses += [((i, j) if i < j else (j, i), length, j) for i in node[1] if i != j]
+        return prefixes, suffixes, crosses
+
+    def shared(self):
+        """
+        Return the longest substring in affix position shared by pairs of forms.
+
+        @returns: A dictionary with (i, j) tuples of form indices, with i < j,
+            as keys and the highest-ranking shared n-gram as value.
+        """
+        best = {}
+        # shared prefixes are found once per pair
+        for ngram, pairs in self._common(self.prefixes):
+            best.update(dict.fromkeys(pairs, ngram))
+
+        def update(ngram, pairs):
+            conflicts = [(pair, best[pair]) for pair in pairs if pair in best]
+            best.update(dict.fromkeys(pairs, ngram))
+            rank = self.rank(ngram)
+            for pair, other in conflicts:
+                if self.rank(other) < rank:
+                    best[pair] = other
+
+        for ngram, pairs in self._common(self.suffixes, reverse=True):
+            update(ngram, pairs)
+
+        # suffixes of one form that are prefixes of another form
+        for j, form in enumerate(self.forms):
+            for length in range(self.minimal_length, len(form) - self.difference + 1):
+                ngram = form[len(form) - length:]
+                node = self._lookup(self.prefixes, ngram)
+                if node is not None:
+                    update(ngram, [(i, j) if i < j else (j, i) for i in node[1] if i != j])
+        return best
+
+
+def common_substring_pairs(
+        forms,
+        minimal_length_threshold=4,
+        difference_threshold=3):
+    """
+    Return pairs of forms sharing a substring in affix position.
+
+    @param forms: A list of forms, which can be tuples or encoded strings.
+    @returns: A list of (ngram, pairs) tuples, where pairs is a list of (i, j)
+        tuples of indices of forms whose longest shared substring is the
+        n-gram. N-grams and pairs are sorted in the order in which pairs are
+        visited when iterating over the n-grams returned by `common_ngrams`.
+    """
+    index = [i for i, form in enumerate(forms) if len(form) >=
+             minimal_length_threshold + difference_threshold]
+    trie = AffixTrie(
+            [forms[i] for i in index], minimal_length_threshold, difference_threshold)
+    groups = defaultdict(list)
+    for pair, ngram in trie.shared().items():
+        groups[ngram].append(pair)
+    return [
+            (ngram, [(index[i], index[j]) for i, j in sorted(groups[ngram])])
+            for ngram in sorted(groups, key=trie.rank)]
+
+
+class SharedAffixes:
+    """
+    Substrings in affix position shared by pairs of forms for several thresholds.
+
+    The pairs sharing a substring are computed once, for the loosest
+    thresholds. For each pair, the lengths of the longest shared prefix and
+    suffix are stored, as all shorter prefixes and suffixes are shared as
+    well, and the lengths of suffixes of one form which are prefixes of the
+    other. The shared substrings for stricter thresholds are then selected
+    from these lengths.
+
+    @param forms: A list of forms, which can be tuples or encoded strings.
+    @param minimal_length_threshold: The smallest minimal length of a shared
+        substring.
+    @param difference_threshold: The smallest difference between the length
+        of a substring and the length of the form in which it occurs.
+    @param keep: A function, which is called with the indices of two forms
+        and returns whether their pair should be kept.
+    """
+
+    def __init__(self, forms, minimal_length_threshold, difference_threshold, keep=None):
+        self.forms = forms
+        self.index = [i for i, form in enumerate(forms) if len(form) >=
+                      minimal_length_threshold + difference_threshold]
+        self.trie = AffixTrie(
+                [forms[i] for i in self.index], minimal_length_threshold, difference_threshold)
+        prefixes, suffixes, crosses = self.trie.shared_lengths()
+        pairs = set(prefixes) | set(suffixes) | set([pair for pair, _, _ in crosses])
+        if keep is not None:
+            pairs = [(i, j) for i, j in pairs if keep(self.index[i], self.index[j])]
+        self.pairs = sorted(pairs)
+        position = {pair: k for k, pair in enumerate(self.pairs)}
+        lengths = [len(form) for form in self.trie.forms]
+        self.prefix = np.array([prefixes.get(pair, 0) for pair in self.pairs], dtype=np.int64)
+        self.suffix = np.array([suffixes.get(pair, 0) for pair in self.pairs], dtype=np.int64)
+        self.shortest = np.array(
+                [min(lengths[i], lengths[j]) for i, j in self.pairs], dtype=np.int64)
+        crosses = [(position[pair], length, k) for pair, length, k in crosses if pair in position]
+        self.cross_pair = np.array([x[0] for x in crosses], dtype=np.int64)
+        self.cross_length = np.array([x[1] for x in crosses], dtype=np.int64)
+        self.cross_form = [x[2] for x in crosses]
+
+    def _first(self, root, ngram, difference_threshold):
+        # the first form in which the n-gram is an affix candidate
+        node = self.trie._lookup(root, ngram)
+        if node is not None:
+            for i in node[1]:
+                if len(self.trie.forms[i]) - difference_threshold >= len(ngram):
+                    return i
+        return None
+
+    def select(self, minimal_length_threshold=4, difference_threshold=3):
+        """
+        Return the pairs of forms sharing a substring for stricter thresholds.
+
+        @returns: A list of (ngram, pairs) tuples as returned by
+            `common_substring_pairs` for the thresholds, restricted to the
+            pairs kept when the instance was created.
+        """
+        return [
+                (ngram, [(self.index[self.pairs[k][0]], self.index[self.pairs[k][1]])
+                         for k in positions])
+                for ngram, positions in self.positions(
+                    minimal_length_threshold, difference_threshold)]
+
+    def positions(self, minimal_length_threshold=4, difference_threshold=3):
+        """
+        Return the positions of the pairs sharing a substring in `pairs`.
+
+        @returns: A list of (ngram, positions) tuples in the order of
+            `select`.
+        """
+        forms = self.trie.forms
+        ranks = {}
+
+        def rank(ngram):
+            if ngram not in ranks:
+                candidates = []
+                first = self._first(self.trie.prefixes, ngram, difference_threshold)
+                if first is not None:
+                    candidates += [(first, 0)]
+                first = self._first(self.trie.suffixes, ngram[::-1], difference_threshold)
+                if first is not None:
+                    candidates += [(first, 1)]
+                ranks[ngram] = (-len(ngram), min(candidates))
+            return ranks[ngram]
+
+        cap = self.shortest - difference_threshold
+        prefix = np.minimum(self.prefix, cap)
+        prefix[prefix < minimal_length_threshold] = 0
+        suffix = np.minimum(self.suffix, cap)
+        suffix[suffix < minimal_length_threshold] = 0
+        best = np.maximum(prefix, suffix)
+        valid = (self.cross_length >= minimal_length_threshold) & (
+                self.cross_length <= cap[self.cross_pair])
+        np.maximum.at(best, self.cross_pair[valid], self.cross_length[valid])
+        crosses = defaultdict(list)
+        for k in np.nonzero(valid & (self.cross_length == best[self.cross_pair]))[0].tolist():
+            crosses[self.cross_pair[k]].append(self.cross_form[k])
+
+        groups = defaultdict(list)
+        selected = np.nonzero(best)[0]
+        for k, length, p, s in zip(
+                selected.tolist(),
+                best[selected].tolist(),
+                prefix[selected].tolist(),
+                suffix[selected].tolist()):
+            i = self.pairs[k][0]
+            if p == length and s != length and k not in crosses:
+                groups[forms[i][:length]].append(k)
+                continue
+            candidates = []
+            if p == length:
+                candidates += [forms[i][:length]]
+            if s == length:
+                candidates += [forms[i][len(forms[i]) - length:]]
+            for form in crosses.get(k, []):
+                candidates += [forms[form][len(forms[form]) - length:]]
+            groups[min(candidates, key=rank)].append(k)
+        # positions are sorted, since they are added in the order of the pairs
+        return [(ngram, groups[ngram]) for ngram in sorted(groups, key=rank)]
@@ -1,13 +1,23 @@
 import argparse
+import gzip
+import json
+import mmap
+import struct
 from collections import defaultdict
 
 from cldfcatalog import Config
 from cldfbench.catalogs import Glottolog, Concepticon
 import igraph
 import networkx as nx
+import numpy as np
 import html
 
-__all__ = ['networkx2igraph', 'get_communities', 'parse_kwargs']
+from pacs.degree import EdgeArrays
+from pacs.subgraphs import neighborhoods
+
+__all__ = [
+        'networkx2igraph', 'detect_communities', 'get_communities', 'parse_kwargs',
+        'write_graph', 'read_graph']
 
 CATALOGS = {'glottolog': Glottolog, 'concepticon': Concepticon}
 
@@ -23,36 +33,18 @@ def igraph2networkx(graph, nx_cls=None, name="label"):
 
 
 def out_degree(graph, weight, t=2):
-    deg = {node: 0 for node in graph.nodes}
-    for node in graph.nodes:
-        for neighbor in graph[node].items():
-            if neighbor[1][weight] > t:
-                deg[node] += neighbor[1][weight]
-    return deg
+    edges = EdgeArrays(graph)
+    return edges.as_dict(edges.out_degree(weight, [t])[0])
 
 
 def in_degree(graph, weight, t=2):
-    deg = {node: 0 for node in graph.nodes}
-    for node in graph.nodes:
-        for neighbor in graph[node].items():
-            if neighbor[1][weight] > t:
-                deg[neighbor[0]] += neighbor[1][weight]
-    return deg
+    edges = EdgeArrays(graph)
+    return edges.as_dict(edges.in_degree(weight, [t])[0])
 
 
 def degree(graph, weight, t=2):
-    deg = {node: 0 for node in graph.nodes}
-    visited = set()
-    for node in graph.nodes:
-        for neighbor in graph[node].items():
-            if neighbor[1][weight] > t:
-                if (node, neighbor[0]) not in visited:
-                    deg[node] += neighbor[1][weight]
-                    visited.add((node, neighbor[0]))
-                if (neighbor[0], node) not in visited:
-                    deg[neighbor[0]] += neighbor[1][weight]
-                    visited.add((neighbor[0], node))
-    return deg
+    edges = EdgeArrays(graph)
+    return edges.as_dict(edges.degree(weight, [t])[0])
 
 
 def load_gml_as_nx_graph(file, nx_cls=None, name="label"):
@@ -60,27 +52,384 @@ def load_gml_as_nx_graph(file, nx_cls=None, name="label"):
     return igraph2networkx(graph, nx_cls=nx_cls, name=name)
 
 
-def write_gml(graph, path):
+def _joined(data):
+    return {key: "//".join([str(x) for x in value]) if isinstance(value, (list, set)) else value
+            for key, value in data.items()}
+
+
+class _JoinedNodes:
+    def __init__(self, graph):
+        self._graph = graph
+
+    def items(self):
+        for node, data in self._graph.nodes.items():
+            yield node, _joined(data)
+
+
+class _JoinedGraph:
+    """
+    A view of a graph for `nx.generate_gml`, in which list and set values of
+    node and edge attributes are joined with // when they are read.
+    """
+
+    def __init__(self, graph):
+        self._graph = graph
+        self.graph = graph.graph
+        self.nodes = _JoinedNodes(graph)
+
+    def __iter__(self):
+        return iter(self._graph)
+
+    def __len__(self):
+        return len(self._graph)
+
+    def is_directed(self):
+        return self._graph.is_directed()
+
+    def is_multigraph(self):
+        return self._graph.is_multigraph()
+
+    def edges(self, **kw):
+        for edge in self._graph.edges(**kw):
+            yield edge[:-1] + (_joined(edge[-1]), )
+
+
+def generate_gml(graph):
+    """
+    Yield the lines of a graph in GML format (using unicode), as written by
+    `nx.generate_gml` and unescaped, with list and set values of node and
+    edge attributes as strings with // as separator.
+    """
+    for line in nx.generate_gml(_JoinedGraph(graph)):
+        yield html.unescape(line)
+
+
+def write_gml(graph, path, compress=None, buffer_size=2 ** 20):
     """
     Write a graph to GML format (using unicode).
 
-    The graph will be adjusted in such a way that all list and set values in edge and
-    node attributes will be represented in the form of a string with // as separator.
-    """
-    # modify graph TODO
-    ng = graph.copy()
-    for node, data in ng.nodes(data=True):
-        for k, v in data.items():
-            if isinstance(v, (list, set)):
-                data[k] = '//'.join([str(x) for x in v])
-    for nA, nB, data in ng.edges(data=True):
-        for k, v in data.items():
-            if isinstance(v, (list, set)):
-                data[k] = '//'.join([str(x) for x in v])
-    with open(path, 'w') as f:
-        for line in nx.generate_gml(ng):
-            f.write(html.unescape(line) + '\n')
-            
+    All list and set values in edge and node attributes will be represented in
+    the form of a string with // as separator. Lines are written in chunks
+    while they are generated, so the graph is not copied.
+
+    @param compress: Write a gzip file, by default if the path ends in ".gz".
+    @param buffer_size: The number of characters written at once.
+    """
+    path = str(path)
+    if compress is None:
+        compress = path.endswith(".gz")
+    if compress:
+        f = gzip.open(path, "wt", encoding="utf-8")
+    else:
+        f = open(path, "w", encoding="utf-8")
+    with f:
+        chunk, size = [], 0
+        for line in generate_gml(graph):
+            chunk.append(line)
+            size += len(line)
+            if size >= buffer_size:
+                chunk.append("")
+                f.write("\n".join(chunk))
+                chunk, size = [], 0
+        chunk.append("")
+        f.write("\n".join(chunk))
+
+
+MAGIC = b"PACSGRAPH1"
+_MISSING = object()
+# sets and tuples are stored in JSON as objects with their type
+JSON_TYPE = "__pacs_type__"
+JSON_TYPES = {"set": set, "frozenset": frozenset, "tuple": tuple}
+
+
+def _column_type(values):
+    """
+    Determine how the values of an attribute are stored.
+    """
+    types = set()
+    for value in values:
+        if value is _MISSING:
+            continue
+        if isinstance(value, list):
+            elements = set([type(x) for x in value])
+            if not elements:
+                # empty lists fit any type of list
+                types.add("list")
+            elif elements <= {str, type(None)}:
+                types.add("strlist")
+            elif elements <= {int}:
+                types.add("intlist")
+            else:
+                types.add("json")
+        elif isinstance(value, bool):
+            types.add("bool")
+        elif isinstance(value, int):
+            types.add("int" if -2 ** 63 <= value < 2 ** 63 else "json")
+        elif isinstance(value, float):
+            types.add("float")
+        elif isinstance(value, str) or value is None:
+            types.add("str")
+        else:
+            types.add("json")
+    if "list" in types and types - {"list"} <= {"strlist", "intlist"}:
+        # empty lists fit any type of list
+        types.discard("list")
+        types = types or {"strlist"}
+    if len(types) == 1:
+        return types.pop()
+    return "json"
+
+
+def _to_json(value, name):
+    """
+    Write a value as JSON, with sets and tuples tagged with their type.
+    """
+    def encode(value):
+        if isinstance(value, (set, frozenset, tuple)):
+            return {JSON_TYPE: type(value).__name__, "values": [encode(x) for x in value]}
+        if isinstance(value, list):
+            return [encode(x) for x in value]
+        if isinstance(value, dict):
+            if not all([isinstance(key, str) for key in value]):
+                raise ValueError(
+                        "attribute {0!r} has a dictionary with keys that are not "
+                        "strings".format(name))
+            return {key: encode(x) for key, x in value.items()}
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        raise ValueError("attribute {0!r} has a value of the unsupported type {1}".format(
+            name, type(value).__name__))
+    return json.dumps(encode(value))
+
+
+def _from_json(text):
+    def decode(obj):
+        if JSON_TYPE in obj:
+            return JSON_TYPES[obj[JSON_TYPE]](obj["values"])
+        return obj
+    return json.loads(text, object_hook=decode)
+
+
+def _integers(values):
+    """
+    Store integers in 32 bits if they fit.
+    """
+    array = np.array(values, dtype=np.int64)
+    if len(array) and -2 ** 31 <= array.min() and array.max() < 2 ** 31:
+        return array.astype(np.int32)
+    return array
+
+
+def _encode_column(values, intern, name):
+    """
+    Encode the values of an attribute as numpy arrays.
+    """
+    kind = _column_type(values)
+    present = np.array([value is not _MISSING for value in values], dtype=np.uint8)
+    values = [value for value in values if value is not _MISSING]
+    if kind == "strlist":
+        lengths = [len(value) for value in values]
+        arrays = {
+                "offsets": _integers(np.concatenate([[0], np.cumsum(lengths)])),
+                "values": _integers([intern(x) for value in values for x in value])}
+    elif kind == "intlist":
+        lengths = [len(value) for value in values]
+        arrays = {
+                "offsets": _integers(np.concatenate([[0], np.cumsum(lengths)])),
+                "values": _integers([x for value in values for x in value])}
+    elif kind == "str":
+        arrays = {"values": _integers([intern(value) for value in values])}
+    elif kind == "json":
+        arrays = {"values": _integers([intern(_to_json(value, name)) for value in values])}
+    else:
+        dtype = {"int": np.int64, "float": np.float64, "bool": np.uint8}[kind]
+        arrays = {"values": np.array(values, dtype=dtype)}
+    if not present.all():
+        arrays["present"] = present
+    return kind, arrays
+
+
+def write_graph(graph, path):
+    """
+    Write a graph to a compact binary file.
+
+    All strings, including those in list attributes, are stored once in a
+    string table. Node and edge attributes are stored as typed numpy columns,
+    with offsets for list attributes, so that lists are restored exactly by
+    `read_graph`. Values that fit none of the column types are stored as
+    JSON. All columns are aligned to eight bytes, so that files can be
+    memory-mapped.
+
+    Nodes, attributes of the graph, and attributes of nodes and edges can be
+    None, strings, integers, floats, booleans, and lists, tuples, sets, and
+    dictionaries with string keys of such values, which are all restored
+    with their types. Other values raise a ValueError naming the attribute.
+    """
+    strings, index = [], {}
+
+    def intern(value):
+        if value is None:
+            return -1
+        try:
+            return index[value]
+        except KeyError:
+            index[value] = len(strings)
+            strings.append(value)
+            return index[value]
+
+    header = {
+            "directed": graph.is_directed(),
+            "graph": _to_json(graph.graph, "graph"),
+            "nodes": graph.number_of_nodes(),
+            "edges": graph.number_of_edges(),
+            "columns": []}
+    columns = []
+
+    def add(section, name, values):
+        kind, arrays = _encode_column(values, intern, name or section)
+        header["columns"].append({"section": section, "name": name, "type": kind})
+        for part, array in arrays.items():
+            columns.append(((section, name, part), array))
+
+    nodes = list(graph.nodes(data=True))
+    node_index = {node: i for i, (node, _) in enumerate(nodes)}
+    add("nodes", None, [node for node, _ in nodes])
+    for name in _attribute_names([data for _, data in nodes]):
+        add("nodes", name, [data.get(name, _MISSING) for _, data in nodes])
+
+    edges = list(graph.edges(data=True))
+    columns.append((("edges", None, "source"), _integers([node_index[a] for a, _, _ in edges])))
+    columns.append((("edges", None, "target"), _integers([node_index[b] for _, b, _ in edges])))
+    for name in _attribute_names([data for _, _, data in edges]):
+        add("edges", name, [data.get(name, _MISSING) for _, _, data in edges])
+
+    encoded = [string.encode("utf-8") for string in strings]
+    columns.append((("strings", None, "offsets"), _integers(
+        np.concatenate([[0], np.cumsum([len(string) for string in encoded])]))))
+    columns.append((("strings", None, "data"), np.frombuffer(b"".join(encoded), dtype=np.uint8)))
+
+    offset = 0
+    header["arrays"] = []
+    for key, array in columns:
+        header["arrays"].append({
+            "key": list(key), "dtype": array.dtype.str, "offset": offset,
+            "length": len(array)})
+        offset += _padded(array.nbytes)
+    head = json.dumps(header).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(head)))
+        f.write(head)
+        f.write(b"\0" * (_padded(f.tell()) - f.tell()))
+        for _, array in columns:
+            f.write(array.tobytes())
+            f.write(b"\0" * (_padded(array.nbytes) - array.nbytes))
+
+
+def _padded(size):
+    return (size + 7) // 8 * 8
+
+
+def _attribute_names(items):
+    names = {}
+    for data in items:
+        for name in data:
+            names[name] = True
+    return list(names)
+
+
+def read_graph_columns(path, mmap_mode=False):
+    """
+    Read the header and the columns of a graph written with `write_graph`.
+
+    @param mmap_mode: Map the file into memory instead of reading it.
+    @returns: The header and a dictionary of numpy arrays, keyed by (section,
+        attribute, part) tuples.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{0} is not a binary graph file".format(path))
+        size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(size).decode("utf-8"))
+        start = _padded(len(MAGIC) + 8 + size)
+        if mmap_mode:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            f.seek(0)
+            buffer = f.read()
+    arrays = {}
+    for spec in header["arrays"]:
+        arrays[tuple(spec["key"])] = np.frombuffer(
+                buffer, dtype=np.dtype(spec["dtype"]), count=spec["length"],
+                offset=start + spec["offset"])
+    return header, arrays
+
+
+def _decode_column(kind, arrays, key, strings):
+    section, name = key
+    if kind in ("strlist", "intlist"):
+        offsets = arrays[section, name, "offsets"].tolist()
+        flat = arrays[section, name, "values"]
+        flat = (strings[flat] if kind == "strlist" else flat).tolist()
+        values = [flat[start:end] for start, end in zip(offsets, offsets[1:])]
+    elif kind == "str":
+        values = strings[arrays[section, name, "values"]].tolist()
+    elif kind == "json":
+        values = [_from_json(value) for value in
+                  strings[arrays[section, name, "values"]].tolist()]
+    elif kind == "bool":
+        values = [bool(value) for value in arrays[section, name, "values"].tolist()]
+    else:
+        values = arrays[section, name, "values"].tolist()
+    if (section, name, "present") in arrays:
+        values = iter(values)
+        return [next(values) if present else _MISSING for present in
+                arrays[section, name, "present"].tolist()]
+    return values
+
+
+def read_graph(path, mmap_mode=False):
+    """
+    Read a graph written with `write_graph`.
+
+    @param mmap_mode: Map the file into memory instead of reading it, which
+        avoids holding the file and the graph in memory at the same time.
+    """
+    header, arrays = read_graph_columns(path, mmap_mode=mmap_mode)
+    offsets = arrays["strings", None, "offsets"].tolist()
+    data = arrays["strings", None, "data"].tobytes()
+    # the last element is returned for the index -1 used for None
+    strings = np.empty(len(offsets), dtype=object)
+    strings[:-1] = [data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+    strings[-1] = None
+
+    graph = nx.DiGraph() if header["directed"] else nx.Graph()
+    graph.graph.update(_from_json(header["graph"]))
+    attributes = {"nodes": [], "edges": []}
+    for column in header["columns"]:
+        section = column["section"]
+        values = _decode_column(column["type"], arrays, (section, column["name"]), strings)
+        attributes[section].append((column["name"], values))
+
+    nodes = attributes["nodes"][0][1]
+    node_data = [{} for _ in nodes]
+    for name, values in attributes["nodes"][1:]:
+        for data, value in zip(node_data, values):
+            if value is not _MISSING:
+                data[name] = value
+    graph.add_nodes_from(zip(nodes, node_data))
+
+    sources = arrays["edges", None, "source"].tolist()
+    targets = arrays["edges", None, "target"].tolist()
+    edge_data = [{} for _ in sources]
+    for name, values in attributes["edges"]:
+        for data, value in zip(edge_data, values):
+            if value is not _MISSING:
+                data[name] = value
+    graph.add_edges_from(
+            (nodes[a], nodes[b], data) for a, b, data in zip(sources, targets, edge_data))
+    return graph
+
 
 def catalog(name, args):
     repos = getattr(args, name) or Config.from_file().get_clone(name)
@@ -90,18 +439,63 @@ def catalog(name, args):
     return CATALOGS[name](repos, getattr(args, name + '_version'))
 
 
-def networkx2igraph(graph):
-    """Helper function converts networkx graph to igraph graph object."""
-    newgraph = igraph.Graph(directed=graph.is_directed())
-    nodes = {}
-    for i, (node, data) in enumerate(sorted(graph.nodes(data=True), key=lambda i: int(i[0]))):
-        data = {a: b for a, b in data.items()}
-        newgraph.add_vertex(
-            i, Name=node, **{a: b for a, b in data.items() if a not in ['Name', 'name']})
-        nodes[node] = i
-    for node1, node2, data in sorted(graph.edges(data=True), key=lambda i: (int(i[0]), int(i[1]))):
-        newgraph.add_edge(nodes[node1], nodes[node2], **{a: b for a, b in data.items()})
-    return newgraph
+def networkx2igraph(graph, name="Name"):
+    """
+    Convert a networkx graph to an igraph graph in one call.
+
+    Vertices are added in the order of the nodes of the graph, or sorted by
+    their integer values if all nodes are integers or strings of integers,
+    and edges in the order of the graph. Node and edge attributes are passed
+    to igraph as lists, with None for missing values.
+
+    @param name: The vertex attribute that stores the node, which works with
+        any node, such as the concepts of colexification graphs.
+    """
+    nodes = list(graph.nodes)
+    try:
+        nodes.sort(key=int)
+    except (TypeError, ValueError):
+        pass
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = list(graph.edges(data=True))
+    node_data = [graph.nodes[node] for node in nodes]
+    vertex_attrs = {
+            key: [data.get(key) for data in node_data]
+            for key in _attribute_names(node_data) if key not in ("Name", "name", name)}
+    vertex_attrs[name] = nodes
+    edge_data = [data for _, _, data in edges]
+    edge_attrs = {
+            key: [data.get(key) for data in edge_data]
+            for key in _attribute_names(edge_data)}
+    return igraph.Graph(
+            n=len(nodes),
+            edges=[(index[a], index[b]) for a, b, _ in edges],
+            directed=graph.is_directed(),
+            vertex_attrs=vertex_attrs,
+            edge_attrs=edge_attrs)
+
+
+def detect_communities(graph, method="infomap", name="infomap", **kw):
+    """
+    Detect communities with igraph and store them as node attributes.
+
+    @param method: The community detection of igraph, such as "infomap" for
+        `igraph.Graph.community_infomap`.
+    @param name: The node attribute of the communities, read by
+        `get_communities`.
+    @param kw: Arguments of the community detection, where weights are given
+        as names of node or edge attributes, such as
+        `edge_weights="family_count"`.
+    @returns: The igraph clustering. Communities are numbered from 1, in
+        the order of igraph, and stored as strings.
+    """
+    newgraph = networkx2igraph(graph)
+    clustering = getattr(newgraph, "community_" + method)(**kw)
+    if isinstance(clustering, igraph.VertexDendrogram):
+        clustering = clustering.as_clustering()
+    nx.set_node_attributes(graph, dict(zip(
+        newgraph.vs["Name"], [str(i + 1) for i in clustering.membership])), name=name)
+    return clustering
 
 
 def get_communities(graph, name='infomap'):
@@ -115,7 +509,9 @@ def get_communities(graph, name='infomap'):
     return comms
 
 
-def iter_subgraphs(graph, max_distance=2, max_nodes_pre=30, max_nodes_post=50):
+def iter_subgraphs(
+        graph, max_distance=2, max_nodes_pre=30, max_nodes_post=50, batch_size=1024,
+        workers=None):
     """
 
     Parameters
@@ -125,28 +521,21 @@ def iter_subgraphs(graph, max_distance=2, max_nodes_pre=30, max_nodes_post=50):
     max_nodes_pre: The maximal number of nodes in a subgraph before adding another generation of \
     children.
     max_nodes_post: The maximal number of nodes in a subgraph.
+    batch_size: The number of nodes whose subgraphs are computed together.
+    workers: The number of worker processes.
 
     Returns
     -------
     A generator, yielding (node, subgraph) pairs, where node is the central node of the subgraph
     specified as list of node IDs.
     """
-    for node, data in graph.nodes(data=True):
-        generations = [{node}]
-        while (  # noqa: W503
-            generations[-1]  # There are nodes in the last generation.
-            # Current subgraph is still small:
-            and len(set.union(*generations)) <= max_nodes_pre  # noqa: W503
-           # Maximal node distance not reached yet:
-            and len(generations) <= max_distance  # noqa: W503
-        ):
-            nextgen = set.union(*[set(graph[n].keys()) for n in generations[-1]])
-            if len(nextgen) > max_nodes_post:
-                # Adding another generation would push us over the limit.
-                break  # pragma: no cover
-            else:
-                generations.append(set.union(*[set(graph[n].keys()) for n in generations[-1]]))
-        yield node, list(set.union(*generations))
+    yield from neighborhoods(
+            graph,
+            max_distance=max_distance,
+            max_nodes_pre=max_nodes_pre,
+            max_nodes_post=max_nodes_post,
+            batch_size=batch_size,
+            workers=workers)
 
 
 def parse_kwargs(*args):
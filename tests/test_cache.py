@@ -0,0 +1,77 @@
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.cache import FormCache
+from pacs.colexifications import (
+        full_colexifications, affix_colexifications, common_substring_colexifications,
+        sounds_without_plus)
+from pacs.fuzzy import fuzzy_affix_colexifications
+
+SCRIPT = textwrap.dedent("""
+    import sys
+    from pacs.bench import synthetic_wordlist
+    from pacs.cache import ResultCache
+    from pacs.colexifications import affix_colexifications
+    from pacs.fuzzy import fuzzy_affix_colexifications
+
+    cache = ResultCache(sys.argv[2])
+    wordlist = synthetic_wordlist(languages=3, concepts=50, seed=1)
+    {"fuzzy": fuzzy_affix_colexifications, "affix": affix_colexifications}[sys.argv[1]](
+        wordlist, cache=cache)
+    print(cache.hits, cache.misses)
+""")
+
+
+def _run(analysis, path):
+    output = subprocess.run(
+            [sys.executable, "-c", SCRIPT, analysis, str(path)],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True).stdout
+    return tuple(int(x) for x in output.split())
+
+
+@pytest.mark.parametrize("analysis", ["affix", "fuzzy"])
+def test_result_cache_hits_in_new_process(tmp_path, analysis):
+    assert _run(analysis, tmp_path) == (0, 3)
+    assert _run(analysis, tmp_path) == (3, 0)
+
+
+def _dump(graph):
+    return (graph.is_directed(), list(graph.nodes(data=True)), list(graph.edges(data=True)))
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=6, concepts=120, seed=1)
+
+
+def test_form_cache(wordlist):
+    cache = FormCache()
+    for function in (
+            full_colexifications, affix_colexifications, common_substring_colexifications):
+        assert _dump(function(wordlist, form_cache=cache)) == _dump(function(wordlist))
+    assert cache.stats()["hits"]
+
+
+def test_form_cache_keys(wordlist):
+    cache = FormCache()
+    form = wordlist.languages[0].forms_with_sounds[0]
+    # functions with the same name do not share their forms
+    first = cache.normalizer(lambda form: ("first", ))
+    second = cache.normalizer(lambda form: ("second", ))
+    assert first(form)[0] == ("first", )
+    assert second(form)[0] == ("second", )
+    assert cache.normalizer(sounds_without_plus)(form)[0] == sounds_without_plus(form)
+    assert cache.stats()["misses"] == 3
+
+    # partial functions created in each call share their forms
+    cache.clear()
+    fuzzy_affix_colexifications(wordlist, form_cache=cache)
+    misses = cache.stats()["misses"]
+    fuzzy_affix_colexifications(wordlist, form_cache=cache)
+    assert cache.stats()["misses"] == misses
+    assert cache.stats()["hits"] == misses
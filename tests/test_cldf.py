@@ -0,0 +1,89 @@
+import csv
+import random
+
+import pytest
+
+from pacs.bench import synthetic_wordlist, write_cldf
+from pacs.cldf import StreamingWordlist, Sound
+from pacs.colexifications import (
+        full_colexifications, affix_colexifications, common_substring_colexifications)
+
+FUNCTIONS = {
+        "full": full_colexifications,
+        "affix": affix_colexifications,
+        "common_substring": common_substring_colexifications}
+
+
+def _dump(graph):
+    return (graph.is_directed(), list(graph.nodes(data=True)), list(graph.edges(data=True)))
+
+
+def _forms(wordlist):
+    return [(language.id, language.family, [
+                (form.id, form.concept.concepticon_gloss, form.value,
+                 [str(sound) for sound in form.sound_objects])
+                for form in language.forms_with_sounds])
+            for language in wordlist.languages]
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=6, concepts=120, seed=1)
+
+
+def test_streaming_wordlist(tmp_path, wordlist):
+    metadata = write_cldf(wordlist, tmp_path / "cldf")
+    streaming = StreamingWordlist(metadata)
+    assert _forms(streaming) == _forms(wordlist)
+    for name, function in FUNCTIONS.items():
+        assert _dump(function(streaming)) == _dump(function(wordlist))
+
+
+def test_unsorted_forms(tmp_path, wordlist):
+    metadata = write_cldf(wordlist, tmp_path / "cldf")
+    path = tmp_path / "cldf" / "forms.csv"
+    with open(str(path), encoding="utf-8", newline="") as f:
+        header, *rows = list(csv.reader(f))
+    random.Random(0).shuffle(rows)
+    with open(str(path), "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows([header] + rows)
+
+    # languages come in the order of their first form
+    first = []
+    for row in rows:
+        if "synthetic-" + row[1] not in first:
+            first.append("synthetic-" + row[1])
+    streaming = StreamingWordlist(metadata)
+    assert [language.id for language in streaming.languages] == first
+    # forms of each language are in the order of the file
+    position = {"synthetic-" + row[0]: i for i, row in enumerate(rows)}
+    forms = {language[0]: sorted(language[2], key=lambda form: position[form[0]])
+             for language in _forms(wordlist)}
+    assert dict((language[0], language[2]) for language in _forms(streaming)) == forms
+
+
+class TranscriptionSystem:
+    # sounds of a transcription system, in which "?" is unknown
+    class Sound:
+        def __init__(self, grapheme):
+            self.grapheme = grapheme
+            self.type = "unknownsound" if grapheme == "?" else (
+                    "marker" if grapheme in "+_" else "consonant")
+
+        def __str__(self):
+            return self.grapheme
+
+    def __getitem__(self, grapheme):
+        return self.Sound(grapheme)
+
+
+def test_sounds(tmp_path, wordlist):
+    streaming = StreamingWordlist(write_cldf(wordlist, tmp_path / "cldf"))
+    assert [str(s) for s in streaming.sounds("_ p a _ + t a +".split())] == \
+        ["p", "a", "+", "t", "a"]
+    assert streaming.sounds("p ? a".split()) == (Sound("p", "sound"), Sound("?", "sound"),
+                                                 Sound("a", "sound"))
+    streaming = StreamingWordlist(write_cldf(wordlist, tmp_path / "cldf"),
+                                  ts=TranscriptionSystem())
+    assert streaming.sounds("p ? a".split()) == ()
+    assert streaming.sounds("t/p a".split()) == (Sound("p", "consonant"), Sound("a", "consonant"))
@@ -0,0 +1,45 @@
+import pytest
+
+from pacs.bench import SyntheticWordlist, synthetic_wordlist
+from pacs.colexifications import (
+        full_colexifications, affix_colexifications, common_substring_colexifications)
+
+FUNCTIONS = {
+        "full": full_colexifications,
+        "affix": affix_colexifications,
+        "common_substring": common_substring_colexifications}
+
+
+def _dump(graph):
+    return (graph.is_directed(), list(graph.nodes(data=True)), list(graph.edges(data=True)))
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=6, concepts=120, seed=1)
+
+
+@pytest.fixture(scope="module")
+def graphs(wordlist):
+    return {name: function(wordlist) for name, function in FUNCTIONS.items()}
+
+
+def test_common_substring_engines(wordlist, graphs):
+    for thresholds in ({}, {"minimal_length_threshold": 3, "difference_threshold": 2}):
+        trie = common_substring_colexifications(wordlist, engine="trie", **thresholds)
+        ngrams = common_substring_colexifications(wordlist, engine="ngrams", **thresholds)
+        assert _dump(trie) == _dump(ngrams)
+        assert trie.number_of_edges()
+
+
+@pytest.mark.parametrize("name", list(FUNCTIONS))
+def test_workers(wordlist, graphs, name):
+    assert _dump(FUNCTIONS[name](wordlist, workers=2)) == _dump(graphs[name])
+
+
+def test_concepts_of_full_colexifications(wordlist, graphs):
+    restricted = SyntheticWordlist(wordlist.languages, wordlist.concepts[:60])
+    concepts = set([concept.concepticon_gloss for concept in restricted.concepts])
+    graph = full_colexifications(restricted)
+    assert set(graph.nodes) <= concepts
+    assert graph.number_of_edges() < graphs["full"].number_of_edges()
@@ -0,0 +1,28 @@
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.cache import FormCache
+from pacs.colexifications import (
+        full_colexifications, affix_colexifications, common_substring_colexifications,
+        combined_colexifications)
+
+FUNCTIONS = {
+        "full": full_colexifications,
+        "affix": affix_colexifications,
+        "common_substring": common_substring_colexifications}
+
+
+def _dump(graph):
+    return (graph.is_directed(), list(graph.nodes(data=True)), list(graph.edges(data=True)))
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=6, concepts=120, seed=1)
+
+
+def test_combined(wordlist):
+    combined = combined_colexifications(wordlist, form_cache=FormCache())
+    assert list(combined) == list(FUNCTIONS)
+    for name, graph in combined.items():
+        assert _dump(graph) == _dump(FUNCTIONS[name](wordlist))
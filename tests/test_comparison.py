@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.colexifications import affix_colexifications, full_colexifications
+from pacs.comparison import compare_graphs, kendall_test, kendall_tau, rank, spearman
+from pacs.util import degree, in_degree
+
+stats = pytest.importorskip("scipy.stats")
+
+
+@pytest.fixture(scope="module")
+def graphs():
+    wordlist = synthetic_wordlist(languages=12, concepts=150, seed=6)
+    return full_colexifications(wordlist), affix_colexifications(wordlist)
+
+
+def test_correlations():
+    rng = np.random.default_rng(0)
+    for size in (3, 10, 100, 1000):
+        a = rng.integers(0, 8, size)
+        b = a + rng.integers(0, 5, size)
+        assert np.allclose(rank(a), stats.rankdata(a))
+        assert np.isclose(spearman(a, b), stats.spearmanr(a, b)[0])
+        tau, pvalue = stats.kendalltau(a, b, method="asymptotic")
+        assert np.allclose(kendall_test(a, b, block_size=64), (tau, pvalue))
+        assert np.isclose(kendall_tau(a, b), tau)
+    assert np.isnan(kendall_tau([1, 1, 1], [1, 2, 3]))
+    assert np.isnan(spearman([1], [1]))
+
+
+def test_compare_graphs(graphs):
+    full, affix = graphs
+    comparison = compare_graphs(
+            {"full": full, "affix": affix, "affix-in": affix},
+            threshold=0, kinds={"affix-in": "in_degree"})
+    assert comparison["names"] == ["full", "affix", "affix-in"]
+    degrees = [degree(full, "family_count", 0), degree(affix, "family_count", 0),
+               in_degree(affix, "family_count", 0)]
+    for i in range(3):
+        for j in range(3):
+            common = [node for node in degrees[i] if node in degrees[j]]
+            a = [degrees[i][node] for node in common]
+            b = [degrees[j][node] for node in common]
+            assert comparison["common_nodes"][i, j] == len(common)
+            assert np.isclose(comparison["spearman"][i, j], stats.spearmanr(a, b)[0])
+            tau, pvalue = stats.kendalltau(a, b, method="asymptotic")
+            assert np.isclose(comparison["kendall"][i, j], tau)
+            if i != j:
+                assert np.isclose(comparison["kendall_pvalue"][i, j], pvalue)
+    for i, graph in enumerate([full, affix]):
+        positions = [comparison["nodes"].index(node) for node in graph.nodes]
+        assert np.allclose(comparison["degrees"][i, positions],
+                           [degrees[i][node] for node in graph.nodes])
+
+    edges = [set(map(frozenset, graph.edges)) for graph in (full, affix)]
+    common = len(edges[0] & edges[1])
+    assert comparison["common_edges"][0, 1] == common
+    assert np.isclose(comparison["edge_jaccard"][0, 1], common / len(edges[0] | edges[1]))
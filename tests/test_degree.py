@@ -0,0 +1,74 @@
+import networkx as nx
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.colexifications import affix_colexifications, full_colexifications
+from pacs.degree import EdgeArrays, degrees
+from pacs.util import degree, in_degree, out_degree
+
+
+def _reference_degree(graph, weight, t=2):
+    # the degree of pacs.util before it was computed over arrays
+    deg = {node: 0 for node in graph.nodes}
+    visited = set()
+    for node in graph.nodes:
+        for neighbor, data in graph[node].items():
+            if data[weight] > t:
+                if (node, neighbor) not in visited:
+                    deg[node] += data[weight]
+                    visited.add((node, neighbor))
+                if (neighbor, node) not in visited:
+                    deg[neighbor] += data[weight]
+                    visited.add((neighbor, node))
+    return deg
+
+
+def _above(graph, weight, t):
+    """
+    Return the graph of the edges whose weight is above the threshold.
+    """
+    out = graph.__class__()
+    out.add_nodes_from(graph.nodes)
+    out.add_edges_from([edge for edge in graph.edges(data=True) if edge[2][weight] > t])
+    return out
+
+
+@pytest.fixture(scope="module")
+def graphs():
+    wordlist = synthetic_wordlist(languages=12, concepts=150, seed=6)
+    return {"full": full_colexifications(wordlist), "affix": affix_colexifications(wordlist)}
+
+
+@pytest.mark.parametrize("weight", ["family_count", "language_count", "count"])
+@pytest.mark.parametrize("t", [0, 1, 2, 3])
+def test_degrees(graphs, weight, t):
+    full, affix = graphs["full"], graphs["affix"]
+    above = _above(full, weight, t)
+    assert degree(full, weight, t) == dict(above.degree(weight=weight))
+    assert in_degree(full, weight, t) == dict(above.degree(weight=weight))
+    above = _above(affix, weight, t)
+    assert in_degree(affix, weight, t) == dict(above.in_degree(weight=weight))
+    assert out_degree(affix, weight, t) == dict(above.out_degree(weight=weight))
+    assert degree(affix, weight, t) == _reference_degree(affix, weight, t)
+    assert degree(full, weight, t) == _reference_degree(full, weight, t)
+
+
+def test_reciprocal_edges():
+    graph = nx.DiGraph()
+    graph.add_edge("a", "b", weight=5)
+    graph.add_edge("b", "a", weight=4)
+    graph.add_edge("b", "c", weight=3)
+    graph.add_edge("c", "c", weight=3)
+    assert degree(graph, "weight", 2) == _reference_degree(graph, "weight", 2) == \
+        {"a": 5, "b": 8, "c": 6}
+
+
+def test_several_thresholds(graphs):
+    affix = graphs["affix"]
+    result = degrees(affix, ["family_count", "count"], thresholds=[1, 2])
+    assert len(result) == 3 * 2 * 2
+    for (kind, weight, t), values in result.items():
+        function = {"degree": degree, "in_degree": in_degree, "out_degree": out_degree}[kind]
+        assert values == function(affix, weight, t)
+    edges = EdgeArrays(affix)
+    assert edges.degree("family_count", [1, 2]).shape == (2, len(affix))
@@ -0,0 +1,74 @@
+import functools
+from collections import Counter
+
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.colexifications import affix_colexifications, sounds_without_plus
+from pacs.fuzzy import (
+        fuzzy_affix_colexifications, reduce_form, sound_class, strip_diacritics)
+
+
+def _dump(graph):
+    return (graph.is_directed(), list(graph.nodes(data=True)), list(graph.edges(data=True)))
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=4, concepts=80, seed=2)
+
+
+def _brute_force(wordlist, max_distance, source_threshold=2, target_threshold=5,
+                 difference_threshold=2, reduction=sound_class):
+    """
+    Count the pairs of forms of each edge by comparing all pairs of forms.
+    """
+    edges = Counter()
+    for language in wordlist.languages:
+        forms = [(form.id, form.concept.concepticon_gloss, reduce_form(form, reduction=reduction))
+                 for form in language.forms_with_sounds]
+        for form_a, concept_a, source in forms:
+            for form_b, concept_b, target in forms:
+                if concept_a == concept_b or len(source) < source_threshold or \
+                        len(target) < target_threshold or \
+                        len(target) - len(source) < difference_threshold:
+                    continue
+                for affix in (target[:len(source)], target[len(target) - len(source):]):
+                    if sum([x != y for x, y in zip(source, affix)]) <= max_distance:
+                        edges[concept_a, concept_b] += 1
+                        break
+    return edges
+
+
+@pytest.mark.parametrize("max_distance", [0, 1, 2])
+def test_fuzzy_equals_brute_force(wordlist, max_distance):
+    graph = fuzzy_affix_colexifications(wordlist, max_distance=max_distance)
+    expected = _brute_force(wordlist, max_distance)
+    assert expected
+    assert {(a, b): data["count"] for a, b, data in graph.edges(data=True)} == dict(expected)
+
+
+def test_minhash_finds_a_subset(wordlist):
+    graph = fuzzy_affix_colexifications(wordlist, max_distance=1, index="minhash")
+    expected = _brute_force(wordlist, 1)
+    found = {(a, b): data["count"] for a, b, data in graph.edges(data=True)}
+    assert found
+    assert all([count <= expected[edge] for edge, count in found.items()])
+
+
+@pytest.mark.parametrize("reduction", [sound_class, strip_diacritics])
+@pytest.mark.parametrize("index", ["substitutions", "minhash"])
+def test_exact_matches(wordlist, reduction, index):
+    graph = fuzzy_affix_colexifications(
+            wordlist, max_distance=0, reduction=reduction, index=index)
+    expected = affix_colexifications(wordlist, form_factory=functools.partial(
+        reduce_form, form_factory=sounds_without_plus, reduction=reduction))
+    assert _dump(graph) == _dump(expected)
+
+
+def test_sound_class():
+    assert [sound_class(segment) for segment in ["tʰ", "t", "a", "ã", "ts"]] == \
+        ["T", "T", "A", "A", "C"]
+    assert sound_class("a", model="dolgo") == "V"
+    # segments unknown to LingPy are kept
+    assert sound_class("ː") == "ː"
@@ -0,0 +1,48 @@
+import pytest
+
+from pacs.bench import SyntheticWordlist, synthetic_wordlist
+from pacs.colexifications import (
+        full_colexifications, affix_colexifications, common_substring_colexifications)
+from pacs.incremental import ColexificationGraph
+
+
+def _dump(graph):
+    return (dict(graph.nodes(data=True)),
+            {frozenset(edge[:2]) if not graph.is_directed() else edge[:2]: edge[2]
+             for edge in graph.edges(data=True)})
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=6, concepts=80, seed=3)
+
+
+@pytest.mark.parametrize("analysis,function", [
+    ("full", full_colexifications),
+    ("affix", affix_colexifications),
+    ("common_substring", common_substring_colexifications)])
+def test_incremental_equals_batch(wordlist, analysis, function):
+    graph = ColexificationGraph(analysis)
+    graph.add_wordlist(wordlist)
+    assert _dump(graph.graph) == _dump(function(wordlist))
+
+    # a language added again comes last
+    graph.remove_language(wordlist.languages[2])
+    graph.add_language(wordlist.languages[2])
+    languages = wordlist.languages[:2] + wordlist.languages[3:] + wordlist.languages[2:3]
+    assert _dump(graph.graph) == _dump(function(SyntheticWordlist(languages, wordlist.concepts)))
+
+
+def test_incremental_concepts(wordlist):
+    restricted = SyntheticWordlist(wordlist.languages, wordlist.concepts[:40])
+    expected = _dump(full_colexifications(restricted))
+    graph = ColexificationGraph("full")
+    graph.add_wordlist(restricted, concepts="wordlist")
+    assert _dump(graph.graph) == expected
+
+    concepts = set([concept.concepticon_gloss for concept in restricted.concepts])
+    graph = ColexificationGraph("full")
+    for language in restricted.languages:
+        graph.add_language(language, concepts=concepts)
+    assert _dump(graph.graph) == expected
+    assert _dump(graph.graph) != _dump(full_colexifications(wordlist))
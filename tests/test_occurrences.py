@@ -0,0 +1,51 @@
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.colexifications import (
+        full_colexifications, affix_colexifications, common_substring_colexifications)
+from pacs.occurrences import CountTable, OccurrenceTable
+
+FUNCTIONS = {
+        "full": full_colexifications,
+        "affix": affix_colexifications,
+        "common_substring": common_substring_colexifications}
+
+
+def _dump(graph):
+    return (graph.is_directed(), list(graph.nodes(data=True)), list(graph.edges(data=True)))
+
+
+def _counts(graph):
+    """
+    Keep the attributes of a graph that are computed without lists.
+    """
+    def keep(data):
+        return {key: value for key, value in data.items()
+                if key == "count" or key.endswith("_count")}
+    return (graph.is_directed(),
+            [(node, keep(data)) for node, data in graph.nodes(data=True)],
+            [(a, b, keep(data)) for a, b, data in graph.edges(data=True)])
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=6, concepts=120, seed=1)
+
+
+@pytest.mark.parametrize("name", list(FUNCTIONS))
+def test_count_tables(wordlist, name):
+    expected = _counts(FUNCTIONS[name](wordlist))
+    assert _counts(FUNCTIONS[name](wordlist, attributes="counts")) == expected
+    table = FUNCTIONS[name](wordlist, output="table")
+    assert isinstance(table, OccurrenceTable)
+    assert _counts(table.to_graph(lists=False)) == expected
+    assert isinstance(FUNCTIONS[name](wordlist, attributes="counts", output="table"), CountTable)
+
+
+@pytest.mark.parametrize("name", list(FUNCTIONS))
+def test_partitions(wordlist, name):
+    graph, partitions = FUNCTIONS[name](wordlist, partition_by="family")
+    assert _dump(graph) == _dump(FUNCTIONS[name](wordlist))
+    assert list(partitions) == ["Family0", "Family1", "Family2"]
+    for family, partition in partitions.items():
+        assert _dump(partition) == _dump(FUNCTIONS[name](wordlist, family=family))
@@ -0,0 +1,51 @@
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.colexifications import affix_colexifications_by_pairwise_comparison
+from pacs.profiling import Profile
+from pacs.significance import PermutationTest
+from pacs.sweep import affix_colexifications_sweep, common_substring_colexifications_sweep
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=3, concepts=40, seed=6)
+
+
+def _check(profile, stages):
+    summary = profile.summary()
+    assert set(summary) == set(stages)
+    assert all([record["seconds"] >= 0 for record in profile.report()])
+    return summary
+
+
+def test_pairwise(wordlist):
+    profile = Profile()
+    affix_colexifications_by_pairwise_comparison(wordlist, profile=profile)
+    summary = _check(profile, ["read", "forms", "form_factory", "analysis"])
+    assert summary["analysis"]["languages"] == 3
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_sweeps(wordlist, workers):
+    profile = Profile()
+    graphs = affix_colexifications_sweep(
+            wordlist, [(2, 5, 2), (3, 5, 2)], workers=workers, profile=profile)
+    graphs[2, 5, 2]
+    _check(profile, [
+        "read", "forms", "form_factory", "analysis", "candidates", "pairs", "filter",
+        "collect", "graph"])
+    profile = Profile()
+    common_substring_colexifications_sweep(
+            wordlist, [(4, 3), (3, 2)], workers=workers, output="table", profile=profile)
+    _check(profile, [
+        "read", "forms", "form_factory", "analysis", "pairs", "filter", "collect"])
+
+
+def test_permutation_test(wordlist):
+    profile = Profile()
+    test = PermutationTest(wordlist, analysis="affix", profile=profile)
+    test.pvalues(permutations=10, batch_size=5)
+    summary = _check(profile, [
+        "read", "forms", "form_factory", "analysis", "candidates", "pairs", "permutations"])
+    assert summary["permutations"]["items"] == 10
@@ -0,0 +1,73 @@
+import networkx as nx
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.colexifications import affix_colexifications, full_colexifications
+from pacs.query import EdgeIndex
+
+
+def _sorted(graph, edges, attribute):
+    """
+    Sort edges by decreasing value of an attribute, ties in the order of the
+    graph.
+    """
+    order = {edge: i for i, edge in enumerate(graph.edges)}
+    return sorted(edges, key=lambda edge: (-graph.edges[edge][attribute], order[edge]))
+
+
+@pytest.fixture(scope="module", params=["full", "affix"])
+def graph(request):
+    wordlist = synthetic_wordlist(languages=12, concepts=150, seed=6)
+    return {"full": full_colexifications, "affix": affix_colexifications}[
+        request.param](wordlist)
+
+
+@pytest.mark.parametrize("attribute", ["family_count", "count"])
+@pytest.mark.parametrize("minimum", [None, 1, 2, 3])
+@pytest.mark.parametrize("top", [None, 5])
+def test_select(graph, attribute, minimum, top):
+    index = EdgeIndex(graph, attributes=["family_count"])
+    expected = _sorted(graph, [
+        (a, b) for a, b, data in graph.edges(data=True)
+        if minimum is None or data[attribute] >= minimum], attribute)[:top]
+    assert index.edges(index.select(attribute, minimum=minimum, top=top)) == expected
+
+
+@pytest.mark.parametrize("within", [True, False])
+@pytest.mark.parametrize("minimum", [None, 2])
+def test_select_concepts(graph, within, minimum):
+    index = EdgeIndex(graph)
+    concepts = list(graph.nodes)[::3] + ["missing"]
+    keep = (lambda a, b: a in concepts and b in concepts) if within else \
+        (lambda a, b: a in concepts or b in concepts)
+    expected = _sorted(graph, [
+        (a, b) for a, b, data in graph.edges(data=True)
+        if keep(a, b) and (minimum is None or data["family_count"] >= minimum)],
+        "family_count")
+    assert expected or minimum
+    selected = index.select(minimum=minimum, concepts=concepts, within=within)
+    assert index.edges(selected) == expected
+    assert index.edges(selected, data=True) == [
+            (a, b, graph.edges[a, b]) for a, b in expected]
+
+
+def test_view(graph):
+    index = EdgeIndex(graph)
+    selected = index.select(minimum=2)
+    view = index.view(selected)
+    expected = graph.edge_subgraph(index.edges(selected))
+    assert set(view.edges) == set(expected.edges)
+    assert set(view.nodes) == set(graph.nodes)
+
+    nodes = list(graph.nodes)[:40]
+    view = index.view(selected, nodes=nodes + ["missing"])
+    expected = nx.Graph() if not graph.is_directed() else nx.DiGraph()
+    expected.add_nodes_from(nodes)
+    expected.add_edges_from([
+        (a, b) for a, b, data in graph.edges(data=True)
+        if a in nodes and b in nodes and data["family_count"] >= 2])
+    assert set(view.nodes) == set(expected.nodes)
+    assert set(view.edges) == set(expected.edges)
+    # views share the attributes of the graph
+    for a, b in view.edges:
+        assert view.edges[a, b] is graph.edges[a, b]
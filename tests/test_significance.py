@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.colexifications import (
+        full_colexifications, affix_colexifications, common_substring_colexifications)
+from pacs.significance import PermutationTest, permutation_test
+
+FUNCTIONS = {
+        "full": full_colexifications,
+        "affix": affix_colexifications,
+        "common_substring": common_substring_colexifications}
+
+
+def _key(graph, a, b):
+    return (a, b) if graph.is_directed() else frozenset([a, b])
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=6, concepts=80, seed=5)
+
+
+@pytest.mark.parametrize("analysis", list(FUNCTIONS))
+@pytest.mark.parametrize("statistic", ["family_count", "language_count", "variety_count"])
+def test_observed(wordlist, analysis, statistic):
+    graph = FUNCTIONS[analysis](wordlist)
+    edges, values = PermutationTest(wordlist, analysis=analysis).observed(statistic)
+    assert dict(zip([_key(graph, a, b) for a, b in edges], values.tolist())) == {
+            _key(graph, a, b): data[statistic] for a, b, data in graph.edges(data=True)}
+
+
+def test_pvalues(wordlist):
+    test = PermutationTest(wordlist, analysis="affix")
+    edges, observed, serial = test.pvalues(permutations=50, seed=1, batch_size=20)
+    assert len(edges) == len(observed) == len(serial)
+    assert ((serial > 0) & (serial <= 1)).all()
+    _, _, parallel = test.pvalues(permutations=50, seed=1, batch_size=20, workers=2)
+    assert np.array_equal(serial, parallel)
+    _, _, other = test.pvalues(permutations=50, seed=2, batch_size=20)
+    assert not np.array_equal(serial, other)
+
+
+def test_permutation_test(wordlist):
+    graph = permutation_test(wordlist, analysis="full", permutations=20, seed=0)
+    pvalues = [data["family_count_pvalue"] for _, _, data in graph.edges(data=True)]
+    assert len(pvalues) == graph.number_of_edges()
+    assert all([0 < pvalue <= 1 for pvalue in pvalues])
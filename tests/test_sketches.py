@@ -0,0 +1,77 @@
+import functools
+
+import pytest
+
+from pacs.bench import SyntheticWordlist, synthetic_wordlist
+from pacs.colexifications import (
+        full_colexifications, affix_colexifications, common_substring_colexifications)
+from pacs.sketches import HyperLogLog, SketchTable
+
+FUNCTIONS = {
+        "full": full_colexifications,
+        "affix": affix_colexifications,
+        "common_substring": common_substring_colexifications}
+
+COUNTS = ("variety_count", "language_count", "family_count", "form_count")
+
+
+def _counts(graph):
+    return (
+            {node: data for node, data in graph.nodes(data=True)},
+            {(a, b): {key: value for key, value in data.items()
+                      if key == "count" or key.endswith("_count")}
+             for a, b, data in graph.edges(data=True)})
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=30, concepts=200, seed=1)
+
+
+@pytest.mark.parametrize("name", list(FUNCTIONS))
+def test_exact_counts(wordlist, name):
+    # counts up to 2 ** precision / 16 are exact
+    assert _counts(FUNCTIONS[name](wordlist, table_factory=SketchTable)) == \
+        _counts(FUNCTIONS[name](wordlist, attributes="counts"))
+
+
+@pytest.mark.parametrize("name", ["full", "affix"])
+def test_estimated_counts(wordlist, name):
+    table = functools.partial(SketchTable, precision=6)
+    error = HyperLogLog(6).relative_error
+    nodes, edges = _counts(FUNCTIONS[name](wordlist, table_factory=table))
+    exact_nodes, exact_edges = _counts(FUNCTIONS[name](wordlist, attributes="counts"))
+    assert list(edges) == list(exact_edges)
+    # some counts are above the exact range of 2 ** 6 / 16
+    assert max([data["variety_count"] for data in exact_nodes.values()]) > 4
+    for estimated, exact in ((nodes, exact_nodes), (edges, exact_edges)):
+        for key, data in exact.items():
+            assert estimated[key].get("count") == data.get("count")
+            for count in COUNTS:
+                if count in data:
+                    assert abs(estimated[key][count] - data[count]) <= 3 * error * data[count]
+
+
+def test_hyperloglog():
+    sketch, merged = HyperLogLog(), HyperLogLog()
+    for value in range(100000):
+        sketch.add(value)
+    assert abs(sketch.count() - 100000) <= 3 * sketch.relative_error * 100000
+    for start in range(0, 100000, 25000):
+        part = HyperLogLog()
+        for value in range(start, start + 25000):
+            part.add(value)
+        merged.update(part)
+    assert merged.registers == sketch.registers
+
+
+def test_update(wordlist):
+    half = len(wordlist.languages) // 2
+    tables = [
+            affix_colexifications(
+                SyntheticWordlist(languages, wordlist.concepts), output="table",
+                table_factory=SketchTable)
+            for languages in (wordlist.languages[:half], wordlist.languages[half:])]
+    tables[0].update(tables[1])
+    assert _counts(tables[0].to_graph()) == _counts(
+            affix_colexifications(wordlist, table_factory=SketchTable))
@@ -0,0 +1,34 @@
+import functools
+
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.colexifications import (
+        full_colexifications, affix_colexifications, common_substring_colexifications)
+from pacs.spilling import SpillingTable
+
+FUNCTIONS = {
+        "full": full_colexifications,
+        "affix": affix_colexifications,
+        "common_substring": common_substring_colexifications}
+
+
+def _dump(graph):
+    return (graph.is_directed(), list(graph.nodes(data=True)), list(graph.edges(data=True)))
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=6, concepts=120, seed=1)
+
+
+@pytest.mark.parametrize("name", list(FUNCTIONS))
+def test_spilling_table(wordlist, name):
+    table = FUNCTIONS[name](
+            wordlist, output="table",
+            table_factory=functools.partial(SpillingTable, memory_limit=1))
+    try:
+        assert len(table.runs["edges"]) > 1
+        assert _dump(table.to_graph()) == _dump(FUNCTIONS[name](wordlist))
+    finally:
+        table.close()
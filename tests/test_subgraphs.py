@@ -0,0 +1,48 @@
+import networkx as nx
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.colexifications import affix_colexifications, full_colexifications
+from pacs.subgraphs import neighborhoods
+from pacs.util import iter_subgraphs
+
+
+def _reference_subgraphs(graph, max_distance=2, max_nodes_pre=30, max_nodes_post=50):
+    # iter_subgraphs of pacs.util before it was computed in batches
+    for node in graph.nodes:
+        generations = [{node}]
+        while generations[-1] and len(set.union(*generations)) <= max_nodes_pre and \
+                len(generations) <= max_distance:
+            nextgen = set.union(*[set(graph[n].keys()) for n in generations[-1]])
+            if len(nextgen) > max_nodes_post:
+                break
+            generations.append(nextgen)
+        yield node, set.union(*generations)
+
+
+@pytest.fixture(scope="module")
+def graphs():
+    wordlist = synthetic_wordlist(languages=12, concepts=150, seed=6)
+    return {"full": full_colexifications(wordlist), "affix": affix_colexifications(wordlist)}
+
+
+@pytest.mark.parametrize("name", ["full", "affix"])
+@pytest.mark.parametrize("limits", [(2, 30, 50), (1, 30, 50), (3, 10, 20), (3, 100, 100)])
+@pytest.mark.parametrize("batch_size", [1, 7, 1024])
+def test_neighborhoods(graphs, name, limits, batch_size):
+    graph = graphs[name]
+    max_distance, max_nodes_pre, max_nodes_post = limits
+    expected = list(_reference_subgraphs(graph, *limits))
+    result = list(iter_subgraphs(
+        graph, max_distance=max_distance, max_nodes_pre=max_nodes_pre,
+        max_nodes_post=max_nodes_post, batch_size=batch_size))
+    assert [node for node, _ in result] == list(graph.nodes)
+    assert [(node, set(nodes)) for node, nodes in result] == expected
+    for (node, nodes), (_, reference) in zip(result, expected):
+        assert nx.utils.graphs_equal(graph.subgraph(nodes), graph.subgraph(reference))
+
+
+def test_workers(graphs):
+    graph = graphs["affix"]
+    assert list(neighborhoods(graph, batch_size=16, workers=2)) == \
+        list(neighborhoods(graph, batch_size=16))
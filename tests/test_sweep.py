@@ -0,0 +1,40 @@
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.colexifications import affix_colexifications, common_substring_colexifications
+from pacs.sweep import (
+        affix_colexifications_sweep, common_substring_colexifications_sweep, SweepGraphs)
+
+
+def _dump(graph):
+    return (graph.is_directed(), list(graph.nodes(data=True)), list(graph.edges(data=True)))
+
+
+@pytest.fixture(scope="module")
+def wordlist():
+    return synthetic_wordlist(languages=5, concepts=100, seed=4)
+
+
+def test_affix_sweep(wordlist):
+    settings = [(2, 5, 2), (3, 5, 2), (2, 6, 3), {"source_threshold": 4}]
+    graphs = affix_colexifications_sweep(wordlist, settings)
+    assert isinstance(graphs, SweepGraphs)
+    assert list(graphs) == [(2, 5, 2), (3, 5, 2), (2, 6, 3), (4, 5, 2)]
+    for (source, target, difference), graph in graphs.items():
+        assert _dump(graph) == _dump(affix_colexifications(
+            wordlist, source_threshold=source, target_threshold=target,
+            difference_threshold=difference))
+
+
+def test_common_substring_sweep(wordlist):
+    settings = [(4, 3), (3, 2), (3, 3), (5, 2)]
+    graphs = common_substring_colexifications_sweep(wordlist, settings)
+    for (length, difference), graph in graphs.items():
+        assert _dump(graph) == _dump(common_substring_colexifications(
+            wordlist, minimal_length_threshold=length, difference_threshold=difference))
+
+
+def test_sweep_counts(wordlist):
+    graphs = affix_colexifications_sweep(wordlist, [(2, 5, 2)], attributes="counts")
+    expected = affix_colexifications(wordlist, attributes="counts")
+    assert list(graphs[2, 5, 2].edges(data=True)) == list(expected.edges(data=True))
@@ -0,0 +1,105 @@
+import gzip
+
+import networkx as nx
+import pytest
+
+from pacs.bench import synthetic_wordlist
+from pacs.colexifications import affix_colexifications, full_colexifications
+from pacs.util import (
+        detect_communities, get_communities, load_gml_as_nx_graph, networkx2igraph,
+        read_graph, write_gml, write_graph)
+
+
+def _dump(graph):
+    return (graph.is_directed(), graph.graph, list(graph.nodes(data=True)),
+            list(graph.edges(data=True)))
+
+
+@pytest.mark.parametrize("function", [full_colexifications, affix_colexifications])
+@pytest.mark.parametrize("mmap_mode", [False, True])
+def test_write_graph_round_trip(tmp_path, function, mmap_mode):
+    graph = function(synthetic_wordlist(languages=5, concepts=60, seed=2))
+    write_graph(graph, tmp_path / "graph.bin")
+    assert _dump(read_graph(tmp_path / "graph.bin", mmap_mode=mmap_mode)) == _dump(graph)
+
+
+def test_write_graph_sets_and_tuples(tmp_path):
+    graph = nx.Graph(name="test", pairs={("a", 1), ("b", 2)})
+    graph.add_node(("x", 1), words={"a", "b"}, forms=("f1", "f2"))
+    graph.add_node("y", words=set(), forms=["f3"], data={"key": (1, [2, None])})
+    graph.add_edge(("x", 1), "y", count=2, families=frozenset(["F1"]), score=0.5)
+    write_graph(graph, tmp_path / "graph.bin")
+    assert _dump(read_graph(tmp_path / "graph.bin")) == _dump(graph)
+    restored = read_graph(tmp_path / "graph.bin")
+    assert type(restored.nodes[("x", 1)]["forms"]) is tuple
+    assert type(restored.nodes["y"]["words"]) is set
+
+
+def test_write_graph_unsupported_values(tmp_path):
+    graph = nx.Graph()
+    graph.add_node("x", value=object())
+    with pytest.raises(ValueError, match="'value'"):
+        write_graph(graph, tmp_path / "graph.bin")
+    graph = nx.Graph()
+    graph.add_edge("x", "y", mapping={1: 2})
+    with pytest.raises(ValueError, match="'mapping'"):
+        write_graph(graph, tmp_path / "graph.bin")
+
+
+def test_write_gml_joins_lists(tmp_path):
+    graph = affix_colexifications(synthetic_wordlist(languages=5, concepts=60, seed=2))
+    write_gml(graph, tmp_path / "graph.gml")
+    restored = load_gml_as_nx_graph(str(tmp_path / "graph.gml"), nx_cls=nx.DiGraph)
+    assert list(restored.nodes) == list(graph.nodes)
+    for node, data in graph.nodes(data=True):
+        for key, value in data.items():
+            expected = "//".join(map(str, value)) if isinstance(value, list) else value
+            assert restored.nodes[node][key] == expected
+    assert set(restored.edges) == set(graph.edges)
+
+    write_gml(graph, tmp_path / "graph.gml.gz")
+    with gzip.open(str(tmp_path / "graph.gml.gz"), "rt", encoding="utf-8") as f:
+        assert f.read() == (tmp_path / "graph.gml").read_text(encoding="utf-8")
+
+
+def _cliques():
+    """
+    Return a graph of two cliques of concepts joined by one weak edge.
+    """
+    graph = nx.Graph()
+    for group in (["A", "B", "C", "D"], ["E", "F", "G", "H"]):
+        graph.add_nodes_from(group, size=len(group))
+        graph.add_edges_from(
+                [(a, b) for i, a in enumerate(group) for b in group[i + 1:]], family_count=5)
+    graph.add_edge("D", "E", family_count=1)
+    return graph
+
+
+def test_networkx2igraph():
+    graph = affix_colexifications(synthetic_wordlist(languages=5, concepts=60, seed=2))
+    converted = networkx2igraph(graph)
+    assert converted.is_directed()
+    assert converted.vs["Name"] == list(graph.nodes)
+    assert [(converted.vs[e.source]["Name"], converted.vs[e.target]["Name"])
+            for e in converted.es] == list(graph.edges)
+    assert converted.vs["family_count"] == [
+            data["family_count"] for _, data in graph.nodes(data=True)]
+    assert converted.es["source_forms"] == [
+            data["source_forms"] for _, _, data in graph.edges(data=True)]
+
+    numbered = nx.Graph([("10", "2"), ("2", "1")])
+    assert networkx2igraph(numbered).vs["Name"] == ["1", "2", "10"]
+
+
+@pytest.mark.parametrize("method,kw", [
+    ("infomap", {"edge_weights": "family_count"}),
+    ("multilevel", {"weights": "family_count"}),
+    ("fastgreedy", {"weights": "family_count"})])
+def test_detect_communities(method, kw):
+    graph = _cliques()
+    clustering = detect_communities(graph, method=method, name="community", **kw)
+    assert len(clustering) == 2
+    communities = get_communities(graph, name="community")
+    assert sorted([sorted(nodes) for nodes in communities.values()]) == [
+            ["A", "B", "C", "D"], ["E", "F", "G", "H"]]
+    assert sorted(communities) == ["1", "2"]